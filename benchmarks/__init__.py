@@ -0,0 +1 @@
+"""Offline benchmarks for Solarman Config Manager."""
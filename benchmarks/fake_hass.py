@@ -0,0 +1,333 @@
+"""Lightweight stand-in for the parts of ``hass`` the integration touches.
+
+It provides the state machine, entity and device registries, service
+registry, event bus, job runner and executor with the same call signatures
+as Home Assistant, enough for the integration's own ``async_setup`` to run
+against it, but none of its machinery: no recorder, no event loop policy, no
+other integrations. The sensor platform is reported as already set up, so
+the integration's sensors are not loaded. Home Assistant itself must still
+be installed, because the integration and its helpers import it.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CoreState
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+
+SOLARMAN_ENTRY_ID = "solarman_entry"
+
+
+@dataclass
+class FakeState:
+    """A state object with the fields exports read."""
+
+    entity_id: str
+    state: str
+    attributes: MappingProxyType
+    last_changed: datetime
+    last_updated: datetime
+
+    @property
+    def domain(self) -> str:
+        """Return the entity's domain."""
+        return self.entity_id.split(".")[0]
+
+
+class FakeStates:
+    """Minimal state machine: get, set and all."""
+
+    def __init__(self) -> None:
+        """Initialize the state machine."""
+        self._states: dict[str, FakeState] = {}
+
+    def get(self, entity_id: str) -> FakeState | None:
+        """Return the state of an entity."""
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id: str, state: Any, attributes: dict | None = None) -> None:
+        """Set an entity's state, keeping its attributes if none are given."""
+        now = datetime.now(timezone.utc)
+        old = self._states.get(entity_id)
+        if attributes is None:
+            attributes = old.attributes if old else {}
+        state = str(state)
+        last_changed = old.last_changed if old and old.state == state else now
+        self._states[entity_id] = FakeState(
+            entity_id, state, MappingProxyType(dict(attributes)), last_changed, now
+        )
+
+    def async_all(self) -> list[FakeState]:
+        """Return all states."""
+        return list(self._states.values())
+
+
+@dataclass(frozen=True)
+class FakeRegistryEntry:
+    """An entity registry entry with the fields the integration reads."""
+
+    entity_id: str
+    platform: str
+    device_id: str | None
+    config_entry_id: str | None
+    name: str | None = None
+    original_name: str | None = None
+    device_class: str | None = None
+    unit_of_measurement: str | None = None
+
+    @property
+    def domain(self) -> str:
+        """Return the entity's domain."""
+        return self.entity_id.split(".")[0]
+
+
+class _RegistryItems(dict):
+    """Entity entries keyed by entity id, with the config entry lookup HA provides."""
+
+    def get_entries_for_config_entry_id(self, config_entry_id: str) -> list[FakeRegistryEntry]:
+        """Return the entries of one config entry."""
+        return [entry for entry in self.values() if entry.config_entry_id == config_entry_id]
+
+
+class FakeEntityRegistry:
+    """Entity registry stand-in, stored where ``er.async_get`` looks for it."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.entities = _RegistryItems()
+
+    def async_get(self, entity_id: str) -> FakeRegistryEntry | None:
+        """Return the entry of an entity."""
+        return self.entities.get(entity_id)
+
+    def add(self, entry: FakeRegistryEntry) -> None:
+        """Register an entity."""
+        self.entities[entry.entity_id] = entry
+
+
+@dataclass(frozen=True)
+class FakeDevice:
+    """A device registry entry."""
+
+    id: str
+    name: str
+    name_by_user: str | None = None
+
+
+class FakeDeviceRegistry:
+    """Device registry stand-in, stored where ``dr.async_get`` looks for it."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.devices: dict[str, FakeDevice] = {}
+
+    def async_get(self, device_id: str) -> FakeDevice | None:
+        """Return a device."""
+        return self.devices.get(device_id)
+
+    def add(self, device: FakeDevice) -> None:
+        """Register a device."""
+        self.devices[device.id] = device
+
+
+@dataclass
+class FakeServiceCall:
+    """A service call as handlers receive it."""
+
+    domain: str
+    service: str
+    data: dict
+    return_response: bool = False
+
+
+ServiceHandler = Callable[[FakeServiceCall], Awaitable[Any]]
+
+
+class FakeServices:
+    """Service registry that records every call.
+
+    Service data is validated against the schema the service was registered
+    with, so handlers see the defaults Home Assistant would fill in. Calls to
+    services nobody registered (such as persistent_notification) are
+    recorded and otherwise ignored.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self._handlers: dict[tuple[str, str], tuple[ServiceHandler, Callable | None]] = {}
+        self.calls: list[FakeServiceCall] = []
+
+    def async_register(
+        self,
+        domain: str,
+        service: str,
+        handler: ServiceHandler,
+        schema: Callable | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Register a service handler."""
+        self._handlers[(domain, service)] = (handler, schema)
+
+    def has_service(self, domain: str, service: str) -> bool:
+        """Return True if a service is registered."""
+        return (domain, service) in self._handlers
+
+    async def async_call(
+        self,
+        domain: str,
+        service: str,
+        service_data: dict | None = None,
+        blocking: bool = False,
+        return_response: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        """Call a service and return its response."""
+        data = dict(service_data or {})
+        registered = self._handlers.get((domain, service))
+        if registered is not None and registered[1] is not None:
+            data = registered[1](data)
+        call = FakeServiceCall(domain, service, data, return_response)
+        self.calls.append(call)
+        if registered is None:
+            return None
+        return await registered[0](call)
+
+
+@dataclass
+class FakeEvent:
+    """An event as listeners receive it."""
+
+    event_type: str
+    data: dict
+
+
+class FakeBus:
+    """Event bus that counts fired events and supports listeners.
+
+    Coroutine listeners are scheduled as tasks, as Home Assistant does.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the bus."""
+        self.fired: dict[str, int] = {}
+        self._listeners: dict[str, list[Callable]] = {}
+
+    def async_fire(self, event_type: str, event_data: dict | None = None) -> None:
+        """Fire an event."""
+        self.fired[event_type] = self.fired.get(event_type, 0) + 1
+        event = FakeEvent(event_type, event_data or {})
+        for listener in list(self._listeners.get(event_type, [])):
+            result = listener(event)
+            if asyncio.iscoroutine(result):
+                asyncio.get_running_loop().create_task(result)
+
+    def async_listen(self, event_type: str, listener: Callable) -> Callable[[], None]:
+        """Listen for an event and return the unsubscribe callback."""
+        self._listeners.setdefault(event_type, []).append(listener)
+        return lambda: self._listeners[event_type].remove(listener)
+
+    def async_listen_once(self, event_type: str, listener: Callable) -> Callable[[], None]:
+        """Listen for the next event of a type and return the unsubscribe callback."""
+
+        def once(event: FakeEvent) -> Any:
+            unsub()
+            return listener(event)
+
+        unsub = self.async_listen(event_type, once)
+        return unsub
+
+
+@dataclass
+class FakeConfigEntry:
+    """A config entry of the Solarman integration."""
+
+    entry_id: str
+    domain: str
+
+
+class FakeConfigEntries:
+    """Config entries registry holding the Solarman entry."""
+
+    def __init__(self, entries: list[FakeConfigEntry]) -> None:
+        """Initialize the registry."""
+        self._entries = entries
+
+    def async_entries(self, domain: str | None = None) -> list[FakeConfigEntry]:
+        """Return the entries of a domain."""
+        return [entry for entry in self._entries if domain is None or entry.domain == domain]
+
+
+@dataclass
+class FakeConfig:
+    """Configuration with a config directory and the components set up."""
+
+    config_dir: Path
+    components: set[str] = field(default_factory=lambda: {"sensor"})
+
+    def path(self, *parts: str) -> str:
+        """Return a path inside the config directory."""
+        return str(self.config_dir.joinpath(*parts))
+
+
+@dataclass
+class FakeHass:
+    """Stand-in for ``HomeAssistant`` with a real thread pool executor."""
+
+    config_dir: Path
+    executor_workers: int = 4
+    state: CoreState = CoreState.running
+    data: dict = field(default_factory=dict)
+    states: FakeStates = field(default_factory=FakeStates)
+    services: FakeServices = field(default_factory=FakeServices)
+    bus: FakeBus = field(default_factory=FakeBus)
+
+    def __post_init__(self) -> None:
+        """Create the registries and the executor."""
+        self.config = FakeConfig(self.config_dir)
+        self.config_entries = FakeConfigEntries([FakeConfigEntry(SOLARMAN_ENTRY_ID, "solarman")])
+        self.entity_registry = FakeEntityRegistry()
+        self.device_registry = FakeDeviceRegistry()
+        self.data[er.DATA_REGISTRY] = self.entity_registry
+        self.data[dr.DATA_REGISTRY] = self.device_registry
+        self.executor = ThreadPoolExecutor(max_workers=self.executor_workers)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running event loop."""
+        return asyncio.get_running_loop()
+
+    def async_add_executor_job(self, target: Callable, *args: Any) -> asyncio.Future:
+        """Run a blocking function in the executor."""
+        return self.loop.run_in_executor(self.executor, target, *args)
+
+    def async_create_task(self, target: Awaitable, name: str | None = None, **kwargs: Any) -> asyncio.Task:
+        """Schedule a coroutine on the event loop."""
+        return self.loop.create_task(target, name=name)
+
+    def async_create_background_task(self, target: Awaitable, name: str, **kwargs: Any) -> asyncio.Task:
+        """Schedule a coroutine that nothing waits for on the event loop."""
+        return self.loop.create_task(target, name=name)
+
+    def async_run_hass_job(self, job: Any, *args: Any) -> asyncio.Task | None:
+        """Run a job's target (as timers and dispatchers do), scheduling it if it is a coroutine."""
+        result = job.target(*args)
+        if asyncio.iscoroutine(result):
+            return self.async_create_task(result)
+        return None
+
+    async def async_stop(self) -> None:
+        """Fire the stop event and let its listeners run."""
+        self.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await asyncio.sleep(0)
+
+    def shutdown(self) -> None:
+        """Stop the executor."""
+        self.executor.shutdown(wait=True)
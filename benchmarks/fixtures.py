@@ -0,0 +1,182 @@
+"""Synthetic Solarman fleet and export fixtures for the benchmarks.
+
+A fleet is a deterministic set of inverters, each with a realistic mix of
+read-only sensors and writable number/select/switch entities. Two exports
+are written per fixture: one of the fleet as generated and one after a
+configurable share of the entities changed value, plus the comparison
+report between them, so that compare and restore can be measured against
+files of a known size and diff.
+
+    python -m benchmarks.fixtures --size 10000 --change-ratio 0.05 --output /tmp/fleet
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from custom_components.solarman_config_manager.compare import compare_export_files
+from custom_components.solarman_config_manager.const import DEFAULT_BACKUP_DIR, SOLARMAN_DOMAIN
+from custom_components.solarman_config_manager.export_io import build_entity_record, write_export
+
+from .fake_hass import (
+    SOLARMAN_ENTRY_ID,
+    FakeDevice,
+    FakeHass,
+    FakeRegistryEntry,
+)
+
+SIZES = (1_000, 10_000, 50_000)
+DEFAULT_CHANGE_RATIO = 0.05
+ENTITIES_PER_DEVICE = 250
+
+# Share of each domain in a Solarman fleet; the rest are sensors
+DOMAIN_MIX = (("number", 0.15), ("select", 0.10), ("switch", 0.05))
+
+SELECT_OPTIONS = ["Selling First", "Zero Export To Load", "Zero Export To CT", "Disabled"]
+
+BASE_EXPORT = "solarman_export_bench_base.json"
+CHANGED_EXPORT = "solarman_export_bench_changed.json"
+COMPARISON = "comparison_bench.json"
+
+
+@dataclass(frozen=True)
+class FleetEntity:
+    """One generated entity: its registry entry, state and attributes."""
+
+    entry: FakeRegistryEntry
+    state: str
+    attributes: dict
+
+
+def _domain(position: float) -> str:
+    """Pick a domain for a position in [0, 1) of a device's entities."""
+    for domain, share in DOMAIN_MIX:
+        if position < share:
+            return domain
+        position -= share
+    return "sensor"
+
+
+def _initial(domain: str, rng: random.Random) -> tuple[str, dict]:
+    """Return a plausible initial state and attributes for a domain."""
+    if domain == "number":
+        return str(rng.randrange(0, 100)), {"min": 0, "max": 100, "step": 1, "mode": "box"}
+    if domain == "select":
+        return rng.choice(SELECT_OPTIONS), {"options": SELECT_OPTIONS}
+    if domain == "switch":
+        return rng.choice(("on", "off")), {}
+    return f"{rng.uniform(0, 5000):.1f}", {"state_class": "measurement"}
+
+
+def _changed(domain: str, state: str, rng: random.Random) -> str:
+    """Return a different valid value for an entity."""
+    if domain == "number":
+        return str((int(state) + rng.randrange(1, 100)) % 100)
+    if domain == "select":
+        return rng.choice([option for option in SELECT_OPTIONS if option != state])
+    if domain == "switch":
+        return "off" if state == "on" else "on"
+    return f"{float(state) + rng.uniform(0.1, 100):.1f}"
+
+
+def generate_fleet(
+    size: int, seed: int = 0, entities_per_device: int = ENTITIES_PER_DEVICE
+) -> list[FleetEntity]:
+    """Generate ``size`` Solarman entities spread over inverters of equal size."""
+    rng = random.Random(seed)
+    fleet = []
+    for number in range(size):
+        device = number // entities_per_device
+        domain = _domain((number % entities_per_device) / entities_per_device)
+        name = f"Inverter {device:03d} Register {number:05d}"
+        state, attributes = _initial(domain, rng)
+        entry = FakeRegistryEntry(
+            entity_id=f"{domain}.inverter_{device:03d}_register_{number:05d}",
+            platform=SOLARMAN_DOMAIN,
+            device_id=f"inverter_{device:03d}",
+            config_entry_id=SOLARMAN_ENTRY_ID,
+            original_name=name,
+            device_class="power" if domain == "sensor" else None,
+            unit_of_measurement="W" if domain in ("sensor", "number") else None,
+        )
+        fleet.append(FleetEntity(entry, state, {"friendly_name": name, **attributes}))
+    return fleet
+
+
+def change_fleet(fleet: list[FleetEntity], change_ratio: float, seed: int = 0) -> list[FleetEntity]:
+    """Return the fleet with ``change_ratio`` of its entities set to a new value."""
+    rng = random.Random(seed + 1)
+    changed = set(rng.sample(range(len(fleet)), round(len(fleet) * change_ratio)))
+    return [
+        FleetEntity(entity.entry, _changed(entity.entry.domain, entity.state, rng), entity.attributes)
+        if position in changed else entity
+        for position, entity in enumerate(fleet)
+    ]
+
+
+def populate(hass: FakeHass, fleet: list[FleetEntity]) -> None:
+    """Register the fleet's devices and entities and set their states."""
+    for entity in fleet:
+        entry = entity.entry
+        if entry.device_id not in hass.device_registry.devices:
+            hass.device_registry.add(FakeDevice(entry.device_id, entry.device_id.replace("_", " ").title()))
+        hass.entity_registry.add(entry)
+        hass.states.async_set(entry.entity_id, entity.state, entity.attributes)
+
+
+def write_fleet_export(path: Path, fleet: list[FleetEntity], export_timestamp: str) -> dict:
+    """Write an export of the fleet as the export service would."""
+    hass = FakeHass(path.parent)
+    try:
+        populate(hass, fleet)
+        records = (
+            build_entity_record(entity.entry, hass.states.get(entity.entry.entity_id))
+            for entity in sorted(fleet, key=lambda e: e.entry.entity_id)
+        )
+        return write_export(path, records, export_timestamp, {"config_only": False})
+    finally:
+        hass.shutdown()
+
+
+def write_fixtures(
+    config_dir: Path,
+    size: int,
+    change_ratio: float = DEFAULT_CHANGE_RATIO,
+    seed: int = 0,
+    entities_per_device: int = ENTITIES_PER_DEVICE,
+) -> Path:
+    """Write the base and changed exports and their comparison; return the backup dir."""
+    backup_dir = config_dir / DEFAULT_BACKUP_DIR
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    fleet = generate_fleet(size, seed, entities_per_device)
+    now = datetime.now(timezone.utc)
+    write_fleet_export(backup_dir / BASE_EXPORT, fleet, now.replace(hour=0).isoformat())
+    write_fleet_export(
+        backup_dir / CHANGED_EXPORT, change_fleet(fleet, change_ratio, seed), now.isoformat()
+    )
+    comparison = compare_export_files(
+        backup_dir / BASE_EXPORT, backup_dir / CHANGED_EXPORT, BASE_EXPORT, CHANGED_EXPORT, True
+    )
+    with open(backup_dir / COMPARISON, "w", encoding="utf-8") as f:
+        json.dump(comparison, f, indent=2, ensure_ascii=False)
+    return backup_dir
+
+
+def main() -> None:
+    """Write fixtures from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=SIZES[0])
+    parser.add_argument("--change-ratio", type=float, default=DEFAULT_CHANGE_RATIO)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, required=True, help="config directory to write to")
+    args = parser.parse_args()
+    backup_dir = write_fixtures(args.output, args.size, args.change_ratio, args.seed)
+    print(f"Wrote {args.size} entity fixtures to {backup_dir}")
+
+
+if __name__ == "__main__":
+    main()
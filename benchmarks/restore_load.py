@@ -0,0 +1,156 @@
+"""Measure restore throughput, tail latency and failure handling against simulated inverters.
+
+A fleet is generated and changed as for the benchmarks, then the fixture
+comparison is reverted through the restore path while every write goes to a
+simulated inverter with the given latency, jitter and failure rate. The run
+reports overall and per-inverter throughput, write latency percentiles (lock
+wait included), and checks that:
+
+- no inverter ever served two writes at once
+- every failure the inverters injected was reported as a failed write
+- after the restore only the failed writes are still pending
+
+    python -m benchmarks.restore_load --devices 4 --latency-ms 80 --jitter-ms 30 --failure-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from custom_components.solarman_config_manager.export_io import open_export_text
+from custom_components.solarman_config_manager.restore import (
+    build_restore_plan,
+    split_already_at_target,
+)
+
+from .fake_hass import FakeHass
+from .fixtures import COMPARISON, change_fleet, generate_fleet, populate, write_fixtures
+from .scenarios import async_restore, async_setup_integration
+from .simulator import InverterProfile, SimulatedSolarman
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def async_run_load(args: argparse.Namespace, config_dir: Path) -> dict[str, Any]:
+    """Run one restore against the simulated inverters and collect the results."""
+    size = args.devices * args.entities_per_device
+    backup_dir = write_fixtures(
+        config_dir, size, args.change_ratio, args.seed, args.entities_per_device
+    )
+    hass = FakeHass(config_dir)
+    try:
+        populate(hass, change_fleet(
+            generate_fleet(size, args.seed, args.entities_per_device), args.change_ratio, args.seed
+        ))
+        profile = InverterProfile(
+            latency=args.latency_ms / 1000,
+            jitter=args.jitter_ms / 1000,
+            failure_rate=args.failure_rate,
+        )
+        solarman = SimulatedSolarman(hass, profile, args.seed)
+        await async_setup_integration(hass)
+
+        started = time.perf_counter()
+        result = await async_restore(hass, backup_dir, {
+            "max_concurrency": args.max_concurrency,
+            "writes_per_second": args.writes_per_second,
+        })
+        duration = time.perf_counter() - started
+
+        # Whatever is still not at target must be exactly the failed writes
+        with open_export_text(backup_dir / COMPARISON) as f:
+            planned, _ = build_restore_plan(json.load(f)["changes"], "revert")
+        pending, _ = split_already_at_target(hass, planned)
+    finally:
+        await hass.async_stop()
+        hass.shutdown()
+
+    inverters = solarman.inverters.values()
+    latencies = solarman.latencies
+    device_rates = [
+        stats["writes_per_second"] for stats in result["devices"].values()
+        if stats["writes_per_second"] is not None
+    ]
+    return {
+        "devices": args.devices,
+        "planned": result["planned"],
+        "succeeded": result["writes"],
+        "failed": result["failed"],
+        "injected_failures": sum(inverter.failures for inverter in inverters),
+        "pending_after_restore": len(pending),
+        "max_in_flight_per_device": max((inverter.max_in_flight for inverter in inverters), default=0),
+        "duration_s": round(duration, 3),
+        "throughput_wps": round(result["planned"] / duration, 2) if duration > 0 else None,
+        "device_throughput_wps": {
+            "min": min(device_rates, default=None),
+            "median": statistics.median(device_rates) if device_rates else None,
+            "max": max(device_rates, default=None),
+        },
+        "latency_ms": {
+            name: round(percentile(latencies, percent) * 1000, 1)
+            for name, percent in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "lock_wait_p95_ms": round(percentile(solarman.lock_waits, 95) * 1000, 1),
+    }
+
+
+def check(report: dict[str, Any]) -> list[str]:
+    """Return a message for every consistency check the run failed."""
+    problems = []
+    if report["max_in_flight_per_device"] > 1:
+        problems.append(f"an inverter served {report['max_in_flight_per_device']} writes at once")
+    if report["failed"] != report["injected_failures"]:
+        problems.append(
+            f"{report['injected_failures']} failures injected but {report['failed']} reported"
+        )
+    if report["pending_after_restore"] != report["failed"]:
+        problems.append(
+            f"{report['pending_after_restore']} entities not at target after restore, "
+            f"{report['failed']} writes failed"
+        )
+    return problems
+
+
+def main() -> int:
+    """Run the load test and return the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--entities-per-device", type=int, default=250)
+    parser.add_argument("--change-ratio", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=1)
+    parser.add_argument("--writes-per-second", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="log every restore write")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory(prefix="solarman_load_") as config_dir:
+        report = asyncio.run(async_run_load(args, Path(config_dir)))
+    print(json.dumps(report, indent=2))
+
+    problems = check(report)
+    for problem in problems:
+        print(f"CHECK FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Run the export, compare and restore benchmarks and check them against budgets.
+
+Every (scenario, size) case runs in a fresh process, so peak RSS is that of
+the case alone. For each case the runner reports:
+
+- wall time of the service run
+- peak RSS of the process and its growth during the service run
+- event-loop blocking: the total time the loop was late by more than
+  LOOP_LAG_THRESHOLD, and the longest single stall
+
+Budgets are read from budgets.json (or --budgets) as
+``{scenario: {size: {metric: limit}}}``; the runner exits with status 1 if
+any measured metric exceeds its limit.
+
+    python -m benchmarks.run --sizes 1000 10000 --change-ratio 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from custom_components.solarman_config_manager.const import DEFAULT_BACKUP_DIR
+
+from .fake_hass import FakeHass
+from .fixtures import DEFAULT_CHANGE_RATIO, SIZES, write_fixtures
+from .scenarios import SCENARIOS, async_prepare
+
+DEFAULT_BUDGETS = Path(__file__).with_name("budgets.json")
+
+LOOP_TICK = 0.005
+LOOP_LAG_THRESHOLD = 0.01
+
+METRICS = ("wall_s", "peak_rss_mb", "rss_growth_mb", "loop_blocked_ms", "max_stall_ms")
+
+
+def _peak_rss_mb() -> float:
+    """Return the peak RSS of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoopMonitor:
+    """Measure how long the event loop is kept from running other tasks."""
+
+    def __init__(self) -> None:
+        """Initialize the monitor."""
+        self.blocked = 0.0
+        self.max_stall = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_TICK
+            await asyncio.sleep(LOOP_TICK)
+            lag = loop.time() - expected
+            if lag > LOOP_LAG_THRESHOLD:
+                self.blocked += lag
+                self.max_stall = max(self.max_stall, lag)
+
+    async def __aenter__(self) -> LoopMonitor:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        # Let the ticker start before the measured work
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def _async_run_case(scenario: str, config_dir: Path, size: int, change_ratio: float) -> dict[str, Any]:
+    """Set up the integration on a fake hass with the fleet and measure one service call."""
+    backup_dir = config_dir / DEFAULT_BACKUP_DIR
+    hass = FakeHass(config_dir)
+    try:
+        context = await async_prepare(hass, backup_dir, size, change_ratio)
+        # Garbage left by generating the fleet is not charged to the service
+        gc.collect()
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        async with LoopMonitor() as monitor:
+            result = await SCENARIOS[scenario](hass, backup_dir, context)
+        wall = time.perf_counter() - started
+        peak = _peak_rss_mb()
+    finally:
+        await hass.async_stop()
+        hass.shutdown()
+    return {
+        "scenario": scenario,
+        "size": size,
+        "wall_s": round(wall, 3),
+        "peak_rss_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - rss_before, 1),
+        "loop_blocked_ms": round(monitor.blocked * 1000, 1),
+        "max_stall_ms": round(monitor.max_stall * 1000, 1),
+        "result": result,
+    }
+
+
+def run_case(scenario: str, config_dir: str, size: int, change_ratio: float) -> dict[str, Any]:
+    """Process entry point for one benchmark case."""
+    return asyncio.run(_async_run_case(scenario, Path(config_dir), size, change_ratio))
+
+
+def check_budgets(results: list[dict[str, Any]], budgets: dict[str, Any]) -> list[str]:
+    """Return a message for every metric that exceeds its budget."""
+    violations = []
+    for case in results:
+        limits = budgets.get(case["scenario"], {}).get(str(case["size"]), {})
+        for metric, limit in limits.items():
+            if case.get(metric) is not None and case[metric] > limit:
+                violations.append(
+                    f"{case['scenario']} @ {case['size']}: {metric} {case[metric]} exceeds budget {limit}"
+                )
+    return violations
+
+
+def main() -> int:
+    """Run the benchmarks and return the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--change-ratio", type=float, default=DEFAULT_CHANGE_RATIO)
+    parser.add_argument("--budgets", type=Path, default=DEFAULT_BUDGETS)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    budgets = json.loads(args.budgets.read_text()) if args.budgets.exists() else {}
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    print(f"{'scenario':<10}{'size':>8}" + "".join(f"{metric:>17}" for metric in METRICS))
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="solarman_bench_") as config_dir:
+            write_fixtures(Path(config_dir), size, args.change_ratio)
+            for scenario in args.scenarios:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    case = pool.submit(run_case, scenario, config_dir, size, args.change_ratio).result()
+                results.append(case)
+                print(f"{scenario:<10}{size:>8}" + "".join(f"{case[metric]:>17}" for metric in METRICS))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    violations = check_budgets(results, budgets)
+    for violation in violations:
+        print(f"BUDGET EXCEEDED: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Benchmark scenarios for the export, compare and restore services.
+
+The integration is set up on a ``FakeHass`` holding the generated fleet
+through its own ``async_setup``, and each scenario makes one call to the
+registered service, so the measured run is the handler itself: the backup
+index, timeline, comparison cache, timings and notifications included.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from custom_components.solarman_config_manager import async_setup
+from custom_components.solarman_config_manager.const import (
+    DOMAIN,
+    SERVICE_COMPARE_EXPORTS,
+    SERVICE_EXPORT_CONFIG,
+    SERVICE_RESTORE_FROM_COMPARISON,
+)
+
+from .fake_hass import FakeHass, FakeServiceCall
+from .fixtures import BASE_EXPORT, CHANGED_EXPORT, COMPARISON, change_fleet, generate_fleet, populate
+
+# Restore writes as fast as the service schema allows
+RESTORE_MAX_CONCURRENCY = 16
+RESTORE_WRITES_PER_SECOND = 100.0
+
+
+def register_entity_services(hass: FakeHass) -> None:
+    """Register number/select/switch services that write straight to the state machine."""
+
+    async def set_value(call: FakeServiceCall) -> None:
+        hass.states.async_set(call.data["entity_id"], call.data["value"])
+
+    async def select_option(call: FakeServiceCall) -> None:
+        hass.states.async_set(call.data["entity_id"], call.data["option"])
+
+    async def turn_on(call: FakeServiceCall) -> None:
+        hass.states.async_set(call.data["entity_id"], "on")
+
+    async def turn_off(call: FakeServiceCall) -> None:
+        hass.states.async_set(call.data["entity_id"], "off")
+
+    hass.services.async_register("number", "set_value", set_value)
+    hass.services.async_register("select", "select_option", select_option)
+    hass.services.async_register("switch", "turn_on", turn_on)
+    hass.services.async_register("switch", "turn_off", turn_off)
+
+
+async def async_setup_integration(hass: FakeHass) -> None:
+    """Set up the integration on ``hass`` with its default configuration."""
+    if not await async_setup(hass, {DOMAIN: None}):
+        raise RuntimeError(f"{DOMAIN} failed to set up")
+
+
+async def async_prepare(hass: FakeHass, backup_dir: Path, size: int, change_ratio: float) -> dict[str, Any]:
+    """Load the live fleet (as of the changed export) into ``hass`` and set up the integration."""
+    populate(hass, change_fleet(generate_fleet(size), change_ratio))
+    register_entity_services(hass)
+    await async_setup_integration(hass)
+    return {}
+
+
+async def async_call_service(hass: FakeHass, service: str, data: dict[str, Any]) -> dict[str, Any]:
+    """Call one of the integration's services and return its response."""
+    return await hass.services.async_call(DOMAIN, service, data, blocking=True, return_response=True)
+
+
+async def async_export(hass: FakeHass, backup_dir: Path, context: dict[str, Any]) -> dict[str, Any]:
+    """Export every entity through export_config."""
+    response = await async_call_service(hass, SERVICE_EXPORT_CONFIG, {
+        "filename": f"solarman_export_bench_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json",
+    })
+    return {"entities": response["total_entities"]}
+
+
+async def async_compare(hass: FakeHass, backup_dir: Path, context: dict[str, Any]) -> dict[str, Any]:
+    """Compare the two fixture exports through compare_exports, saving the report."""
+    response = await async_call_service(hass, SERVICE_COMPARE_EXPORTS, {
+        "file1": BASE_EXPORT,
+        "file2": CHANGED_EXPORT,
+        "config_only": True,
+    })
+    return {"changed": response["summary"]["changed"], "cached": response["cached"]}
+
+
+async def async_restore(hass: FakeHass, backup_dir: Path, context: dict[str, Any]) -> dict[str, Any]:
+    """Revert the fixture comparison through restore_from_comparison."""
+    response = await async_call_service(hass, SERVICE_RESTORE_FROM_COMPARISON, {
+        "comparison_file": COMPARISON,
+        "direction": "revert",
+        "confirm": "CONFIRM",
+        "max_concurrency": context.get("max_concurrency", RESTORE_MAX_CONCURRENCY),
+        "writes_per_second": context.get("writes_per_second", RESTORE_WRITES_PER_SECOND),
+    })
+    return {
+        "planned": response["success"] + response["failed"],
+        "writes": response["success"],
+        "failed": response["failed"],
+        "skipped": response["skipped"],
+        "already_at_target": response["already_at_target"],
+        "devices": response["devices"],
+    }
+
+
+SCENARIOS: dict[str, Callable[[FakeHass, Path, dict[str, Any]], Awaitable[dict[str, Any]]]] = {
+    "export": async_export,
+    "compare": async_compare,
+    "restore": async_restore,
+}
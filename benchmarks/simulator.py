@@ -0,0 +1,112 @@
+"""Simulated Solarman inverters for end-to-end restore testing.
+
+Each simulated inverter owns the writable entities of one device in the fake
+entity registry (platform "solarman") and answers the number, select and
+switch services the restore issues. Like a real Modbus logger it handles one
+write at a time: a write waits for the inverter's lock, then takes the
+configured latency plus uniform jitter, and fails with the configured
+probability, leaving the entity unchanged.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+
+from .fake_hass import FakeHass, FakeServiceCall
+
+
+class ModbusWriteError(Exception):
+    """A simulated write that the inverter did not acknowledge."""
+
+
+@dataclass(frozen=True)
+class InverterProfile:
+    """Write behaviour shared by the simulated inverters."""
+
+    latency: float = 0.05
+    jitter: float = 0.02
+    failure_rate: float = 0.0
+
+
+@dataclass
+class SimulatedInverter:
+    """One inverter: a Modbus lock and a record of every write it served."""
+
+    device_id: str
+    profile: InverterProfile
+    rng: random.Random
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    latencies: list[float] = field(default_factory=list)
+    lock_waits: list[float] = field(default_factory=list)
+    writes: int = 0
+    failures: int = 0
+    max_in_flight: int = 0
+    _in_flight: int = 0
+
+    async def async_write(self, hass: FakeHass, entity_id: str, value: str) -> None:
+        """Write a value, holding the Modbus lock for the duration of the transfer."""
+        requested = time.perf_counter()
+        async with self.lock:
+            acquired = time.perf_counter()
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            try:
+                delay = self.profile.latency + self.rng.uniform(-1, 1) * self.profile.jitter
+                await asyncio.sleep(max(0.0, delay))
+                self.writes += 1
+                if self.rng.random() < self.profile.failure_rate:
+                    self.failures += 1
+                    raise ModbusWriteError(f"No response from {self.device_id} writing {entity_id}")
+                hass.states.async_set(entity_id, value)
+            finally:
+                self._in_flight -= 1
+                finished = time.perf_counter()
+                self.lock_waits.append(acquired - requested)
+                self.latencies.append(finished - requested)
+
+
+class SimulatedSolarman:
+    """Route number/select/switch service calls to the simulated inverters."""
+
+    def __init__(self, hass: FakeHass, profile: InverterProfile, seed: int = 0) -> None:
+        """Create one inverter per device in the registry and register the services."""
+        self.hass = hass
+        self.inverters: dict[str, SimulatedInverter] = {
+            device_id: SimulatedInverter(device_id, profile, random.Random(f"{seed}:{device_id}"))
+            for device_id in hass.device_registry.devices
+        }
+        hass.services.async_register("number", "set_value", self._async_set_value)
+        hass.services.async_register("select", "select_option", self._async_select_option)
+        hass.services.async_register("switch", "turn_on", self._async_turn_on)
+        hass.services.async_register("switch", "turn_off", self._async_turn_off)
+
+    async def _async_write(self, call: FakeServiceCall, value: str) -> None:
+        entity_id = call.data["entity_id"]
+        entry = self.hass.entity_registry.async_get(entity_id)
+        if entry is None or entry.device_id not in self.inverters:
+            raise ModbusWriteError(f"{entity_id} is not a simulated Solarman entity")
+        await self.inverters[entry.device_id].async_write(self.hass, entity_id, value)
+
+    async def _async_set_value(self, call: FakeServiceCall) -> None:
+        await self._async_write(call, call.data["value"])
+
+    async def _async_select_option(self, call: FakeServiceCall) -> None:
+        await self._async_write(call, call.data["option"])
+
+    async def _async_turn_on(self, call: FakeServiceCall) -> None:
+        await self._async_write(call, "on")
+
+    async def _async_turn_off(self, call: FakeServiceCall) -> None:
+        await self._async_write(call, "off")
+
+    @property
+    def latencies(self) -> list[float]:
+        """Return the latency of every write across all inverters."""
+        return [latency for inverter in self.inverters.values() for latency in inverter.latencies]
+
+    @property
+    def lock_waits(self) -> list[float]:
+        """Return the time every write waited for its inverter's lock."""
+        return [wait for inverter in self.inverters.values() for wait in inverter.lock_waits]
@@ -2,47 +2,277 @@
 import asyncio
 import json
 import logging
-from datetime import datetime
+import os
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import (
+    Event,
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.config_entries import ConfigEntry
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.start import async_at_started
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
     SERVICE_EXPORT_CONFIG,
     SERVICE_COMPARE_EXPORTS,
     SERVICE_RESTORE_FROM_COMPARISON,
+    SERVICE_RESTORE_FROM_EXPORT,
+    SERVICE_LOOKUP_ENTITY,
+    SERVICE_RUN_RETENTION,
+    SERVICE_QUERY_TIMELINE,
+    SERVICE_COMPARE_HISTORY,
+    SERVICE_GET_DETAILS,
+    SERVICE_LIST_BACKUPS,
     DEFAULT_BACKUP_DIR,
-    SOLARMAN_DOMAIN,
+    HISTORY_PREFIX,
+    DEFAULT_RESTORE_MAX_CONCURRENCY,
+    DEFAULT_RESTORE_WRITES_PER_SECOND,
+    PROCESS_POOL_THRESHOLD_BYTES,
+    COMPARISON_CACHE_SIZE,
+    CONF_JOURNAL,
+    CONF_DELTA,
+    CONF_RETENTION,
+    CONF_SNAPSHOTS,
+    CONF_TIMELINE,
+    DEFAULT_SNAPSHOT_DEBOUNCE_SECONDS,
+    DEFAULT_SNAPSHOT_MIN_INTERVAL_MINUTES,
+    DEFAULT_RETENTION_INTERVAL_HOURS,
+    DEFAULT_KEEP_HOURLY,
+    DEFAULT_KEEP_DAILY,
+    DEFAULT_KEEP_WEEKLY,
+    DEFAULT_KEEP_MONTHLY,
+    DEFAULT_KEEP_COMPARISONS_DAYS,
+    RETENTION_MODE_PRUNE,
+    RETENTION_MODE_ARCHIVE,
+    DEFAULT_KEYFRAME_INTERVAL,
+    DELTA_CACHE_SIZE,
+    DEFAULT_JOURNAL_CHECKPOINT_HOURS,
+    DEFAULT_JOURNAL_MAX_RECORDS,
+    DEFAULT_JOURNAL_KEEP_DAYS,
     DOMAIN_SERVICE_MAP,
+    WRITABLE_DOMAINS,
     sanitize_filename,
 )
+from .compare import (
+    ComparisonCache,
+    compare_export_history,
+    create_process_pool,
+    timed_compare_export_files,
+)
+from .export_io import (
+    COMPRESSION_NONE,
+    EXPORT_EXTENSIONS,
+    MemoryExport,
+    build_entity_record,
+    file_content_hash,
+    project_attributes,
+    read_export_values,
+    lookup_entity,
+    open_export_text,
+    write_export,
+)
+from .catalog import CATALOG_FIELDS, list_backups
+from .catalog import async_register_websocket as async_register_catalog_websocket
+from .details import DETAILS_FIELDS, async_register_websocket, page_details
+from .delta import DELTA_EXTENSION, SnapshotStore, is_delta, write_delta
+from .entities import SolarmanEntityCache
+from .index import KIND_EXPORT, BackupIndex, split_extension
+from .journal import ChangeJournal
+from .retention import RetentionManager
+from .snapshots import SnapshotScheduler
+from .timeline import TimelineIndex, export_time
+from .timings import ServiceRun, ServiceTimings
+from .restore import (
+    RestoreScheduler,
+    build_restore_plan,
+    changes_from_snapshot,
+    split_already_at_target,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+JOURNAL_SCHEMA = vol.Schema({
+    vol.Optional(
+        "checkpoint_interval", default=timedelta(hours=DEFAULT_JOURNAL_CHECKPOINT_HOURS)
+    ): cv.positive_time_period,
+    vol.Optional("max_records", default=DEFAULT_JOURNAL_MAX_RECORDS): cv.positive_int,
+    vol.Optional("config_only", default=True): cv.boolean,
+    vol.Optional("keep_days", default=DEFAULT_JOURNAL_KEEP_DAYS): cv.positive_int,
+})
+
+DELTA_SCHEMA = vol.Schema({
+    vol.Optional("keyframe_interval", default=DEFAULT_KEYFRAME_INTERVAL): vol.All(
+        vol.Coerce(int), vol.Range(min=2)
+    ),
+})
+
+def _max_interval_not_below_min(options: dict) -> dict:
+    """Reject a maximum snapshot interval shorter than the minimum interval."""
+    if options.get("max_interval") is not None and options["max_interval"] < options["min_interval"]:
+        raise vol.Invalid("max_interval must not be shorter than min_interval")
+    return options
+
+
+SNAPSHOTS_SCHEMA = vol.All(vol.Schema({
+    vol.Optional(
+        "debounce", default=timedelta(seconds=DEFAULT_SNAPSHOT_DEBOUNCE_SECONDS)
+    ): cv.positive_time_period,
+    vol.Optional(
+        "min_interval", default=timedelta(minutes=DEFAULT_SNAPSHOT_MIN_INTERVAL_MINUTES)
+    ): cv.positive_time_period,
+    vol.Optional("max_interval"): cv.positive_time_period,
+    vol.Optional("config_only", default=True): cv.boolean,
+    vol.Optional("compression", default=COMPRESSION_NONE): vol.In(list(EXPORT_EXTENSIONS)),
+}), _max_interval_not_below_min)
+
+TIMELINE_SCHEMA = vol.Schema({
+    vol.Optional("config_only", default=True): cv.boolean,
+})
+
+KEEP_COUNT = vol.All(vol.Coerce(int), vol.Range(min=-1))
+
+RETENTION_SCHEMA = vol.Schema({
+    vol.Optional(
+        "interval", default=timedelta(hours=DEFAULT_RETENTION_INTERVAL_HOURS)
+    ): cv.positive_time_period,
+    vol.Optional("mode", default=RETENTION_MODE_ARCHIVE): vol.In(
+        [RETENTION_MODE_PRUNE, RETENTION_MODE_ARCHIVE]
+    ),
+    vol.Optional("keep_hourly", default=DEFAULT_KEEP_HOURLY): KEEP_COUNT,
+    vol.Optional("keep_daily", default=DEFAULT_KEEP_DAILY): KEEP_COUNT,
+    vol.Optional("keep_weekly", default=DEFAULT_KEEP_WEEKLY): KEEP_COUNT,
+    vol.Optional("keep_monthly", default=DEFAULT_KEEP_MONTHLY): KEEP_COUNT,
+    vol.Optional("keep_comparisons_days", default=DEFAULT_KEEP_COMPARISONS_DAYS): cv.positive_int,
+})
+
+CONFIG_SCHEMA = vol.Schema({
+    DOMAIN: vol.Maybe(vol.Schema({
+        vol.Optional(CONF_JOURNAL): vol.Maybe(JOURNAL_SCHEMA),
+        vol.Optional(CONF_DELTA): vol.Maybe(DELTA_SCHEMA),
+        vol.Optional(CONF_RETENTION): vol.Maybe(RETENTION_SCHEMA),
+        vol.Optional(CONF_SNAPSHOTS): vol.Maybe(SNAPSHOTS_SCHEMA),
+        vol.Optional(CONF_TIMELINE): vol.Maybe(TIMELINE_SCHEMA),
+    })),
+}, extra=vol.ALLOW_EXTRA)
+
 EXPORT_CONFIG_SCHEMA = vol.Schema({
     vol.Optional("filename"): cv.string,
     vol.Optional("include_unavailable", default=False): cv.boolean,
+    vol.Optional("at"): cv.datetime,
+    vol.Optional("compression", default=COMPRESSION_NONE): vol.In(list(EXPORT_EXTENSIONS)),
+    vol.Optional("compact", default=False): cv.boolean,
+    vol.Optional("config_only", default=False): cv.boolean,
+    vol.Optional("include_attributes"): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("exclude_attributes"): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("profile", default=False): cv.boolean,
 })
 
-COMPARE_EXPORTS_SCHEMA = vol.Schema({
-    vol.Required("file1"): cv.string,
-    vol.Required("file2"): cv.string,
-    vol.Optional("config_only", default=True): cv.boolean,
-})
+COMPARE_EXPORTS_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Exclusive("file1", "source1"): cv.string,
+        vol.Exclusive("time1", "source1"): cv.datetime,
+        vol.Exclusive("file2", "source2"): cv.string,
+        vol.Exclusive("time2", "source2"): cv.datetime,
+        vol.Optional("config_only", default=True): cv.boolean,
+        vol.Optional("use_process_pool"): cv.boolean,
+        vol.Optional("save_report", default=True): cv.boolean,
+        vol.Optional("profile", default=False): cv.boolean,
+    }),
+    cv.has_at_least_one_key("file1", "time1"),
+    cv.has_at_least_one_key("file2", "time2"),
+)
+
+COMPARE_HISTORY_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Exclusive("files", "exports"): vol.All(cv.ensure_list, [cv.string], vol.Length(min=2)),
+        vol.Exclusive("start", "exports"): cv.datetime,
+        vol.Optional("end"): cv.datetime,
+        vol.Optional("config_only", default=True): cv.boolean,
+        vol.Optional("save_report", default=True): cv.boolean,
+        vol.Optional("profile", default=False): cv.boolean,
+    }),
+    cv.has_at_least_one_key("files", "start"),
+)
 
 RESTORE_FROM_COMPARISON_SCHEMA = vol.Schema({
     vol.Required("comparison_file"): cv.string,
     vol.Required("direction"): vol.In(["revert", "apply"]),
     vol.Optional("dry_run", default=False): cv.boolean,
     vol.Required("confirm"): cv.string,
+    vol.Optional("max_concurrency", default=DEFAULT_RESTORE_MAX_CONCURRENCY): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=16)
+    ),
+    vol.Optional("writes_per_second", default=DEFAULT_RESTORE_WRITES_PER_SECOND): vol.All(
+        vol.Coerce(float), vol.Range(min=0.1, max=100)
+    ),
+    vol.Optional("profile", default=False): cv.boolean,
 })
 
+RUN_RETENTION_SCHEMA = vol.Schema({
+    vol.Optional("dry_run", default=False): cv.boolean,
+})
+
+RESTORE_FROM_EXPORT_SCHEMA = vol.Schema({
+    vol.Required("file"): cv.string,
+    vol.Optional("dry_run", default=False): cv.boolean,
+    vol.Required("confirm"): cv.string,
+    vol.Optional("max_concurrency", default=DEFAULT_RESTORE_MAX_CONCURRENCY): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=16)
+    ),
+    vol.Optional("writes_per_second", default=DEFAULT_RESTORE_WRITES_PER_SECOND): vol.All(
+        vol.Coerce(float), vol.Range(min=0.1, max=100)
+    ),
+    vol.Optional("profile", default=False): cv.boolean,
+})
+
+QUERY_TIMELINE_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Required("entity_id"): cv.entity_id,
+        vol.Exclusive("at", "query"): cv.datetime,
+        vol.Exclusive("start", "query"): cv.datetime,
+        vol.Optional("end"): cv.datetime,
+    }),
+    cv.has_at_least_one_key("at", "start"),
+)
+
+LOOKUP_ENTITY_SCHEMA = vol.Schema({
+    vol.Required("file"): cv.string,
+    vol.Required("entity_id"): cv.entity_id,
+})
+
+GET_DETAILS_SCHEMA = vol.Schema(DETAILS_FIELDS)
+
+LIST_BACKUPS_SCHEMA = vol.Schema(CATALOG_FIELDS)
+
+
+def _optional_response(handler):
+    """Wrap a handler so calls waiting for a response fail when it reported an error.
+
+    Handlers report failures through a persistent notification and return
+    None; callers that asked for a response get an exception instead.
+    """
+    async def async_handle(call: ServiceCall) -> ServiceResponse:
+        response = await handler(call)
+        if response is None and call.return_response:
+            raise HomeAssistantError(
+                f"{DOMAIN}.{call.service} did not complete, see the notification for details"
+            )
+        return response
+    
+    return async_handle
+
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the Solarman Config Manager component."""
@@ -55,10 +285,86 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     backup_dir = Path(hass.config.path(DEFAULT_BACKUP_DIR))
     backup_dir.mkdir(exist_ok=True)
     
-    async def handle_export_config(call: ServiceCall) -> None:
+    # Index the backup directory once; services keep it up to date
+    index = BackupIndex(hass, backup_dir)
+    await index.async_load()
+    hass.data[DOMAIN]["index"] = index
+    
+    domain_config = config.get(DOMAIN) or {}
+    
+    # Value timeline per entity, extended by every export
+    timeline_config = domain_config.get(CONF_TIMELINE) or TIMELINE_SCHEMA({})
+    timeline = TimelineIndex(hass, backup_dir, timeline_config["config_only"])
+    await timeline.async_load()
+    hass.data[DOMAIN]["timeline"] = timeline
+    
+    # Solarman registry entries, kept up to date from registry events
+    entity_cache = SolarmanEntityCache(hass)
+    entity_cache.async_load()
+    hass.data[DOMAIN]["entity_cache"] = entity_cache
+    
+    # Content-addressed cache of comparison reports
+    comparison_cache = ComparisonCache(COMPARISON_CACHE_SIZE)
+    
+    # Phase timings of export, compare and restore runs
+    timings = ServiceTimings(hass, backup_dir)
+    hass.data[DOMAIN]["timings"] = timings
+    
+    # Rebuilds delta snapshots; delta exports themselves are opt-in
+    snapshot_store = SnapshotStore(backup_dir, DELTA_CACHE_SIZE)
+    delta_config = None
+    if CONF_DELTA in domain_config:
+        delta_config = domain_config[CONF_DELTA] or DELTA_SCHEMA({})
+    
+    async def async_load_source(filename: str, filepath: Path) -> Path | MemoryExport:
+        """Return an export path, or the rebuilt snapshot of a delta."""
+        if is_delta(filename):
+            return await hass.async_add_executor_job(snapshot_store.load, filepath)
+        return filepath
+    
+    # Retention policy; only runs on a schedule when configured
+    retention = RetentionManager(
+        hass, index, timeline, domain_config.get(CONF_RETENTION) or RETENTION_SCHEMA({})
+    )
+    hass.data[DOMAIN]["retention"] = retention
+    if CONF_RETENTION in domain_config:
+        retention.async_start()
+    
+    # Optional snapshot scheduler, started once all entities have been set up
+    if CONF_SNAPSHOTS in domain_config:
+        snapshot_scheduler = SnapshotScheduler(
+            hass, entity_cache, domain_config[CONF_SNAPSHOTS] or SNAPSHOTS_SCHEMA({})
+        )
+        hass.data[DOMAIN]["snapshot_scheduler"] = snapshot_scheduler
+        
+        async def async_start_snapshots(hass: HomeAssistant) -> None:
+            snapshot_scheduler.async_start()
+        
+        async_at_started(hass, async_start_snapshots)
+    
+    # Optional change journal, started once all entities have been set up
+    journal = None
+    if CONF_JOURNAL in domain_config:
+        journal = ChangeJournal(
+            hass, backup_dir, entity_cache, domain_config[CONF_JOURNAL] or JOURNAL_SCHEMA({})
+        )
+        hass.data[DOMAIN]["journal"] = journal
+        
+        async def async_start_journal(hass: HomeAssistant) -> None:
+            await journal.async_start()
+        
+        async_at_started(hass, async_start_journal)
+    
+    async def handle_export_config(call: ServiceCall) -> ServiceResponse:
         """Handle the export_config service call."""
         filename = call.data.get("filename")
         include_unavailable = call.data.get("include_unavailable", False)
+        compression = call.data.get("compression", COMPRESSION_NONE)
+        compact = call.data.get("compact", False)
+        config_only = call.data.get("config_only", False)
+        include_attributes = call.data.get("include_attributes")
+        exclude_attributes = call.data.get("exclude_attributes")
+        extension = EXPORT_EXTENSIONS[compression]
         
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -70,8 +376,34 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         if not filename:
             filename = f"solarman_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        if not filename.endswith(".json"):
-            filename += ".json"
+        # Between keyframes, only the changes since the newest export are written
+        base = None
+        base_load = 0.0
+        tip = index.latest(KIND_EXPORT) if delta_config else None
+        if tip is not None and tip.stem != split_extension(filename)[0]:
+            base_started = time.perf_counter()
+            try:
+                base = await hass.async_add_executor_job(snapshot_store.load, backup_dir / tip.name)
+            except Exception as e:
+                _LOGGER.warning(f"Cannot rebuild {tip.name}, writing a full keyframe instead: {e}")
+            base_load = time.perf_counter() - base_started
+            if base is not None and base.header.get("chain_length", 0) + 1 >= delta_config["keyframe_interval"]:
+                base = None
+        # Deltas are always written as compact, uncompressed JSON
+        ignored_options = []
+        if base is not None:
+            extension = DELTA_EXTENSION
+            if compression != COMPRESSION_NONE:
+                ignored_options.append("compression")
+            if compact:
+                ignored_options.append("compact")
+            if ignored_options:
+                _LOGGER.warning(
+                    f"Writing a delta export; ignoring {', '.join(ignored_options)}"
+                )
+        
+        # The extension always matches the requested compression (or delta)
+        filename = split_extension(filename)[0] + extension
         
         # Ensure filename stays within backup directory
         filepath = backup_dir / filename
@@ -90,56 +422,118 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         
         _LOGGER.info(f"Exporting Solarman configuration to {filepath}")
         
-        # Get entity registry
-        entity_reg = er.async_get(hass)
-        
-        # Collect all Solarman entities
-        solarman_entities = []
-        for entity in entity_reg.entities.values():
-            if entity.platform == SOLARMAN_DOMAIN:
-                state = hass.states.get(entity.entity_id)
-                if state:
-                    if not include_unavailable and state.state == "unavailable":
-                        continue
-                    
-                    entity_data = {
-                        "entity_id": entity.entity_id,
-                        "name": entity.original_name or entity.name,
-                        "device_class": entity.device_class,
-                        "unit_of_measurement": entity.unit_of_measurement,
-                        "state": state.state,
-                        "attributes": dict(state.attributes),
-                        "last_changed": state.last_changed.isoformat(),
-                        "last_updated": state.last_updated.isoformat(),
-                    }
-                    solarman_entities.append(entity_data)
-        
-        # Prepare export data
-        export_data = {
-            "export_timestamp": datetime.now().isoformat(),
-            "total_entities": len(solarman_entities),
-            "entities": solarman_entities,
-        }
+        at = call.data.get("at")
+        if at is not None and journal is None:
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": "Point-in-time exports require the change journal to be enabled.",
+                    "title": "Solarman Export Failed",
+                    "notification_id": "solarman_config_manager_export_error",
+                },
+            )
+            return
         
-        def save_export():
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+        # Attribute projection is recorded so exports are only compared like for like
+        extra_header = {"config_only": config_only}
+        if include_attributes is not None:
+            extra_header["include_attributes"] = sorted(include_attributes)
+        if exclude_attributes:
+            extra_header["exclude_attributes"] = sorted(exclude_attributes)
         
-        # Write to file using executor
+        run = ServiceRun(SERVICE_EXPORT_CONFIG, call.data.get("profile", False))
+        if base_load:
+            run.add("base_load", base_load)
         try:
-            await hass.async_add_executor_job(save_export)
+            if at is not None:
+                # Rebuild the snapshot from the latest checkpoint plus journal
+                with run.phase("snapshot_rebuild"):
+                    snapshot = await journal.async_snapshot(at)
+                solarman_entities = (
+                    {**e, "attributes": project_attributes(
+                        e.get("attributes", {}), include_attributes, exclude_attributes
+                    )}
+                    for e in snapshot.sorted_entities()
+                    if (include_unavailable or e["state"] != "unavailable")
+                    and (not config_only or e["entity_id"].split(".")[0] in WRITABLE_DOMAINS)
+                )
+                export_timestamp = snapshot.header["export_timestamp"]
+                extra_header["snapshot_type"] = "journal"
+                extra_header["config_only"] = config_only or snapshot.header["config_only"]
+            else:
+                # Pair the cached registry entries with their states on the loop;
+                # records are built lazily while the executor streams them out.
+                # In config-only mode read-only sensors are never captured.
+                with run.phase("registry_scan"):
+                    entries = [
+                        entity for entity in entity_cache.entries()
+                        if not config_only or entity.domain in WRITABLE_DOMAINS
+                    ]
+                with run.phase("state_collection"):
+                    pairs = []
+                    for entity in entries:
+                        state = hass.states.get(entity.entity_id)
+                        if state:
+                            if not include_unavailable and state.state == "unavailable":
+                                continue
+                            pairs.append((entity, state))
+                    pairs.sort(key=lambda pair: pair[0].entity_id)
+                solarman_entities = (
+                    build_entity_record(entity, state, include_attributes, exclude_attributes)
+                    for entity, state in pairs
+                )
+                export_timestamp = datetime.now().isoformat()
             
-            _LOGGER.info(f"Successfully exported {len(solarman_entities)} Solarman entities to {filename}")
+            # Entities whose value changed are added to the timeline index
+            timeline_update = timeline.begin(filename, export_timestamp)
+            # Serialization and write are timed inside the executor job
+            write_timings: dict[str, float] = {}
+            if base is not None:
+                header, snapshot = await hass.async_add_executor_job(
+                    write_delta, filepath, solarman_entities, base, tip.name,
+                    export_timestamp, extra_header, timeline_update.observe, write_timings,
+                )
+                # The next delta is written against this snapshot
+                await hass.async_add_executor_job(snapshot_store.remember, filepath, snapshot)
+            else:
+                # Stream to file using executor (sorted by entity_id, with hashes)
+                header = await hass.async_add_executor_job(
+                    write_export, filepath, solarman_entities, export_timestamp,
+                    extra_header, compression, compact, timeline_update.observe, write_timings,
+                )
+            for phase, seconds in write_timings.items():
+                run.add(phase, seconds)
+            with run.phase("index_update"):
+                await index.async_add(filepath, content_hash=header["content_hash"])
+                await timeline.async_commit(timeline_update)
+            total = header["total_entities"]
+            timing = await timings.async_record(run)
             
+            _LOGGER.info(f"Successfully exported {total} Solarman entities to {filename}")
+            
+            message = f"Successfully exported {total} Solarman entities to:\n{filename}"
+            if ignored_options:
+                message += f"\n\nDelta export: {', '.join(ignored_options)} ignored."
             await hass.services.async_call(
                 "persistent_notification",
                 "create",
                 {
-                    "message": f"Successfully exported {len(solarman_entities)} Solarman entities to:\n{filename}",
+                    "message": message,
                     "title": "Solarman Export Complete",
                     "notification_id": "solarman_config_manager_export",
                 },
             )
+            return {
+                "file": filename,
+                "export_timestamp": export_timestamp,
+                "total_entities": total,
+                "content_hash": header["content_hash"],
+                "snapshot_type": "delta" if base is not None else "full",
+                "ignored_options": ignored_options,
+                "config_only": extra_header["config_only"],
+                "timings": timing,
+            }
         except Exception as e:
             _LOGGER.error(f"Failed to export configuration: {e}")
             await hass.services.async_call(
@@ -151,29 +545,45 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                     "notification_id": "solarman_config_manager_export_error",
                 },
             )
+        finally:
+            run.stop()
     
-    async def handle_compare_exports(call: ServiceCall) -> None:
+    async def handle_compare_exports(call: ServiceCall) -> ServiceResponse:
         """Handle the compare_exports service call."""
-        file1 = call.data["file1"]
-        file2 = call.data["file2"]
+        time1 = call.data.get("time1")
+        time2 = call.data.get("time2")
         config_only = call.data.get("config_only", True)
+        save_report = call.data.get("save_report", True)
         
-        # Sanitize filenames
-        file1 = sanitize_filename(file1)
-        file2 = sanitize_filename(file2)
+        if (time1 is not None or time2 is not None) and journal is None:
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": "Point-in-time comparisons require the change journal to be enabled.",
+                    "title": "Solarman Comparison Failed",
+                    "notification_id": "solarman_config_manager_comparison_error",
+                },
+            )
+            return
+        
+        # Sanitize filenames (point-in-time sides are rebuilt from the journal)
+        file1 = f"journal@{time1.isoformat()}" if time1 is not None else sanitize_filename(call.data["file1"])
+        file2 = f"journal@{time2.isoformat()}" if time2 is not None else sanitize_filename(call.data["file2"])
         
-        if not file1.endswith(".json"):
-            file1 += ".json"
-        if not file2.endswith(".json"):
-            file2 += ".json"
+        # Names may be given without their (possibly compressed) extension
+        if time1 is None:
+            file1 = index.resolve(file1)
+        if time2 is None:
+            file2 = index.resolve(file2)
         
         filepath1 = backup_dir / file1
         filepath2 = backup_dir / file2
         
         # Verify paths are within backup directory
         try:
-            if not filepath1.resolve().is_relative_to(backup_dir.resolve()) or \
-               not filepath2.resolve().is_relative_to(backup_dir.resolve()):
+            if (time1 is None and not filepath1.resolve().is_relative_to(backup_dir.resolve())) or \
+               (time2 is None and not filepath2.resolve().is_relative_to(backup_dir.resolve())):
                 _LOGGER.error(f"Security: Attempted path traversal in comparison")
                 await hass.services.async_call(
                     "persistent_notification",
@@ -191,129 +601,124 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         
         _LOGGER.info(f"Comparing exports: {file1} vs {file2}")
         
-        def load_files():
-            with open(filepath1, "r", encoding="utf-8") as f:
-                d1 = json.load(f)
-            with open(filepath2, "r", encoding="utf-8") as f:
-                d2 = json.load(f)
-            return d1, d2
-
+        async def async_content_hash(name: str, path: Path) -> str:
+            """Return an export's content hash, preferring the one in the index."""
+            entry = index.get(name)
+            if entry and entry.content_hash:
+                return entry.content_hash
+            content_hash = await hass.async_add_executor_job(file_content_hash, path)
+            index.async_set_content_hash(name, content_hash)
+            return content_hash
+        
+        # Very large inputs are diffed in a separate process; the size comes
+        # from the backup index so no extra disk access is needed here
+        use_process_pool = call.data.get("use_process_pool")
+        if use_process_pool is None:
+            sizes = [entry.size for entry in (index.get(file1), index.get(file2)) if entry]
+            use_process_pool = sum(sizes) >= PROCESS_POOL_THRESHOLD_BYTES
+        
+        run = ServiceRun(SERVICE_COMPARE_EXPORTS, call.data.get("profile", False))
         try:
-            # Load both files using executor
-            data1, data2 = await hass.async_add_executor_job(load_files)
-            
-            # Compare entities
-            entities1 = {e["entity_id"]: e for e in data1.get("entities", [])}
-            entities2 = {e["entity_id"]: e for e in data2.get("entities", [])}
-            
-            # Find differences
-            added = set(entities2.keys()) - set(entities1.keys())
-            removed = set(entities1.keys()) - set(entities2.keys())
-            common = set(entities1.keys()) & set(entities2.keys())
-            
-            # Writable entity domains (user-configurable)
-            writable_domains = ["number", "select", "switch", "button", "input_number", "input_select", "input_boolean", "input_text"]
-            
-            changed = []
-            for entity_id in common:
-                e1 = entities1[entity_id]
-                e2 = entities2[entity_id]
-                
-                # If config_only mode, skip read-only sensors
-                if config_only:
-                    domain = entity_id.split(".")[0]
-                    if domain not in writable_domains:
-                        continue
+            with run.phase("load"):
+                source1 = await journal.async_snapshot(time1) if time1 is not None else await async_load_source(file1, filepath1)
+                source2 = await journal.async_snapshot(time2) if time2 is not None else await async_load_source(file2, filepath2)
                 
-                differences = {}
+                # Return the existing report if these exports were compared before
+                cache_key = None
+                cached_filename = None
+                if time1 is None and time2 is None:
+                    cache_key = (
+                        await async_content_hash(file1, filepath1),
+                        await async_content_hash(file2, filepath2),
+                        config_only,
+                    )
+                    cached_filename = comparison_cache.get(cache_key)
+            if cached_filename and index.get(cached_filename):
+                cached_filepath = backup_dir / cached_filename
+                # Bump the mtime so the comparison sensor shows this report again
+                await hass.async_add_executor_job(os.utime, cached_filepath)
+                await index.async_add(cached_filepath, config_only=config_only)
+                timing = await timings.async_record(run)
                 
-                # Compare state
-                if e1.get("state") != e2.get("state"):
-                    differences["state"] = {
-                        "old": e1.get("state"),
-                        "new": e2.get("state")
-                    }
+                _LOGGER.info(f"Reusing cached comparison {cached_filename} for {file1} vs {file2}")
+                await hass.services.async_call(
+                    "persistent_notification",
+                    "create",
+                    {
+                        "message": f"These exports were already compared.\n\nComparison: {cached_filename}",
+                        "title": "Solarman Comparison Complete",
+                        "notification_id": "solarman_config_manager_comparison",
+                    },
+                )
+                if not call.return_response:
+                    return None
                 
-                # Compare key attributes
-                for key in ["name", "device_class", "unit_of_measurement"]:
-                    if e1.get(key) != e2.get(key):
-                        differences[key] = {
-                            "old": e1.get(key),
-                            "new": e2.get(key)
-                        }
+                def load_cached():
+                    with open_export_text(cached_filepath) as f:
+                        return json.load(f)
                 
-                # Compare attributes
-                attrs1 = e1.get("attributes", {})
-                attrs2 = e2.get("attributes", {})
+                return {
+                    "comparison_file": cached_filename,
+                    "cached": True,
+                    **await hass.async_add_executor_job(load_cached),
+                    "timings": timing,
+                }
+            if cached_filename:
+                comparison_cache.discard(cache_key)
+            
+            # Stream both files and merge-join them entirely off the event loop
+            started = time.perf_counter()
+            awaited = 0.0
+            wait_started = time.perf_counter()
+            with run.phase("diff"):
+                if use_process_pool:
+                    if "process_pool" not in hass.data[DOMAIN]:
+                        hass.data[DOMAIN]["process_pool"] = create_process_pool()
+                    comparison, off_loop = await asyncio.get_running_loop().run_in_executor(
+                        hass.data[DOMAIN]["process_pool"],
+                        timed_compare_export_files,
+                        source1, source2, file1, file2, config_only,
+                    )
+                else:
+                    comparison, off_loop = await hass.async_add_executor_job(
+                        timed_compare_export_files, source1, source2, file1, file2, config_only
+                    )
+            awaited += time.perf_counter() - wait_started
+            if cache_key:
+                comparison["file1_hash"] = cache_key[0]
+                comparison["file2_hash"] = cache_key[1]
+            
+            # Save comparison report (callers using the response may skip it)
+            comparison_filename = None
+            if save_report:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                comparison_filename = f"comparison_{timestamp}.json"
+                comparison_filepath = backup_dir / comparison_filename
                 
-                # Remove dynamic attributes that always change
-                for attr_key in ["last_changed", "last_updated", "context_id"]:
-                    attrs1.pop(attr_key, None)
-                    attrs2.pop(attr_key, None)
+                def save_comparison():
+                    with open(comparison_filepath, "w", encoding="utf-8") as f:
+                        json.dump(comparison, f, indent=2, ensure_ascii=False)
                 
-                if attrs1 != attrs2:
-                    # Find specific attribute changes
-                    all_keys = set(attrs1.keys()) | set(attrs2.keys())
-                    attr_changes = {}
-                    for key in all_keys:
-                        if attrs1.get(key) != attrs2.get(key):
-                            attr_changes[key] = {
-                                "old": attrs1.get(key),
-                                "new": attrs2.get(key)
-                            }
-                    if attr_changes:
-                        differences["attributes"] = attr_changes
+                wait_started = time.perf_counter()
+                with run.phase("report_write"):
+                    await hass.async_add_executor_job(save_comparison)
+                    awaited += time.perf_counter() - wait_started
+                    await index.async_add(comparison_filepath, config_only=config_only)
+                if cache_key:
+                    comparison_cache.put(cache_key, comparison_filename)
                 
-                if differences:
-                    changed.append({
-                        "entity_id": entity_id,
-                        "changes": differences
-                    })
-            
-            # Generate comparison report
-            comparison = {
-                "file1": file1,
-                "file2": file2,
-                "config_only": config_only,
-                "export1_timestamp": data1.get("export_timestamp"),
-                "export2_timestamp": data2.get("export_timestamp"),
-                "comparison_time": datetime.now().isoformat(),
-                "summary": {
-                    "total_entities_file1": len(entities1),
-                    "total_entities_file2": len(entities2),
-                    "added": len(added),
-                    "removed": len(removed),
-                    "changed": len(changed),
-                    "unchanged": len(common) - len(changed),
-                },
-                "added_entities": list(added),
-                "removed_entities": list(removed),
-                "changes": {
-                    c["entity_id"]: {
-                        "old_value": c["changes"].get("state", {}).get("old"),
-                        "new_value": c["changes"].get("state", {}).get("new"),
-                        "changed_attributes": list(c["changes"].get("attributes", {}).keys()) if "attributes" in c["changes"] else []
-                    } for c in changed
-                },
-            }
-            
-            # Save comparison report
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            comparison_filename = f"comparison_{timestamp}.json"
-            comparison_filepath = backup_dir / comparison_filename
-            
-            def save_comparison():
-                with open(comparison_filepath, "w", encoding="utf-8") as f:
-                    json.dump(comparison, f, indent=2, ensure_ascii=False)
-            
-            await hass.async_add_executor_job(save_comparison)
-            
-            _LOGGER.info(f"Saved comparison to {comparison_filename}")
+                _LOGGER.info(f"Saved comparison to {comparison_filename}")
+            _LOGGER.info(
+                f"Comparison timing ({'process pool' if use_process_pool else 'executor'}): "
+                f"diff {off_loop:.3f}s off-loop, {awaited:.3f}s awaited in total, "
+                f"{(time.perf_counter() - started - awaited) * 1000:.1f}ms on-loop"
+            )
+            timing = await timings.async_record(run)
             
             # Create notification
             summary = comparison["summary"]
             message = (
-                f"Comparison saved to: {comparison_filename}\n\n"
+                f"{f'Comparison saved to: {comparison_filename}' if comparison_filename else 'Comparison not saved'}\n\n"
                 f"Added: {summary['added']} | "
                 f"Removed: {summary['removed']} | "
                 f"Changed: {summary['changed']} | "
@@ -331,6 +736,7 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                     "notification_id": "solarman_config_manager_comparison",
                 },
             )
+            return {"comparison_file": comparison_filename, "cached": False, **comparison, "timings": timing}
             
         except FileNotFoundError as e:
             error_msg = f"File not found: {e.filename}"
@@ -356,8 +762,232 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                     "notification_id": "solarman_config_manager_comparison_error",
                 },
             )
+        finally:
+            run.stop()
     
-    async def handle_restore_from_comparison(call: ServiceCall) -> None:
+    async def handle_compare_history(call: ServiceCall) -> ServiceResponse:
+        """Handle the compare_history service call."""
+        config_only = call.data.get("config_only", True)
+        save_report = call.data.get("save_report", True)
+        
+        async def async_notify_error(message: str) -> None:
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": message,
+                    "title": "Solarman History Comparison Failed",
+                    "notification_id": "solarman_config_manager_history_error",
+                },
+            )
+        
+        if "files" in call.data:
+            names = [index.resolve(sanitize_filename(name)) for name in call.data["files"]]
+        else:
+            # Every indexed export taken within the range, oldest first
+            start = dt_util.as_utc(call.data["start"])
+            end = dt_util.as_utc(call.data.get("end") or dt_util.now())
+            
+            def taken(backup) -> datetime:
+                if backup.export_timestamp:
+                    return export_time(backup.export_timestamp)
+                return dt_util.utc_from_timestamp(backup.mtime)
+            
+            names = [
+                backup.name
+                for backup in sorted(index.files(KIND_EXPORT), key=taken)
+                if start <= taken(backup) <= end
+            ]
+        
+        if len(names) < 2:
+            await async_notify_error(f"At least two exports are needed, found {len(names)}.")
+            return
+        if not all((backup_dir / name).resolve().is_relative_to(backup_dir.resolve()) for name in names):
+            _LOGGER.error("Security: Attempted path traversal in history comparison")
+            await async_notify_error("Invalid filenames provided.")
+            return
+        
+        _LOGGER.info(f"Comparing {len(names)} exports in one pass: {names[0]} ... {names[-1]}")
+        
+        run = ServiceRun(SERVICE_COMPARE_HISTORY, call.data.get("profile", False))
+        try:
+            with run.phase("load"):
+                sources = [await async_load_source(name, backup_dir / name) for name in names]
+            with run.phase("diff"):
+                report = await hass.async_add_executor_job(
+                    compare_export_history, sources, names, config_only
+                )
+            
+            history_filename = None
+            if save_report:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                history_filename = f"{HISTORY_PREFIX}{timestamp}.json"
+                history_filepath = backup_dir / history_filename
+                
+                def save_history():
+                    with open(history_filepath, "w", encoding="utf-8") as f:
+                        json.dump(report, f, indent=2, ensure_ascii=False)
+                
+                with run.phase("report_write"):
+                    await hass.async_add_executor_job(save_history)
+                    await index.async_add(history_filepath, config_only=config_only)
+            timing = await timings.async_record(run)
+            
+            summary = report["summary"]
+            message = (
+                f"{f'History saved to: {history_filename}' if history_filename else 'History not saved'}\n\n"
+                f"Snapshots: {summary['snapshots']} | "
+                f"Entities changed: {summary['entities_changed']} | "
+                f"Transitions: {summary['transitions']}"
+            )
+            _LOGGER.info(f"History comparison complete: {message}")
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": message,
+                    "title": "Solarman History Comparison Complete",
+                    "notification_id": "solarman_config_manager_history",
+                },
+            )
+            return {"history_file": history_filename, **report, "timings": timing}
+        except FileNotFoundError as e:
+            _LOGGER.error(f"File not found: {e.filename}")
+            await async_notify_error(f"File not found: {e.filename}")
+        except Exception as e:
+            _LOGGER.error(f"Failed to compare export history: {e}")
+            await async_notify_error(f"Failed to compare export history: {e}")
+        finally:
+            run.stop()
+    
+    async def async_execute_restore(
+        call: ServiceCall,
+        planned: list[dict],
+        skipped: list[dict],
+        dry_run: bool,
+        source: dict,
+        run: ServiceRun,
+    ) -> dict:
+        """Apply (or preview) a restore plan, then publish, report and return the result."""
+        results = {
+            "success": [],
+            "failed": [],
+            "skipped": list(skipped),
+            "already_at_target": [],
+        }
+        
+        # Drop writes that would be no-ops against the live state
+        with run.phase("plan"):
+            planned, already_at_target = split_already_at_target(hass, planned)
+        results["already_at_target"].extend(already_at_target)
+        devices = {}
+        
+        if dry_run:
+            for item in planned:
+                _LOGGER.info(f"[DRY RUN] Would call {item['domain']}.{item['service']} with {item['data']}")
+                results["success"].append({
+                    "entity": item["entity"],
+                    "service": f"{item['domain']}.{item['service']}",
+                    "data": item["data"],
+                    "dry_run": True,
+                })
+        elif planned:
+            scheduler = RestoreScheduler(
+                hass,
+                max_concurrency=call.data.get("max_concurrency", DEFAULT_RESTORE_MAX_CONCURRENCY),
+                writes_per_second=call.data.get("writes_per_second", DEFAULT_RESTORE_WRITES_PER_SECOND),
+            )
+            with run.phase("writes"):
+                success, failed, devices = await scheduler.async_run(planned)
+            run.add_samples("service_call", scheduler.latencies)
+            results["success"].extend(success)
+            results["failed"].extend(failed)
+        
+        # Generate summary
+        summary_msg = (
+            f"{'[DRY RUN] ' if dry_run else ''}Restore Summary:\n\n"
+            f"✅ Success: {len(results['success'])}\n"
+            f"❌ Failed: {len(results['failed'])}\n"
+            f"⏭️ Skipped: {len(results['skipped'])}\n"
+            f"🟰 Already at target: {len(results['already_at_target'])}\n\n"
+        )
+        
+        # Show details of what will change (dry run) or what changed
+        if results["success"]:
+            if dry_run:
+                summary_msg += "**Will restore these entities:**\n"
+                for item in results["success"][:10]:  # Show first 10
+                    entity_name = item['entity'].replace('number.', '').replace('select.', '').replace('_', ' ').title()
+                    if 'data' in item:
+                        # Extract the value from service data
+                        value = item['data'].get('value') or item['data'].get('option') or 'on/off'
+                        summary_msg += f"  • {entity_name}: → {value}\n"
+                if len(results["success"]) > 10:
+                    summary_msg += f"  ... and {len(results['success']) - 10} more\n"
+            else:
+                summary_msg += "**Restored entities:**\n"
+                for item in results["success"][:10]:
+                    entity_name = item['entity'].replace('number.', '').replace('select.', '').replace('_', ' ').title()
+                    summary_msg += f"  • {item['entity']}: → {item['value']}\n"
+                if len(results["success"]) > 10:
+                    summary_msg += f"  ... and {len(results['success']) - 10} more\n"
+            summary_msg += "\n"
+        
+        if results["failed"]:
+            summary_msg += "**Failed entities:**\n"
+            for item in results["failed"][:5]:
+                summary_msg += f"  • {item['entity']}: {item['error']}\n"
+            summary_msg += "\n"
+        
+        if results["skipped"] and len(results["skipped"]) <= 5:
+            summary_msg += "**Skipped entities:**\n"
+            for item in results["skipped"]:
+                summary_msg += f"  • {item['entity']}: {item['reason']}\n"
+        
+        if devices:
+            summary_msg += "\n**Per-device throughput:**\n"
+            for stats in devices.values():
+                rate = stats["writes_per_second"]
+                summary_msg += (
+                    f"  • {stats['name']}: {stats['success']}/{stats['writes']} writes "
+                    f"in {stats['duration']}s"
+                    f"{f' ({rate}/s)' if rate is not None else ''}\n"
+                )
+        
+        _LOGGER.info(f"Restore complete: {summary_msg}")
+        
+        # Store result in hass.data for sensor
+        if DOMAIN not in hass.data:
+            hass.data[DOMAIN] = {}
+        restore_result = {
+            "success": len(results["success"]),
+            "failed": len(results["failed"]),
+            "skipped": len(results["skipped"]),
+            "already_at_target": len(results["already_at_target"]),
+            "dry_run": dry_run,
+            **source,
+            "timestamp": datetime.now().isoformat(),
+            "summary": results,
+            "devices": devices,
+            "timings": await timings.async_record(run),
+        }
+        hass.data[DOMAIN]["last_restore_result"] = restore_result
+        
+        # Fire event to trigger sensor update (no condition needed)
+        hass.bus.async_fire(f"{DOMAIN}_restore_complete")
+        
+        await hass.services.async_call(
+            "persistent_notification",
+            "create",
+            {
+                "message": summary_msg,
+                "title": f"Solarman Restore {'(Dry Run) ' if dry_run else ''}Complete",
+                "notification_id": "solarman_config_manager_restore",
+            },
+        )
+        return restore_result
+    
+    async def handle_restore_from_comparison(call: ServiceCall) -> ServiceResponse:
         """Handle the restore_from_comparison service call."""
         comparison_file = call.data["comparison_file"]
         direction = call.data["direction"]
@@ -380,10 +1010,7 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
             return
         
         # Sanitize filename
-        comparison_file = sanitize_filename(comparison_file)
-        
-        if not comparison_file.endswith(".json"):
-            comparison_file += ".json"
+        comparison_file = index.resolve(sanitize_filename(comparison_file))
         
         comparison_filepath = backup_dir / comparison_file
         
@@ -408,12 +1035,14 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         _LOGGER.info(f"{'[DRY RUN] ' if dry_run else ''}Restoring configuration from {comparison_file}, direction={direction}")
         
         def load_comparison():
-            with open(comparison_filepath, "r", encoding="utf-8") as f:
+            with open_export_text(comparison_filepath) as f:
                 return json.load(f)
         
+        run = ServiceRun(SERVICE_RESTORE_FROM_COMPARISON, call.data.get("profile", False))
         try:
             # Load comparison file
-            comparison_data = await hass.async_add_executor_job(load_comparison)
+            with run.phase("load"):
+                comparison_data = await hass.async_add_executor_job(load_comparison)
             
             changes = comparison_data.get("changes", {})
             
@@ -427,154 +1056,34 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                         "notification_id": "solarman_config_manager_restore",
                     },
                 )
-                return
+                return {
+                    "comparison_file": comparison_file,
+                    "dry_run": dry_run,
+                    "changes": 0,
+                    "timings": await timings.async_record(run),
+                }
             
-            results = {
-                "success": [],
-                "failed": [],
-                "skipped": [],
-            }
-            
-            # Process each changed entity
-            for entity_id, change_data in changes.items():
-                domain = entity_id.split(".")[0]
-                
-                # Skip entities we can't restore
-                if domain not in DOMAIN_SERVICE_MAP:
-                    results["skipped"].append({"entity": entity_id, "reason": f"Domain '{domain}' not restorable"})
-                    continue
-                
-                # Get target value based on direction
-                target_value = change_data["old_value"] if direction == "revert" else change_data["new_value"]
-                
-                if target_value is None:
-                    results["skipped"].append({"entity": entity_id, "reason": "Target value is None"})
-                    continue
-                
-                # Convert numeric strings for number domain
-                if domain in ["number", "input_number"] and isinstance(target_value, str):
-                    try:
-                        target_value = float(target_value)
-                    except ValueError:
-                        results["skipped"].append({"entity": entity_id, "reason": f"Invalid number value: {target_value}"})
-                        continue
-                
-                # Build service call
-                service_map = DOMAIN_SERVICE_MAP[domain]
-                
-                # Handle switch/boolean domains
-                if "service_on" in service_map:
-                    if target_value in ["on", "On", "ON", True, "true", "True"]:
-                        service_name = service_map["service_on"]
-                        service_data = {"entity_id": entity_id}
-                    else:
-                        service_name = service_map["service_off"]
-                        service_data = {"entity_id": entity_id}
-                else:
-                    # Handle number/select domains
-                    service_name = service_map["service"]
-                    param_name = service_map["param"]
-                    service_data = {
-                        "entity_id": entity_id,
-                        param_name: target_value,
-                    }
-                
-                if dry_run:
-                    _LOGGER.info(f"[DRY RUN] Would call {domain}.{service_name} with {service_data}")
-                    results["success"].append({
-                        "entity": entity_id,
-                        "service": f"{domain}.{service_name}",
-                        "data": service_data,
-                        "dry_run": True,
-                    })
-                else:
-                    try:
-                        await hass.services.async_call(domain, service_name, service_data, blocking=True)
-                        _LOGGER.info(f"Restored {entity_id} to {target_value}")
-                        results["success"].append({
-                            "entity": entity_id,
-                            "value": target_value,
-                        })
-                        # Small delay to avoid flooding
-                        await asyncio.sleep(0.1)
-                    except Exception as e:
-                        _LOGGER.error(f"Failed to restore {entity_id}: {e}")
-                        results["failed"].append({
-                            "entity": entity_id,
-                            "error": str(e),
-                        })
-            
-            # Generate summary
-            summary_msg = (
-                f"{'[DRY RUN] ' if dry_run else ''}Restore Summary:\n\n"
-                f"✅ Success: {len(results['success'])}\n"
-                f"❌ Failed: {len(results['failed'])}\n"
-                f"⏭️ Skipped: {len(results['skipped'])}\n\n"
+            with run.phase("plan"):
+                planned, skipped = build_restore_plan(changes, direction)
+            return await async_execute_restore(
+                call, planned, skipped, dry_run,
+                {"direction": direction, "comparison_file": comparison_file}, run,
             )
             
-            # Show details of what will change (dry run) or what changed
-            if results["success"]:
-                if dry_run:
-                    summary_msg += "**Will restore these entities:**\n"
-                    for item in results["success"][:10]:  # Show first 10
-                        entity_name = item['entity'].replace('number.', '').replace('select.', '').replace('_', ' ').title()
-                        if 'data' in item:
-                            # Extract the value from service data
-                            value = item['data'].get('value') or item['data'].get('option') or 'on/off'
-                            summary_msg += f"  • {entity_name}: → {value}\n"
-                    if len(results["success"]) > 10:
-                        summary_msg += f"  ... and {len(results['success']) - 10} more\n"
-                else:
-                    summary_msg += "**Restored entities:**\n"
-                    for item in results["success"][:10]:
-                        entity_name = item['entity'].replace('number.', '').replace('select.', '').replace('_', ' ').title()
-                        summary_msg += f"  • {item['entity']}: → {item['value']}\n"
-                    if len(results["success"]) > 10:
-                        summary_msg += f"  ... and {len(results['success']) - 10} more\n"
-                summary_msg += "\n"
-            
-            if results["failed"]:
-                summary_msg += "**Failed entities:**\n"
-                for item in results["failed"][:5]:
-                    summary_msg += f"  • {item['entity']}: {item['error']}\n"
-                summary_msg += "\n"
-            
-            if results["skipped"] and len(results["skipped"]) <= 5:
-                summary_msg += "**Skipped entities:**\n"
-                for item in results["skipped"]:
-                    summary_msg += f"  • {item['entity']}: {item['reason']}\n"
-            
-            _LOGGER.info(f"Restore complete: {summary_msg}")
-            
-            # Store result in hass.data for sensor
-            if DOMAIN not in hass.data:
-                hass.data[DOMAIN] = {}
-            hass.data[DOMAIN]["last_restore_result"] = {
-                "success": len(results["success"]),
-                "failed": len(results["failed"]),
-                "skipped": len(results["skipped"]),
-                "dry_run": dry_run,
-                "direction": direction,
-                "comparison_file": comparison_file,
-                "timestamp": datetime.now().isoformat(),
-                "summary": results,
-            }
-            
-            # Fire event to trigger sensor update (no condition needed)
-            hass.bus.async_fire(f"{DOMAIN}_restore_complete")
-            
+        except FileNotFoundError:
+            error_msg = f"Comparison file not found: {comparison_file}"
+            _LOGGER.error(error_msg)
             await hass.services.async_call(
                 "persistent_notification",
                 "create",
                 {
-                    "message": summary_msg,
-                    "title": f"Solarman Restore {'(Dry Run) ' if dry_run else ''}Complete",
-                    "notification_id": "solarman_config_manager_restore",
+                    "message": error_msg,
+                    "title": "Solarman Restore Failed",
+                    "notification_id": "solarman_config_manager_restore_error",
                 },
             )
-            
-        except FileNotFoundError:
-            error_msg = f"Comparison file not found: {comparison_file}"
+        except Exception as e:
+            error_msg = f"Failed to restore configuration: {e}"
             _LOGGER.error(error_msg)
             await hass.services.async_call(
                 "persistent_notification",
@@ -585,41 +1094,272 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                     "notification_id": "solarman_config_manager_restore_error",
                 },
             )
+        finally:
+            run.stop()
+    
+    async def handle_restore_from_export(call: ServiceCall) -> ServiceResponse:
+        """Handle the restore_from_export service call."""
+        dry_run = call.data.get("dry_run", False)
+        
+        async def async_notify_error(message: str) -> None:
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": message,
+                    "title": "Solarman Restore Failed",
+                    "notification_id": "solarman_config_manager_restore_error",
+                },
+            )
+        
+        if call.data["confirm"] != "CONFIRM":
+            error_msg = "Restore cancelled: You must type 'CONFIRM' to proceed"
+            _LOGGER.warning(error_msg)
+            await hass.services.async_call(
+                "persistent_notification",
+                "create",
+                {
+                    "message": error_msg,
+                    "title": "Solarman Restore Cancelled",
+                    "notification_id": "solarman_config_manager_restore_error",
+                },
+            )
+            return
+        
+        export_file = index.resolve(sanitize_filename(call.data["file"]))
+        export_filepath = backup_dir / export_file
+        if not export_filepath.resolve().is_relative_to(backup_dir.resolve()):
+            _LOGGER.error(f"Security: Attempted path traversal with export file: {export_file}")
+            await async_notify_error("Invalid filename provided.")
+            return
+        
+        _LOGGER.info(f"{'[DRY RUN] ' if dry_run else ''}Restoring configuration from export {export_file}")
+        
+        run = ServiceRun(SERVICE_RESTORE_FROM_EXPORT, call.data.get("profile", False))
+        try:
+            # Only the restorable values are read; the live side is hass.states
+            with run.phase("load"):
+                source = await async_load_source(export_file, export_filepath)
+                values = await hass.async_add_executor_job(
+                    read_export_values, source, DOMAIN_SERVICE_MAP
+                )
+            with run.phase("plan"):
+                changes, skipped = changes_from_snapshot(hass, values, entity_cache.entity_ids)
+                planned, not_restorable = build_restore_plan(changes, "apply")
+            return await async_execute_restore(
+                call, planned, skipped + not_restorable, dry_run,
+                {"direction": "apply", "export_file": export_file}, run,
+            )
+        except FileNotFoundError:
+            error_msg = f"Export file not found: {export_file}"
+            _LOGGER.error(error_msg)
+            await async_notify_error(error_msg)
         except Exception as e:
             error_msg = f"Failed to restore configuration: {e}"
             _LOGGER.error(error_msg)
+            await async_notify_error(error_msg)
+        finally:
+            run.stop()
+    
+    async def handle_lookup_entity(call: ServiceCall) -> ServiceResponse:
+        """Handle the lookup_entity service call."""
+        filename = index.resolve(sanitize_filename(call.data["file"]))
+        filepath = backup_dir / filename
+        if not filepath.resolve().is_relative_to(backup_dir.resolve()):
+            _LOGGER.error(f"Security: Attempted path traversal with lookup file: {filename}")
+            raise HomeAssistantError("Invalid filename provided.")
+        
+        entity_id = call.data["entity_id"]
+        try:
+            if is_delta(filename):
+                snapshot = await async_load_source(filename, filepath)
+                entity = next((e for e in snapshot.entities() if e["entity_id"] == entity_id), None)
+            else:
+                # Seeks straight to the record when the export has a sidecar index
+                entity = await hass.async_add_executor_job(lookup_entity, filepath, entity_id)
+        except FileNotFoundError as e:
+            raise HomeAssistantError(f"File not found: {e.filename}") from e
+        
+        entry = index.get(filename)
+        return {
+            "file": filename,
+            "export_timestamp": entry.export_timestamp if entry else None,
+            "entity_id": entity_id,
+            "found": entity is not None,
+            "entity": entity,
+        }
+    
+    async def handle_run_retention(call: ServiceCall) -> None:
+        """Handle the run_retention service call."""
+        dry_run = call.data.get("dry_run", False)
+        try:
+            result = await retention.async_run(dry_run)
+        except Exception as e:
+            _LOGGER.error(f"Retention run failed: {e}")
             await hass.services.async_call(
                 "persistent_notification",
                 "create",
                 {
-                    "message": error_msg,
-                    "title": "Solarman Restore Failed",
-                    "notification_id": "solarman_config_manager_restore_error",
+                    "message": f"Retention run failed: {e}",
+                    "title": "Solarman Retention Failed",
+                    "notification_id": "solarman_config_manager_retention_error",
                 },
             )
+            return
+        if result is None:
+            return
+        
+        await hass.services.async_call(
+            "persistent_notification",
+            "create",
+            {
+                "message": (
+                    f"{'[DRY RUN] ' if dry_run else ''}{result['files_selected']} files selected, "
+                    f"{result['files_removed']} removed, "
+                    f"{result['bytes_reclaimed'] / 1024 / 1024:.1f} MB reclaimed"
+                ),
+                "title": "Solarman Retention Complete",
+                "notification_id": "solarman_config_manager_retention",
+            },
+        )
+    
+    async def handle_query_timeline(call: ServiceCall) -> ServiceResponse:
+        """Handle the query_timeline service call."""
+        entity_id = call.data["entity_id"]
+        
+        def to_time(value: datetime) -> float:
+            """Return a timestamp for a service datetime (naive times are local)."""
+            return dt_util.as_utc(value).timestamp()
+        
+        def describe(entry) -> dict:
+            """Return the response form of a timeline entry."""
+            return {
+                "time": dt_util.utc_from_timestamp(entry.time).isoformat(),
+                "value": entry.state,
+                "file": entry.file,
+            }
+        
+        if (at := call.data.get("at")) is not None:
+            entry = timeline.entry_at(entity_id, to_time(at))
+            return {
+                "entity_id": entity_id,
+                "at": at.isoformat(),
+                "found": entry is not None,
+                "value": entry.state if entry else None,
+                "since": describe(entry)["time"] if entry else None,
+                "file": entry.file if entry else None,
+            }
+        
+        start = call.data["start"]
+        end = call.data.get("end") or dt_util.now()
+        entries = timeline.entries_between(entity_id, to_time(start), to_time(end))
+        return {
+            "entity_id": entity_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "timeline": [describe(entry) for entry in entries],
+        }
+    
+    async def handle_get_details(call: ServiceCall) -> ServiceResponse:
+        """Handle the get_details service call."""
+        return page_details(hass, call.data["section"], call.data["offset"], call.data["limit"])
+    
+    async def handle_list_backups(call: ServiceCall) -> ServiceResponse:
+        """Handle the list_backups service call."""
+        return list_backups(hass, call.data)
     
     # Register services
     hass.services.async_register(
         DOMAIN,
         SERVICE_EXPORT_CONFIG,
-        handle_export_config,
+        _optional_response(handle_export_config),
         schema=EXPORT_CONFIG_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
     
     hass.services.async_register(
         DOMAIN,
         SERVICE_COMPARE_EXPORTS,
-        handle_compare_exports,
+        _optional_response(handle_compare_exports),
         schema=COMPARE_EXPORTS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_COMPARE_HISTORY,
+        _optional_response(handle_compare_history),
+        schema=COMPARE_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
     
     hass.services.async_register(
         DOMAIN,
         SERVICE_RESTORE_FROM_COMPARISON,
-        handle_restore_from_comparison,
+        _optional_response(handle_restore_from_comparison),
         schema=RESTORE_FROM_COMPARISON_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
     
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RESTORE_FROM_EXPORT,
+        _optional_response(handle_restore_from_export),
+        schema=RESTORE_FROM_EXPORT_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RUN_RETENTION,
+        handle_run_retention,
+        schema=RUN_RETENTION_SCHEMA,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_QUERY_TIMELINE,
+        handle_query_timeline,
+        schema=QUERY_TIMELINE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_LOOKUP_ENTITY,
+        handle_lookup_entity,
+        schema=LOOKUP_ENTITY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_DETAILS,
+        handle_get_details,
+        schema=GET_DETAILS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_LIST_BACKUPS,
+        handle_list_backups,
+        schema=LIST_BACKUPS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    
+    # The same pages, for dashboards and cards that talk to the websocket API
+    async_register_websocket(hass)
+    async_register_catalog_websocket(hass)
+    
+    async def async_shutdown_process_pool(event: Event) -> None:
+        """Shut down the comparison process pool when Home Assistant stops."""
+        pool = hass.data[DOMAIN].pop("process_pool", None)
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_shutdown_process_pool)
+    
     # Load sensors
     from homeassistant.helpers import discovery
     hass.async_create_task(
@@ -641,4 +1381,32 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.services.async_remove(DOMAIN, SERVICE_EXPORT_CONFIG)
     hass.services.async_remove(DOMAIN, SERVICE_COMPARE_EXPORTS)
     hass.services.async_remove(DOMAIN, SERVICE_RESTORE_FROM_COMPARISON)
+    hass.services.async_remove(DOMAIN, SERVICE_RESTORE_FROM_EXPORT)
+    hass.services.async_remove(DOMAIN, SERVICE_LOOKUP_ENTITY)
+    hass.services.async_remove(DOMAIN, SERVICE_RUN_RETENTION)
+    hass.services.async_remove(DOMAIN, SERVICE_QUERY_TIMELINE)
+    hass.services.async_remove(DOMAIN, SERVICE_COMPARE_HISTORY)
+    hass.services.async_remove(DOMAIN, SERVICE_GET_DETAILS)
+    hass.services.async_remove(DOMAIN, SERVICE_LIST_BACKUPS)
+    
+    index = hass.data.get(DOMAIN, {}).get("index")
+    if index:
+        index.async_shutdown()
+    
+    entity_cache = hass.data.get(DOMAIN, {}).get("entity_cache")
+    if entity_cache:
+        entity_cache.async_shutdown()
+    
+    retention = hass.data.get(DOMAIN, {}).get("retention")
+    if retention:
+        retention.async_shutdown()
+    
+    snapshot_scheduler = hass.data.get(DOMAIN, {}).get("snapshot_scheduler")
+    if snapshot_scheduler:
+        snapshot_scheduler.async_shutdown()
+    
+    journal = hass.data.get(DOMAIN, {}).get("journal")
+    if journal:
+        journal.async_shutdown()
+        await journal.async_flush()
     return True
@@ -0,0 +1,225 @@
+"""Sorted, filtered and paged listing of the backup index.
+
+The catalog keeps one sorted list of (sort value, file name) per sort field
+and filter combination that has been queried, and updates those lists as
+files are added and removed. A page is then a bisect plus a slice of the
+matching list: O(log n + page size), however many backups there are. Only
+a date range combined with a sort other than by timestamp is filtered by
+scanning the list.
+"""
+from __future__ import annotations
+
+import bisect
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    CATALOG_MAX_VIEWS,
+    DETAILS_PAGE_SIZE,
+    DETAILS_MAX_PAGE_SIZE,
+    KIND_EXPORT,
+    KIND_COMPARISON,
+    KIND_HISTORY,
+)
+
+if TYPE_CHECKING:
+    # The index imports the catalog
+    from .index import BackupFile
+
+SORT_TIMESTAMP = "timestamp"
+SORT_NAME = "name"
+SORT_SIZE = "size"
+SORT_ENTITIES = "entities"
+
+SORT_KEYS: dict[str, Callable[[BackupFile], Any]] = {
+    SORT_TIMESTAMP: lambda f: f.time,
+    SORT_NAME: lambda f: f.name,
+    SORT_SIZE: lambda f: f.size,
+    SORT_ENTITIES: lambda f: f.total_entities or 0,
+}
+
+CATALOG_FIELDS = {
+    vol.Optional("kind"): vol.In([KIND_EXPORT, KIND_COMPARISON, KIND_HISTORY]),
+    vol.Optional("device_id"): cv.string,
+    vol.Optional("config_only"): cv.boolean,
+    vol.Optional("start"): cv.datetime,
+    vol.Optional("end"): cv.datetime,
+    vol.Optional("sort_by", default=SORT_TIMESTAMP): vol.In(list(SORT_KEYS)),
+    vol.Optional("descending", default=True): cv.boolean,
+    vol.Optional("offset", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional("limit", default=DETAILS_PAGE_SIZE): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=DETAILS_MAX_PAGE_SIZE)
+    ),
+}
+
+_first = itemgetter(0)
+
+
+class ViewKey(NamedTuple):
+    """The sort field and filters a catalog view is built for."""
+
+    sort_by: str
+    kind: str | None
+    device_id: str | None
+    config_only: bool | None
+
+    def matches(self, entry: BackupFile) -> bool:
+        """Return True if a file passes this view's filters."""
+        return (
+            (self.kind is None or entry.kind == self.kind)
+            and (self.device_id is None or self.device_id in entry.devices)
+            and (self.config_only is None or entry.config_only == self.config_only)
+        )
+
+    def item(self, entry: BackupFile) -> tuple[Any, str]:
+        """Return a file's position in this view."""
+        return SORT_KEYS[self.sort_by](entry), entry.name
+
+
+class BackupCatalog:
+    """Sorted views of the backup index, kept up to date as files change."""
+
+    def __init__(self) -> None:
+        """Initialize the catalog."""
+        self._views: dict[ViewKey, list[tuple[Any, str]]] = {}
+
+    @callback
+    def clear(self) -> None:
+        """Drop all views; they are rebuilt when next queried."""
+        self._views.clear()
+
+    @callback
+    def add(self, entry: BackupFile) -> None:
+        """Insert a file into every view it matches."""
+        for key, view in self._views.items():
+            if key.matches(entry):
+                bisect.insort(view, key.item(entry))
+
+    @callback
+    def remove(self, entry: BackupFile) -> None:
+        """Remove a file from every view it is in."""
+        for key, view in self._views.items():
+            if key.matches(entry):
+                item = key.item(entry)
+                position = bisect.bisect_left(view, item)
+                if position < len(view) and view[position] == item:
+                    del view[position]
+
+    def _view(self, files: dict[str, BackupFile], key: ViewKey) -> list[tuple[Any, str]]:
+        """Return the view for a key, building it on first use."""
+        view = self._views.pop(key, None)
+        if view is None:
+            view = sorted(key.item(entry) for entry in files.values() if key.matches(entry))
+            if len(self._views) >= CATALOG_MAX_VIEWS:
+                # Least recently used first, as views are re-inserted on use
+                del self._views[next(iter(self._views))]
+        self._views[key] = view
+        return view
+
+    def query(
+        self,
+        files: dict[str, BackupFile],
+        *,
+        kind: str | None = None,
+        device_id: str | None = None,
+        config_only: bool | None = None,
+        start: float | None = None,
+        end: float | None = None,
+        sort_by: str = SORT_TIMESTAMP,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = DETAILS_PAGE_SIZE,
+    ) -> tuple[int, list[BackupFile]]:
+        """Return the number of matching files and one page of them.
+
+        ``start`` and ``end`` are POSIX timestamps and bound the time the
+        backup was taken (inclusive).
+        """
+        view = self._view(files, ViewKey(sort_by, kind, device_id, config_only))
+        if sort_by == SORT_TIMESTAMP:
+            low = 0 if start is None else bisect.bisect_left(view, start, key=_first)
+            high = len(view) if end is None else bisect.bisect_right(view, end, key=_first)
+        elif start is not None or end is not None:
+            view = [
+                item for item in view
+                if (start is None or files[item[1]].time >= start)
+                and (end is None or files[item[1]].time <= end)
+            ]
+            low, high = 0, len(view)
+        else:
+            low, high = 0, len(view)
+
+        total = max(0, high - low)
+        if descending:
+            page = view[max(low, high - offset - limit):max(low, high - offset)][::-1]
+        else:
+            page = view[low + offset:min(high, low + offset + limit)]
+        return total, [files[name] for _, name in page]
+
+
+def describe(entry: BackupFile) -> dict[str, Any]:
+    """Return the response form of a catalog entry."""
+    return {
+        "file": entry.name,
+        "stem": entry.stem,
+        "kind": entry.kind,
+        "timestamp": dt_util.as_local(dt_util.utc_from_timestamp(entry.time)).isoformat(),
+        "size": entry.size,
+        "entities": entry.total_entities,
+        "content_hash": entry.content_hash,
+        "config_only": entry.config_only,
+        "devices": list(entry.devices),
+    }
+
+
+def list_backups(hass: HomeAssistant, options: dict[str, Any]) -> dict[str, Any]:
+    """Return one page of the backup catalog for validated CATALOG_FIELDS options."""
+    index = hass.data.get(DOMAIN, {}).get("index")
+
+    def to_time(value) -> float | None:
+        """Return a timestamp for a service datetime (naive times are local)."""
+        return None if value is None else dt_util.as_utc(value).timestamp()
+
+    total, page = (0, []) if index is None else index.query(
+        kind=options.get("kind"),
+        device_id=options.get("device_id"),
+        config_only=options.get("config_only"),
+        start=to_time(options.get("start")),
+        end=to_time(options.get("end")),
+        sort_by=options["sort_by"],
+        descending=options["descending"],
+        offset=options["offset"],
+        limit=options["limit"],
+    )
+    return {
+        "total": total,
+        "offset": options["offset"],
+        "limit": options["limit"],
+        "backups": [describe(entry) for entry in page],
+    }
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): f"{DOMAIN}/list_backups",
+    **CATALOG_FIELDS,
+})
+@callback
+def websocket_list_backups(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Send one page of the backup catalog."""
+    connection.send_result(msg["id"], list_backups(hass, msg))
+
+
+@callback
+def async_register_websocket(hass: HomeAssistant) -> None:
+    """Register the list_backups websocket command."""
+    websocket_api.async_register_command(hass, websocket_list_backups)
@@ -0,0 +1,409 @@
+"""Comparison engine for Solarman export files.
+
+Both exports are streamed in entity_id order and merge-joined, so memory is
+bounded by one entity per side rather than by the size of the files. When
+exports carry per-entity hashes and device/export digests (read from their
+sidecar index, or from the header of older exports), identical exports,
+devices and entities are recognised by hash alone. When both exports have a
+sidecar that records each device's entities, only the records of devices
+whose digests differ are read, by seeking to their offsets. The
+engine is pure Python with no Home Assistant dependencies and always runs
+off the event loop, either in the executor or in a separate process.
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from .const import WRITABLE_DOMAINS, VOLATILE_ATTRIBUTES
+from .export_io import (
+    NO_DEVICE,
+    MemoryExport,
+    open_export,
+    read_device_locations,
+    read_entities_at,
+    read_sidecar_metadata,
+)
+
+
+def diff_entities(e1: dict, e2: dict) -> dict[str, Any]:
+    """Return the differences between two records of the same entity."""
+    differences = {}
+
+    # Compare state
+    if e1.get("state") != e2.get("state"):
+        differences["state"] = {
+            "old": e1.get("state"),
+            "new": e2.get("state")
+        }
+
+    # Compare key attributes
+    for key in ["name", "device_class", "unit_of_measurement"]:
+        if e1.get(key) != e2.get(key):
+            differences[key] = {
+                "old": e1.get(key),
+                "new": e2.get(key)
+            }
+
+    # Compare attributes, ignoring dynamic attributes that always change
+    attrs1 = {k: v for k, v in e1.get("attributes", {}).items() if k not in VOLATILE_ATTRIBUTES}
+    attrs2 = {k: v for k, v in e2.get("attributes", {}).items() if k not in VOLATILE_ATTRIBUTES}
+
+    if attrs1 != attrs2:
+        # Find specific attribute changes
+        attr_changes = {}
+        for key in set(attrs1.keys()) | set(attrs2.keys()):
+            if attrs1.get(key) != attrs2.get(key):
+                attr_changes[key] = {
+                    "old": attrs1.get(key),
+                    "new": attrs2.get(key)
+                }
+        if attr_changes:
+            differences["attributes"] = attr_changes
+
+    return differences
+
+
+def merge_join(
+    entities1: Iterator[dict], entities2: Iterator[dict]
+) -> Iterator[tuple[dict | None, dict | None]]:
+    """Pair up two entity_id-sorted streams.
+
+    Yields (e1, None) for removed, (None, e2) for added and (e1, e2) for
+    entities present on both sides.
+    """
+    e1 = next(entities1, None)
+    e2 = next(entities2, None)
+    while e1 is not None or e2 is not None:
+        if e2 is None or (e1 is not None and e1["entity_id"] < e2["entity_id"]):
+            yield e1, None
+            e1 = next(entities1, None)
+        elif e1 is None or e2["entity_id"] < e1["entity_id"]:
+            yield None, e2
+            e2 = next(entities2, None)
+        else:
+            yield e1, e2
+            e1 = next(entities1, None)
+            e2 = next(entities2, None)
+
+
+def _digest_metadata(source: Path | MemoryExport, header: dict[str, Any]) -> dict[str, Any]:
+    """Return the metadata holding an export's digests."""
+    if isinstance(source, MemoryExport):
+        return header
+    return read_sidecar_metadata(source) or header
+
+
+def _changes_entry(differences: dict[str, Any]) -> dict[str, Any]:
+    """Return the report entry for an entity's differences."""
+    return {
+        "old_value": differences.get("state", {}).get("old"),
+        "new_value": differences.get("state", {}).get("new"),
+        "changed_attributes": list(differences.get("attributes", {}).keys()),
+    }
+
+
+def _compare_changed_devices(
+    path1: Path,
+    path2: Path,
+    locations1: dict[str, dict[str, list[int]]],
+    locations2: dict[str, dict[str, list[int]]],
+    config_only: bool,
+    writable_only: bool,
+) -> tuple[list[str], list[str], dict[str, Any], int, int]:
+    """Diff only the entities of devices whose digests differ.
+
+    An identical device has the same entity ids and hashes on both sides, so
+    entities of the other devices can only match each other. Their ids and
+    record locations come from the sidecars; records are read by offset,
+    and only for entities present on both sides that the diff looks at.
+    Returns (added, removed, changes, common, hash_skipped) for these
+    entities.
+    """
+    offsets1 = {k: v for device in locations1.values() for k, v in device.items()}
+    offsets2 = {k: v for device in locations2.values() for k, v in device.items()}
+
+    def kept(entity_id: str) -> bool:
+        return not writable_only or entity_id.split(".")[0] in WRITABLE_DOMAINS
+
+    removed = [entity_id for entity_id in sorted(offsets1.keys() - offsets2.keys()) if kept(entity_id)]
+    added = [entity_id for entity_id in sorted(offsets2.keys() - offsets1.keys()) if kept(entity_id)]
+    both = sorted(offsets1.keys() & offsets2.keys())
+    # Read-only sensors are never diffed in config-only mode, so never read
+    to_read = [
+        entity_id for entity_id in both
+        if not config_only or entity_id.split(".")[0] in WRITABLE_DOMAINS
+    ]
+
+    changes = {}
+    hash_skipped = 0
+    # Exports store records in entity_id order, so offsets ascend
+    records1 = read_entities_at(path1, (offsets1[entity_id] for entity_id in to_read))
+    records2 = read_entities_at(path2, (offsets2[entity_id] for entity_id in to_read))
+    for e1, e2 in zip(records1, records2):
+        if e1.get("hash") and e1.get("hash") == e2.get("hash"):
+            hash_skipped += 1
+            continue
+        differences = diff_entities(e1, e2)
+        if differences:
+            changes[e1["entity_id"]] = _changes_entry(differences)
+    return added, removed, changes, len(both), hash_skipped
+
+
+def compare_export_files(
+    filepath1: Path | MemoryExport,
+    filepath2: Path | MemoryExport,
+    file1: str,
+    file2: str,
+    config_only: bool,
+) -> dict[str, Any]:
+    """Compare two exports and return the comparison report.
+
+    Either side may be an in-memory snapshot (such as one rebuilt from the
+    change journal). This does blocking file I/O and must run in the executor.
+    """
+    added = []
+    removed = []
+    changes = {}
+    total1 = 0
+    total2 = 0
+    common = 0
+    hash_skipped = 0
+
+    with open_export(filepath1) as reader1, open_export(filepath2) as reader2:
+        header1 = reader1.header
+        header2 = reader2.header
+        digests1 = _digest_metadata(filepath1, header1)
+        digests2 = _digest_metadata(filepath2, header2)
+
+        digest1 = digests1.get("export_digest")
+        if digest1 and digest1 == digests2.get("export_digest"):
+            # Identical exports: nothing to stream or diff
+            total1 = total2 = common = hash_skipped = digests1.get("total_entities", 0)
+        else:
+            # Devices whose whole entity set is unchanged need no per-entity work
+            devices1 = digests1.get("device_digests") or {}
+            devices2 = digests2.get("device_digests") or {}
+            identical_devices = {
+                device for device, digest in devices1.items() if devices2.get(device) == digest
+            }
+            # Read-only sensors missing from a config-only export were not removed
+            writable_only = config_only and (
+                header1.get("config_only") or header2.get("config_only")
+            )
+
+            # With device directories in both sidecars, only changed devices are read
+            locations1 = locations2 = None
+            if (
+                devices1 and devices2
+                and "total_entities" in digests1 and "total_entities" in digests2
+                and not isinstance(filepath1, MemoryExport)
+                and not isinstance(filepath2, MemoryExport)
+            ):
+                locations1 = read_device_locations(filepath1, devices1.keys() - identical_devices)
+                if locations1 is not None:
+                    locations2 = read_device_locations(filepath2, devices2.keys() - identical_devices)
+
+            if locations1 is not None and locations2 is not None:
+                added, removed, changes, common, hash_skipped = _compare_changed_devices(
+                    filepath1, filepath2, locations1, locations2, config_only, writable_only,
+                )
+                # Entities of identical devices are common and skipped by their digest
+                identical = digests1["total_entities"] - sum(len(device) for device in locations1.values())
+                common += identical
+                hash_skipped += identical
+                total1 = digests1["total_entities"]
+                total2 = digests2["total_entities"]
+            else:
+                for e1, e2 in merge_join(reader1.sorted_entities(), reader2.sorted_entities()):
+                    if e2 is None:
+                        total1 += 1
+                        if not writable_only or e1["entity_id"].split(".")[0] in WRITABLE_DOMAINS:
+                            removed.append(e1["entity_id"])
+                        continue
+                    if e1 is None:
+                        total2 += 1
+                        if not writable_only or e2["entity_id"].split(".")[0] in WRITABLE_DOMAINS:
+                            added.append(e2["entity_id"])
+                        continue
+
+                    total1 += 1
+                    total2 += 1
+                    common += 1
+                    entity_id = e1["entity_id"]
+
+                    if (e1.get("device_id") or NO_DEVICE) in identical_devices and \
+                       e1.get("device_id") == e2.get("device_id"):
+                        hash_skipped += 1
+                        continue
+                    if e1.get("hash") and e1.get("hash") == e2.get("hash"):
+                        hash_skipped += 1
+                        continue
+
+                    # If config_only mode, skip read-only sensors
+                    if config_only and entity_id.split(".")[0] not in WRITABLE_DOMAINS:
+                        continue
+
+                    differences = diff_entities(e1, e2)
+                    if differences:
+                        changes[entity_id] = _changes_entry(differences)
+
+    return {
+        "file1": file1,
+        "file2": file2,
+        "config_only": config_only,
+        "export1_timestamp": header1.get("export_timestamp"),
+        "export2_timestamp": header2.get("export_timestamp"),
+        "comparison_time": datetime.now().isoformat(),
+        "summary": {
+            "total_entities_file1": total1,
+            "total_entities_file2": total2,
+            "added": len(added),
+            "removed": len(removed),
+            "changed": len(changes),
+            "unchanged": common - len(changes),
+            "skipped_by_hash": hash_skipped,
+        },
+        "added_entities": added,
+        "removed_entities": removed,
+        "changes": changes,
+    }
+
+
+def compare_export_history(
+    sources: list[Path | MemoryExport],
+    names: list[str],
+    config_only: bool,
+) -> dict[str, Any]:
+    """Trace every entity's value transitions across an ordered list of exports.
+
+    All exports are streamed once, side by side: their entity_id-sorted
+    streams are merged with a heap, so only one record per export is held
+    at a time. This does blocking file I/O and must run in the executor.
+    """
+    history: dict[str, list[dict[str, Any]]] = {}
+    total = 0
+    transitions = 0
+
+    with ExitStack() as stack:
+        readers = [stack.enter_context(open_export(source)) for source in sources]
+        timestamps = [reader.header.get("export_timestamp") for reader in readers]
+
+        def tagged(position: int, reader: Any) -> Iterator[tuple[str, int, dict]]:
+            for entity in reader.sorted_entities():
+                yield entity["entity_id"], position, entity
+
+        merged = heapq.merge(*(tagged(i, reader) for i, reader in enumerate(readers)))
+
+        def flush(entity_id: str, records: list[dict | None]) -> None:
+            nonlocal transitions
+            if config_only and entity_id.split(".")[0] not in WRITABLE_DOMAINS:
+                return
+            events = []
+            for position in range(1, len(records)):
+                old, new = records[position - 1], records[position]
+                if old is None and new is None:
+                    continue
+                event = {"snapshot": names[position], "export_timestamp": timestamps[position]}
+                if old is None:
+                    event.update({"change": "added", "old_value": None, "new_value": new.get("state")})
+                elif new is None:
+                    event.update({"change": "removed", "old_value": old.get("state"), "new_value": None})
+                elif old.get("hash") and old.get("hash") == new.get("hash"):
+                    continue
+                else:
+                    differences = diff_entities(old, new)
+                    if not differences:
+                        continue
+                    event.update({
+                        "change": "changed",
+                        "old_value": differences.get("state", {}).get("old", old.get("state")),
+                        "new_value": differences.get("state", {}).get("new", new.get("state")),
+                        "changed_attributes": list(differences.get("attributes", {}).keys()),
+                    })
+                events.append(event)
+            if events:
+                history[entity_id] = events
+                transitions += len(events)
+
+        current = None
+        records: list[dict | None] = []
+        for entity_id, position, entity in merged:
+            if entity_id != current:
+                if current is not None:
+                    flush(current, records)
+                current = entity_id
+                records = [None] * len(readers)
+                total += 1
+            records[position] = entity
+        if current is not None:
+            flush(current, records)
+
+    return {
+        "files": names,
+        "snapshots": [
+            {"file": name, "export_timestamp": timestamp}
+            for name, timestamp in zip(names, timestamps)
+        ],
+        "config_only": config_only,
+        "comparison_time": datetime.now().isoformat(),
+        "summary": {
+            "snapshots": len(names),
+            "entities": total,
+            "entities_changed": len(history),
+            "transitions": transitions,
+        },
+        "entities": history,
+    }
+
+
+def timed_compare_export_files(*args: Any) -> tuple[dict[str, Any], float]:
+    """Run compare_export_files and return (report, seconds spent)."""
+    started = time.perf_counter()
+    report = compare_export_files(*args)
+    return report, time.perf_counter() - started
+
+
+def create_process_pool() -> ProcessPoolExecutor:
+    """Create the single-worker process pool used for very large comparisons.
+
+    The spawn start method avoids forking the multi-threaded Home Assistant
+    process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+class ComparisonCache:
+    """LRU map from (hash1, hash2, config_only) to an existing comparison report."""
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize the cache."""
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple[str, str, bool], str] = OrderedDict()
+
+    def get(self, key: tuple[str, str, bool]) -> str | None:
+        """Return the comparison filename for a key, marking it recently used."""
+        filename = self._entries.get(key)
+        if filename is not None:
+            self._entries.move_to_end(key)
+        return filename
+
+    def put(self, key: tuple[str, str, bool], filename: str) -> None:
+        """Remember a comparison report, evicting the least recently used one."""
+        self._entries[key] = filename
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: tuple[str, str, bool]) -> None:
+        """Forget a key whose report no longer exists."""
+        self._entries.pop(key, None)
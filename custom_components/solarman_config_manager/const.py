@@ -6,13 +6,115 @@ DOMAIN = "solarman_config_manager"
 SERVICE_EXPORT_CONFIG = "export_config"
 SERVICE_COMPARE_EXPORTS = "compare_exports"
 SERVICE_RESTORE_FROM_COMPARISON = "restore_from_comparison"
+SERVICE_RESTORE_FROM_EXPORT = "restore_from_export"
+SERVICE_LOOKUP_ENTITY = "lookup_entity"
+SERVICE_RUN_RETENTION = "run_retention"
+SERVICE_QUERY_TIMELINE = "query_timeline"
+SERVICE_COMPARE_HISTORY = "compare_history"
+SERVICE_GET_DETAILS = "get_details"
+SERVICE_LIST_BACKUPS = "list_backups"
 
 # Default paths
 DEFAULT_BACKUP_DIR = "solarman_config_backups"
 
+# Backup file name prefixes
+EXPORT_PREFIX = "solarman_export_"
+COMPARISON_PREFIX = "comparison_"
+HISTORY_PREFIX = "history_"
+
+# Backup file kinds, as tracked by the backup index
+KIND_EXPORT = "export"
+KIND_COMPARISON = "comparison"
+KIND_HISTORY = "history"
+
+# Dispatcher signal sent whenever the backup directory index changes
+SIGNAL_BACKUP_INDEX_UPDATED = f"{DOMAIN}_backup_index_updated"
+
+# How often the backup index is reconciled against the directory on disk
+INDEX_RECONCILE_INTERVAL_MINUTES = 15
+
+# Backup index metadata persisted in .storage, so startup reuses it
+CATALOG_STORAGE_KEY = f"{DOMAIN}.backup_catalog"
+CATALOG_STORAGE_VERSION = 1
+CATALOG_SAVE_DELAY_SECONDS = 10
+# Sorted catalog views kept per filter combination
+CATALOG_MAX_VIEWS = 32
+
+# Lists in sensor attributes are cut to this many entries; the full lists
+# are paged through the get_details service and websocket command
+ATTRIBUTE_LIST_LIMIT = 50
+DETAILS_PAGE_SIZE = 100
+DETAILS_MAX_PAGE_SIZE = 1000
+
+# Per-entity value timeline across exports
+CONF_TIMELINE = "timeline"
+TIMELINE_FILE = "timeline.jsonl"
+
 # Solarman integration domain
 SOLARMAN_DOMAIN = "solarman"
 
+# Combined export size above which comparisons run in a separate process
+PROCESS_POOL_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Number of comparison reports remembered by content hash
+COMPARISON_CACHE_SIZE = 32
+
+# Service timings: runs kept per phase, write latencies kept per service
+TIMING_WINDOW = 50
+TIMING_SAMPLE_WINDOW = 1000
+PROFILE_SUBDIR = "profiles"
+
+# Change journal (opt-in)
+CONF_JOURNAL = "journal"
+JOURNAL_SUBDIR = "journal"
+JOURNAL_FLUSH_INTERVAL_SECONDS = 10
+DEFAULT_JOURNAL_CHECKPOINT_HOURS = 24
+DEFAULT_JOURNAL_MAX_RECORDS = 5000
+DEFAULT_JOURNAL_KEEP_DAYS = 30
+
+# Delta-encoded snapshot store (opt-in)
+CONF_DELTA = "delta"
+DEFAULT_KEYFRAME_INTERVAL = 10
+DELTA_CACHE_SIZE = 4
+
+# Debounced snapshot scheduler (opt-in)
+CONF_SNAPSHOTS = "snapshots"
+SNAPSHOT_DOMAINS = ["number", "select", "switch"]
+DEFAULT_SNAPSHOT_DEBOUNCE_SECONDS = 30
+DEFAULT_SNAPSHOT_MIN_INTERVAL_MINUTES = 5
+
+# Retention and compaction (opt-in schedule)
+CONF_RETENTION = "retention"
+RETENTION_MODE_PRUNE = "prune"
+RETENTION_MODE_ARCHIVE = "archive"
+RETENTION_ARCHIVE = "solarman_archive.zip"
+RETENTION_BATCH_SIZE = 100
+DEFAULT_RETENTION_INTERVAL_HOURS = 24
+DEFAULT_KEEP_HOURLY = 48
+DEFAULT_KEEP_DAILY = 30
+DEFAULT_KEEP_WEEKLY = 0
+DEFAULT_KEEP_MONTHLY = -1
+DEFAULT_KEEP_COMPARISONS_DAYS = 30
+
+# Restore scheduling defaults (applied per inverter)
+DEFAULT_RESTORE_MAX_CONCURRENCY = 1
+DEFAULT_RESTORE_WRITES_PER_SECOND = 10.0
+
+# Writable entity domains (user-configurable)
+WRITABLE_DOMAINS = [
+    "number",
+    "select",
+    "switch",
+    "button",
+    "input_number",
+    "input_select",
+    "input_boolean",
+    "input_text",
+]
+
+# Dynamic attributes that always change and are ignored when comparing
+VOLATILE_ATTRIBUTES = ["last_changed", "last_updated", "context_id"]
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename to prevent path traversal and invalid characters."""
     return "".join(c for c in filename if c.isalnum() or c in "._- ").strip()
@@ -0,0 +1,215 @@
+"""Delta-encoded snapshot store for Solarman Config Manager.
+
+When enabled, export_config writes a full export (a keyframe) every N
+exports and, in between, a small delta file holding only the entity records
+that changed or were removed since the previous snapshot:
+
+    solarman_export_20251217_020000.json        keyframe
+    solarman_export_20251218_020000.delta.json  delta against the keyframe
+    solarman_export_20251219_020000.delta.json  delta against the delta above
+
+Each delta names its base and records the base's content hash and its own,
+so a snapshot is rebuilt by replaying the chain from the nearest keyframe and
+every link is verified on the way. Recent reconstructions are cached.
+
+Records are compared by their entity hash, which leaves out last_changed
+and last_updated. An entity whose content did not change keeps the record
+(and timestamps) of the snapshot it last changed in. The
+module is pure Python with no Home Assistant dependencies; everything here
+does blocking file I/O and must run in the executor.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from .export_io import (
+    ExportDigests,
+    ExportReader,
+    MemoryExport,
+    entity_hash,
+    open_export_text,
+)
+
+DELTA_EXTENSION = ".delta.json"
+
+
+def is_delta(name: str) -> bool:
+    """Return True if a file name is a delta snapshot."""
+    return name.endswith(DELTA_EXTENSION)
+
+
+def read_delta(path: Path) -> dict[str, Any]:
+    """Load a delta file (deltas are small and read whole)."""
+    with open_export_text(path) as f:
+        return json.load(f)
+
+
+def _snapshot(header: dict[str, Any], entities: list[dict]) -> MemoryExport:
+    """Hash a sorted list of records and wrap it with its digests."""
+    digests = ExportDigests()
+    for entity in entities:
+        digests.add(entity)
+    return MemoryExport({**header, "sorted_by": "entity_id", **digests.result()}, entities)
+
+
+def write_delta(
+    filepath: Path,
+    entities: Iterable[dict],
+    base: MemoryExport,
+    base_name: str,
+    export_timestamp: str,
+    extra_header: dict[str, Any] | None = None,
+    observer: Callable[[dict], None] | None = None,
+    timings: dict[str, float] | None = None,
+) -> tuple[dict[str, Any], MemoryExport]:
+    """Write the records whose content differs from ``base`` as a delta file.
+
+    ``entities`` must be in entity_id order. ``observer`` is called with every
+    record once it has been hashed. ``timings`` collects "serialization" and
+    "write" seconds as for write_export. Returns the delta's metadata and the
+    full snapshot it encodes, in which unchanged entities keep their base
+    record.
+    """
+    started = time.perf_counter()
+    base_records = {entity["entity_id"]: entity for entity in base.entities()}
+
+    records = []
+    changed = []
+    for entity in entities:
+        entity["hash"] = entity_hash(entity)
+        if observer:
+            observer(entity)
+        previous = base_records.pop(entity["entity_id"], None)
+        # Timestamps are not part of the hash, so only content changes count
+        if (
+            previous is not None
+            and previous.get("hash") == entity["hash"]
+            and previous.get("device_id") == entity.get("device_id")
+        ):
+            records.append(previous)
+        else:
+            records.append(entity)
+            changed.append(entity)
+    snapshot = _snapshot({"export_timestamp": export_timestamp, **(extra_header or {})}, records)
+
+    metadata = {
+        key: value for key, value in snapshot.header.items() if key != "device_digests"
+    }
+    metadata.update({
+        "snapshot_type": "delta",
+        "base": base_name,
+        "base_content_hash": base.header["content_hash"],
+        "chain_length": base.header.get("chain_length", 0) + 1,
+        "changed_entities": len(changed),
+        "removed_entities": len(base_records),
+    })
+    delta = {
+        **metadata,
+        "device_digests": snapshot.header["device_digests"],
+        "changed": changed,
+        "removed": sorted(base_records),
+    }
+    write_started = time.perf_counter()
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(delta, f, separators=(",", ":"), ensure_ascii=False)
+    if timings is not None:
+        timings["serialization"] = timings.get("serialization", 0.0) + write_started - started
+        timings["write"] = timings.get("write", 0.0) + time.perf_counter() - write_started
+
+    snapshot.header["chain_length"] = metadata["chain_length"]
+    return metadata, snapshot
+
+
+class SnapshotStore:
+    """Rebuild snapshots from keyframes and deltas, caching recent results.
+
+    Cache entries are keyed by file name, modification time and size, so a
+    replaced file is never served from the cache.
+    """
+
+    def __init__(self, backup_dir: Path, cache_size: int) -> None:
+        """Initialize the store."""
+        self.backup_dir = backup_dir
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, float, int], MemoryExport] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, path: Path) -> tuple[str, float, int]:
+        """Return the cache key of a file."""
+        stat = path.stat()
+        return path.name, stat.st_mtime, stat.st_size
+
+    def _cached(self, key: tuple[str, float, int]) -> MemoryExport | None:
+        """Return a cached snapshot, marking it recently used."""
+        with self._lock:
+            snapshot = self._cache.get(key)
+            if snapshot is not None:
+                self._cache.move_to_end(key)
+            return snapshot
+
+    def remember(self, path: Path, snapshot: MemoryExport) -> None:
+        """Cache the snapshot of a file, evicting the least recently used one."""
+        key = self._key(path)
+        with self._lock:
+            self._cache[key] = snapshot
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def load(self, path: Path) -> MemoryExport:
+        """Return the full snapshot stored in a keyframe or delta file."""
+        if (snapshot := self._cached(self._key(path))) is not None:
+            return snapshot
+
+        # Walk back to the keyframe (or the nearest cached snapshot)
+        chain = []
+        current = path
+        snapshot = None
+        while is_delta(current.name):
+            delta = read_delta(current)
+            chain.append(delta)
+            current = self.backup_dir / delta["base"]
+            if (snapshot := self._cached(self._key(current))) is not None:
+                break
+        if snapshot is None:
+            with ExportReader(current) as reader:
+                entities = list(reader.sorted_entities())
+                snapshot = _snapshot(dict(reader.metadata), entities)
+
+        for delta in reversed(chain):
+            snapshot = self._apply(snapshot, delta)
+
+        self.remember(path, snapshot)
+        return snapshot
+
+    def _apply(self, base: MemoryExport, delta: dict[str, Any]) -> MemoryExport:
+        """Apply one delta to its base, verifying both ends of the link."""
+        if base.header["content_hash"] != delta["base_content_hash"]:
+            raise ValueError(f"Snapshot chain broken: base {delta['base']} does not match its delta")
+
+        entities = {entity["entity_id"]: entity for entity in base.entities()}
+        for entity_id in delta["removed"]:
+            entities.pop(entity_id, None)
+        for entity in delta["changed"]:
+            entities[entity["entity_id"]] = entity
+
+        header = {
+            key: value for key, value in delta.items()
+            if key not in ("changed", "removed", "device_digests")
+        }
+        snapshot = _snapshot(header, sorted(entities.values(), key=lambda e: e["entity_id"]))
+        if snapshot.header["content_hash"] != delta["content_hash"]:
+            raise ValueError(
+                f"Snapshot chain broken: delta on {delta['base']} does not rebuild its content hash"
+            )
+        snapshot.header["chain_length"] = delta["chain_length"]
+        return snapshot
+
+    def source(self, path: Path) -> Path | MemoryExport:
+        """Return something compare and lookup can read: the path or a rebuilt snapshot."""
+        return self.load(path) if is_delta(path.name) else path
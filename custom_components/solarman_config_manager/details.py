@@ -0,0 +1,154 @@
+"""Paged access to the full lists behind the sensors of Solarman Config Manager.
+
+The sensors only carry the first entries of long lists (see
+ATTRIBUTE_LIST_LIMIT), so the recorder never stores thousands of file
+names or entity changes. The complete lists are served a page at a time
+by the get_details service and the websocket command of the same name.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .catalog import SORT_NAME
+from .const import DOMAIN, DETAILS_PAGE_SIZE, DETAILS_MAX_PAGE_SIZE
+from .index import KIND_EXPORT, KIND_COMPARISON, KIND_HISTORY
+
+SECTION_EXPORTS = "exports"
+SECTION_COMPARISONS = "comparisons"
+SECTION_HISTORIES = "histories"
+SECTION_CHANGES = "changes"
+SECTION_ADDED = "added_entities"
+SECTION_REMOVED = "removed_entities"
+
+# Restore result lists, keyed by section name
+RESTORE_SECTIONS = {
+    "restore_success": "success",
+    "restore_failed": "failed",
+    "restore_skipped": "skipped",
+    "restore_already_at_target": "already_at_target",
+}
+
+# Backup list sections, served from the catalog
+INDEX_SECTIONS = {
+    SECTION_EXPORTS: KIND_EXPORT,
+    SECTION_COMPARISONS: KIND_COMPARISON,
+    SECTION_HISTORIES: KIND_HISTORY,
+}
+
+SECTIONS = [
+    SECTION_EXPORTS,
+    SECTION_COMPARISONS,
+    SECTION_HISTORIES,
+    SECTION_CHANGES,
+    SECTION_ADDED,
+    SECTION_REMOVED,
+    *RESTORE_SECTIONS,
+]
+
+DETAILS_FIELDS = {
+    vol.Required("section"): vol.In(SECTIONS),
+    vol.Optional("offset", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional("limit", default=DETAILS_PAGE_SIZE): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=DETAILS_MAX_PAGE_SIZE)
+    ),
+}
+
+
+def comparison_details(data: dict[str, Any], filename: str) -> dict[str, Any]:
+    """Return the pageable lists of a comparison report.
+
+    Changes are turned into a list sorted by entity_id, so pages are stable.
+    """
+    return {
+        "comparison_file": filename,
+        SECTION_CHANGES: [
+            {"entity_id": entity_id, **change}
+            for entity_id, change in sorted(data.get("changes", {}).items())
+        ],
+        SECTION_ADDED: data.get("added_entities", []),
+        SECTION_REMOVED: data.get("removed_entities", []),
+    }
+
+
+def _index_page(
+    hass: HomeAssistant, section: str, offset: int, limit: int
+) -> tuple[int, list]:
+    """Return the number of backups of a section and one page of them, newest name first."""
+    index = hass.data.get(DOMAIN, {}).get("index")
+    if index is None:
+        return 0, []
+    total, page = index.query(
+        kind=INDEX_SECTIONS[section],
+        sort_by=SORT_NAME,
+        descending=True,
+        offset=offset,
+        limit=limit,
+    )
+    if section == SECTION_EXPORTS:
+        return total, [
+            {
+                "file": f.stem,
+                "entities": f.total_entities,
+                "timestamp": f.export_timestamp,
+                "size": f.size,
+            }
+            for f in page
+        ]
+    return total, [f.stem for f in page]
+
+
+def _section_items(hass: HomeAssistant, section: str) -> tuple[list, str | None]:
+    """Return the full list of a report section and the file it comes from."""
+    data = hass.data.get(DOMAIN, {})
+
+    if section in RESTORE_SECTIONS:
+        result = data.get("last_restore_result") or {}
+        source = result.get("comparison_file") or result.get("export_file")
+        return result.get("summary", {}).get(RESTORE_SECTIONS[section], []), source
+
+    comparison = data.get("last_comparison") or {}
+    return comparison.get(section, []), comparison.get("comparison_file")
+
+
+def page_details(hass: HomeAssistant, section: str, offset: int, limit: int) -> dict[str, Any]:
+    """Return one page of a section's full list."""
+    if section in INDEX_SECTIONS:
+        total, items = _index_page(hass, section, offset, limit)
+        source = None
+    else:
+        items, source = _section_items(hass, section)
+        total = len(items)
+        items = items[offset:offset + limit]
+    return {
+        "section": section,
+        "source": source,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "items": items,
+    }
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): f"{DOMAIN}/get_details",
+    **DETAILS_FIELDS,
+})
+@callback
+def websocket_get_details(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Send one page of a section's full list."""
+    connection.send_result(
+        msg["id"], page_details(hass, msg["section"], msg["offset"], msg["limit"])
+    )
+
+
+@callback
+def async_register_websocket(hass: HomeAssistant) -> None:
+    """Register the get_details websocket command."""
+    websocket_api.async_register_command(hass, websocket_get_details)
@@ -0,0 +1,101 @@
+"""Cached set of Solarman registry entries for Solarman Config Manager."""
+from __future__ import annotations
+
+import logging
+from typing import Callable
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import SOLARMAN_DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SolarmanEntityCache:
+    """Keep the entity ids of all Solarman-platform registry entries.
+
+    The set is seeded with one scan of the entity registry at startup and
+    then maintained from entity registry update events, so consumers never
+    need to scan the whole entity registry.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self.hass = hass
+        self._entity_ids: set[str] = set()
+        self._listeners: list[Callable[[], None]] = []
+        self._unsub = None
+
+    @callback
+    def async_load(self) -> None:
+        """Seed the cache and start following registry updates."""
+        # One full scan at startup: YAML-platform Solarman entities have no
+        # config entry, so the per-config-entry index would miss them
+        self._entity_ids = {
+            entry.entity_id
+            for entry in er.async_get(self.hass).entities.values()
+            if entry.platform == SOLARMAN_DOMAIN
+        }
+        _LOGGER.debug(f"Solarman entity cache loaded with {len(self._entity_ids)} entities")
+
+        self._unsub = self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_registry_updated
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop following registry updates."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        """Apply a create/remove/update event to the cache."""
+        action = event.data["action"]
+        entity_id = event.data["entity_id"]
+        before = len(self._entity_ids)
+        renamed = False
+
+        if action == "remove":
+            self._entity_ids.discard(entity_id)
+        else:
+            if old_entity_id := event.data.get("old_entity_id"):
+                renamed = old_entity_id in self._entity_ids
+                self._entity_ids.discard(old_entity_id)
+            entry = er.async_get(self.hass).async_get(entity_id)
+            if entry and entry.platform == SOLARMAN_DOMAIN:
+                self._entity_ids.add(entity_id)
+            else:
+                self._entity_ids.discard(entity_id)
+
+        # Plain updates (name, icon, ...) do not change the set
+        if not renamed and len(self._entity_ids) == before:
+            return
+        for listener in list(self._listeners):
+            listener()
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call ``listener`` whenever the set of Solarman entities changes."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    @property
+    def entity_ids(self) -> set[str]:
+        """Return the cached Solarman entity ids."""
+        return self._entity_ids
+
+    def entries(self) -> list[er.RegistryEntry]:
+        """Return the registry entries of the cached entities."""
+        entity_reg = er.async_get(self.hass)
+        return [
+            entry for entity_id in self._entity_ids
+            if (entry := entity_reg.async_get(entity_id)) is not None
+        ]
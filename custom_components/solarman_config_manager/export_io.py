@@ -0,0 +1,660 @@
+"""Streaming reader and writer for Solarman export files.
+
+Exports are JSON objects whose ``entities`` key holds a (possibly very large)
+list of entity records. ExportReader walks the file incrementally so callers
+can process one entity at a time without loading the whole export.
+
+Every export written by write_export gets a sidecar index next to it (the
+export name plus ".idx"). Its first line holds the export's metadata and its
+second line the byte offset and length of each entity record, so metadata
+and single entities can be read without parsing the export. The third line
+is a directory of the lines that follow, one per device with the locations
+of that device's records, so the records of a few devices can be found
+without parsing the locations of all the others.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import re
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator
+
+from .const import VOLATILE_ATTRIBUTES
+
+CHUNK_SIZE = 64 * 1024
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_XZ = "xz"
+
+# File extension per compression mode
+EXPORT_EXTENSIONS = {
+    COMPRESSION_NONE: ".json",
+    COMPRESSION_GZIP: ".json.gz",
+    COMPRESSION_XZ: ".json.xz",
+}
+
+SIDECAR_SUFFIX = ".idx"
+TEMP_SUFFIX = ".tmp"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Entity fields covered by the per-entity hash (the fields compared by the diff engine)
+HASHED_FIELDS = ("name", "device_class", "unit_of_measurement", "state")
+NO_DEVICE = "none"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+_ENTITIES_START = object()
+_END = object()
+
+
+def open_export_text(path: Path) -> IO[str]:
+    """Open an export or report for reading, decompressing on the fly.
+
+    The format is detected from the file's magic bytes, not its name.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(_XZ_MAGIC))
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic.startswith(_XZ_MAGIC):
+        return lzma.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def open_export_binary(path: Path) -> IO[bytes]:
+    """Open an export's (decompressed) byte stream for reading and seeking."""
+    with open(path, "rb") as f:
+        magic = f.read(len(_XZ_MAGIC))
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic.startswith(_XZ_MAGIC):
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+
+def open_export_for_write(path: Path, compression: str = COMPRESSION_NONE) -> IO[bytes]:
+    """Open an export for binary writing with the requested compression."""
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == COMPRESSION_XZ:
+        return lzma.open(path, "wb", preset=3)
+    return open(path, "wb")
+
+
+class _JsonStream:
+    """Minimal incremental JSON tokenizer on top of a text file object."""
+
+    def __init__(self, fp, chunk_size: int = CHUNK_SIZE) -> None:
+        """Initialize the stream."""
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, dropping consumed text."""
+        if self._eof:
+            return False
+        chunk = self._fp.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character ('' at end of file)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def take(self) -> str:
+        """Consume and return the next non-whitespace character."""
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def expect(self, char: str) -> None:
+        """Consume the next character, which must be ``char``."""
+        found = self.take()
+        if found != char:
+            raise ValueError(f"Malformed export file: expected '{char}', found '{found}'")
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A scalar ending exactly at the buffer end may be truncated
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return obj
+
+
+class ExportReader:
+    """Read an export file's metadata and stream its entities.
+
+    ``header`` holds every top-level key that precedes ``entities`` and is
+    available as soon as the reader is opened. Keys that follow ``entities``
+    are merged into ``metadata`` once the entity stream is exhausted.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the reader."""
+        self.path = Path(path)
+        self.header: dict[str, Any] = {}
+        self.metadata: dict[str, Any] = {}
+        self._fp = None
+        self._events = None
+
+    def __enter__(self) -> "ExportReader":
+        """Open the file and parse up to the start of the entity list."""
+        self._fp = open_export_text(self.path)
+        self._events = self._parse(_JsonStream(self._fp))
+        next(self._events)
+        self.header = dict(self.metadata)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Close the underlying file."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying file."""
+        if self._fp:
+            self._fp.close()
+            self._fp = None
+
+    @property
+    def is_sorted(self) -> bool:
+        """Return True if entities were written in entity_id order."""
+        return self.header.get("sorted_by") == "entity_id"
+
+    def entities(self) -> Iterator[dict]:
+        """Yield entity records in file order."""
+        for event in self._events:
+            if event is _END:
+                return
+            yield event
+
+    def sorted_entities(self) -> Iterator[dict]:
+        """Yield entity records in entity_id order.
+
+        Sorted exports are streamed as-is (and verified on the way); older,
+        unsorted exports are loaded and sorted in memory.
+        """
+        if not self.is_sorted:
+            yield from sorted(self.entities(), key=lambda e: e["entity_id"])
+            return
+
+        previous = None
+        for entity in self.entities():
+            entity_id = entity["entity_id"]
+            if previous is not None and entity_id < previous:
+                raise ValueError(f"Export {self.path.name} is marked sorted but {entity_id} follows {previous}")
+            previous = entity_id
+            yield entity
+
+    def _parse(self, stream: _JsonStream) -> Iterator[Any]:
+        """Walk the top-level object, emitting markers and entity records."""
+        stream.expect("{")
+        found_entities = False
+        if stream.peek() == "}":
+            stream.take()
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(":")
+                if key == "entities" and not found_entities:
+                    found_entities = True
+                    yield _ENTITIES_START
+                    stream.expect("[")
+                    if stream.peek() == "]":
+                        stream.take()
+                    else:
+                        while True:
+                            yield stream.value()
+                            sep = stream.take()
+                            if sep == "]":
+                                break
+                            if sep != ",":
+                                raise ValueError(f"Malformed export file: unexpected '{sep}' in entities")
+                else:
+                    self.metadata[key] = stream.value()
+
+                sep = stream.take()
+                if sep == "}":
+                    break
+                if sep != ",":
+                    raise ValueError(f"Malformed export file: unexpected '{sep}'")
+
+        if not found_entities:
+            yield _ENTITIES_START
+        yield _END
+
+
+def canonical_json(value: Any) -> str:
+    """Serialize a value deterministically for hashing."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def entity_hash(entity: dict) -> str:
+    """Return a stable hash of an entity's comparable content.
+
+    Volatile attributes and timestamps are left out, so two records with the
+    same hash are guaranteed to produce no differences when compared.
+    """
+    content = {key: entity.get(key) for key in HASHED_FIELDS}
+    content["attributes"] = {
+        k: v for k, v in entity.get("attributes", {}).items() if k not in VOLATILE_ATTRIBUTES
+    }
+    return hashlib.sha256(canonical_json(content).encode("utf-8")).hexdigest()
+
+
+class ExportDigests:
+    """Incrementally hash entity records as they are written.
+
+    Builds the content hash over the full records plus the digest tree: a
+    device digest covers the entity ids and hashes of all the device's
+    entities, and the export digest covers all device digests.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the digests."""
+        self.total = 0
+        self._content = hashlib.sha256()
+        self._devices: dict[str, Any] = {}
+
+    def add(self, entity: dict) -> str:
+        """Store the entity's ``hash`` and return its canonical serialization."""
+        entity["hash"] = entity_hash(entity)
+        serialized = canonical_json(entity)
+        self._content.update(serialized.encode("utf-8"))
+        self._content.update(b"\n")
+        device = entity.get("device_id") or NO_DEVICE
+        digest = self._devices.setdefault(device, hashlib.sha256())
+        digest.update(f"{entity['entity_id']}:{entity['hash']}\n".encode("utf-8"))
+        self.total += 1
+        return serialized
+
+    def result(self) -> dict[str, Any]:
+        """Return the trailer metadata for everything added so far."""
+        device_digests = {device: digest.hexdigest() for device, digest in sorted(self._devices.items())}
+        export_digest = hashlib.sha256(
+            "".join(f"{device}:{digest}\n" for device, digest in device_digests.items()).encode("utf-8")
+        ).hexdigest()
+        return {
+            "total_entities": self.total,
+            "content_hash": self._content.hexdigest(),
+            "export_digest": export_digest,
+            "device_digests": device_digests,
+        }
+
+
+def file_content_hash(path: Path) -> str:
+    """Return the content hash recorded in an export.
+
+    Exports written before content hashes were introduced are hashed from
+    their raw bytes instead.
+    """
+    content_hash = read_export_metadata(path).get("content_hash")
+    if content_hash:
+        return content_hash
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f"file:{digest.hexdigest()}"
+
+
+def project_attributes(
+    attributes: Any,
+    include: Iterable[str] | None = None,
+    exclude: Iterable[str] | None = None,
+) -> dict[str, Any]:
+    """Return the attributes kept by an allow-list and/or deny-list."""
+    if include is not None:
+        include = set(include)
+        attributes = {k: v for k, v in attributes.items() if k in include}
+    if exclude:
+        exclude = set(exclude)
+        attributes = {k: v for k, v in attributes.items() if k not in exclude}
+    return dict(attributes)
+
+
+def build_entity_record(
+    entry: Any,
+    state: Any,
+    include_attributes: Iterable[str] | None = None,
+    exclude_attributes: Iterable[str] | None = None,
+) -> dict[str, Any]:
+    """Build the export record for a registry entry and its current state.
+
+    Attributes can be projected with an allow-list and/or deny-list so that
+    unwanted data never reaches the export.
+    """
+    return {
+        "entity_id": entry.entity_id,
+        "device_id": entry.device_id,
+        "name": entry.original_name or entry.name,
+        "device_class": entry.device_class,
+        "unit_of_measurement": entry.unit_of_measurement,
+        "state": state.state,
+        "attributes": project_attributes(state.attributes, include_attributes, exclude_attributes),
+        "last_changed": state.last_changed.isoformat(),
+        "last_updated": state.last_updated.isoformat(),
+    }
+
+
+def _compact_json(value: Any) -> str:
+    """Serialize a sidecar line without whitespace."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def sidecar_path(path: Path) -> Path:
+    """Return the path of an export's sidecar index."""
+    return path.with_name(f"{path.name}{SIDECAR_SUFFIX}")
+
+
+def temp_path(path: Path) -> Path:
+    """Return the hidden name a file is written under until it is complete."""
+    return path.with_name(f".{path.name}{TEMP_SUFFIX}")
+
+
+def write_export(
+    filepath: Path,
+    entities: Iterable[dict],
+    export_timestamp: str,
+    extra_header: dict[str, Any] | None = None,
+    compression: str = COMPRESSION_NONE,
+    compact: bool = False,
+    observer: Callable[[dict], None] | None = None,
+    timings: dict[str, float] | None = None,
+) -> dict[str, Any]:
+    """Stream entity records to an export file and return its metadata.
+
+    ``entities`` may be a generator and must yield records in entity_id
+    order; each record is hashed and written as soon as it is produced, so
+    only one record is held at a time. ``observer`` is called with every
+    record once it has been hashed. Keys that depend on the content
+    (entity count, content hash and digests) are written after the entity
+    list, and a sidecar index is written once the export is complete. Both
+    are written under temporary names and only moved into place once both
+    are complete, so a failed export leaves no partial file behind. If
+    ``timings`` is given, the seconds spent building and serializing records
+    and writing them out are added to its "serialization" and "write" keys.
+    This does blocking file I/O and must run in the executor.
+    """
+    started = time.perf_counter()
+    written = 0.0
+    header = {
+        "export_timestamp": export_timestamp,
+        "sorted_by": "entity_id",
+        **(extra_header or {}),
+    }
+    if compact:
+        header["compact"] = True
+    digests = ExportDigests()
+    offsets: dict[str, list[int]] = {}
+    device_entities: dict[str, list[str]] = {}
+    newline = "\n" if compact else "\n  "
+    entity_newline = "\n" if compact else "\n    "
+    previous = None
+
+    partial_export = temp_path(filepath)
+    partial_sidecar = temp_path(sidecar_path(filepath))
+    try:
+        with open_export_for_write(partial_export, compression) as f:
+            position = 0
+
+            def write(text: str) -> int:
+                """Write text and return the number of bytes written."""
+                nonlocal position, written
+                data = text.encode("utf-8")
+                write_started = time.perf_counter()
+                f.write(data)
+                written += time.perf_counter() - write_started
+                position += len(data)
+                return len(data)
+
+            write("{")
+            for key, value in header.items():
+                write(f"{newline}{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},")
+            write(f'{newline}"entities": [')
+
+            for entity in entities:
+                entity_id = entity["entity_id"]
+                if previous is not None and entity_id <= previous:
+                    raise ValueError(f"Export entities must be in entity_id order: {entity_id} follows {previous}")
+                previous = entity_id
+
+                serialized = digests.add(entity)
+                if observer:
+                    observer(entity)
+                write(("," if digests.total > 1 else "") + entity_newline)
+                offset = position
+                if compact:
+                    # The canonical serialization doubles as the compact record
+                    length = write(serialized)
+                else:
+                    length = write(json.dumps(entity, indent=2, ensure_ascii=False).replace("\n", entity_newline))
+                offsets[entity_id] = [offset, length]
+                device_entities.setdefault(entity.get("device_id") or NO_DEVICE, []).append(entity_id)
+
+            metadata = digests.result()
+            write(f"{newline}]")
+            for key, value in metadata.items():
+                write(f",{newline}{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}")
+            write("\n}\n")
+
+        sidecar = {
+            "export": filepath.name,
+            "size": partial_export.stat().st_size,
+            "export_timestamp": export_timestamp,
+            "config_only": header.get("config_only", False),
+            "compression": compression,
+            **metadata,
+        }
+        sidecar_started = time.perf_counter()
+        # Directory entries are [offset after the directory line, length, entity count]
+        device_lines = []
+        directory = {}
+        position = 0
+        for device, entity_ids in device_entities.items():
+            line = (_compact_json({entity_id: offsets[entity_id] for entity_id in entity_ids}) + "\n").encode("utf-8")
+            directory[device] = [position, len(line), len(entity_ids)]
+            device_lines.append(line)
+            position += len(line)
+        with open(partial_sidecar, "wb") as f:
+            f.write((json.dumps(sidecar, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.write((_compact_json(offsets) + "\n").encode("utf-8"))
+            f.write((_compact_json(directory) + "\n").encode("utf-8"))
+            f.writelines(device_lines)
+        written += time.perf_counter() - sidecar_started
+        os.replace(partial_export, filepath)
+        os.replace(partial_sidecar, sidecar_path(filepath))
+    except BaseException:
+        partial_export.unlink(missing_ok=True)
+        partial_sidecar.unlink(missing_ok=True)
+        raise
+
+    if timings is not None:
+        timings["serialization"] = timings.get("serialization", 0.0) + time.perf_counter() - started - written
+        timings["write"] = timings.get("write", 0.0) + written
+    return {**header, **metadata}
+
+
+def read_sidecar_metadata(path: Path) -> dict[str, Any] | None:
+    """Return the metadata line of an export's sidecar index.
+
+    Returns None if there is no sidecar or it does not match the export's
+    current size (for example because the export was replaced).
+    """
+    try:
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            metadata = json.loads(f.readline())
+        if metadata.get("size") != path.stat().st_size:
+            return None
+    except (OSError, ValueError):
+        return None
+    return metadata
+
+
+def read_device_locations(
+    path: Path, devices: Iterable[str]
+) -> dict[str, dict[str, list[int]]] | None:
+    """Return the record locations of the given devices' entities.
+
+    Only the sidecar lines of the requested devices are parsed. Devices the
+    export does not have are left out. Returns None if there is no valid
+    sidecar or it was written before sidecars had a device directory.
+    """
+    if read_sidecar_metadata(path) is None:
+        return None
+    try:
+        with open(sidecar_path(path), "rb") as f:
+            f.readline()
+            f.readline()
+            line = f.readline()
+            if not line.strip():
+                return None
+            directory = json.loads(line)
+            base = f.tell()
+            locations = {}
+            for device in devices:
+                if (entry := directory.get(device)) is None:
+                    continue
+                offset, length, _ = entry
+                f.seek(base + offset)
+                locations[device] = json.loads(f.read(length))
+            return locations
+    except (OSError, ValueError):
+        return None
+
+
+def read_entities_at(path: Path, locations: Iterable[list[int]]) -> Iterator[dict]:
+    """Yield the records at the given [offset, length] locations.
+
+    Locations should be in ascending offset order, so compressed exports are
+    only decompressed forward. This does blocking file I/O and must run in
+    the executor.
+    """
+    with open_export_binary(path) as f:
+        for offset, length in locations:
+            f.seek(offset)
+            yield json.loads(f.read(length).decode("utf-8"))
+
+
+def lookup_entity(path: Path, entity_id: str) -> dict[str, Any] | None:
+    """Return one entity record from an export, or None if it is not there.
+
+    With a valid sidecar index this seeks straight to the record (compressed
+    exports are decompressed only up to it); otherwise the export is streamed
+    until the entity is found. This does blocking file I/O and must run in
+    the executor.
+    """
+    if read_sidecar_metadata(path) is not None:
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            f.readline()
+            location = json.loads(f.readline()).get(entity_id)
+        if location is None:
+            return None
+        offset, length = location
+        with open_export_binary(path) as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode("utf-8"))
+
+    with ExportReader(path) as reader:
+        for entity in reader.entities():
+            if entity["entity_id"] == entity_id:
+                return entity
+    return None
+
+
+class MemoryExport:
+    """An in-memory snapshot with the same interface as ExportReader."""
+
+    def __init__(self, header: dict[str, Any], entities: list[dict]) -> None:
+        """Initialize the snapshot."""
+        self.header = header
+        self.metadata = header
+        self._entities = entities
+
+    def __enter__(self) -> "MemoryExport":
+        """Return the snapshot itself."""
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Nothing to close."""
+
+    def entities(self) -> Iterator[dict]:
+        """Yield entity records."""
+        yield from self._entities
+
+    def sorted_entities(self) -> Iterator[dict]:
+        """Yield entity records in entity_id order."""
+        yield from sorted(self._entities, key=lambda e: e["entity_id"])
+
+
+def open_export(source: Path | MemoryExport) -> ExportReader | MemoryExport:
+    """Return a reader for an export path, or an in-memory snapshot as-is."""
+    if isinstance(source, MemoryExport):
+        return source
+    return ExportReader(source)
+
+
+def read_export_values(source: Path | MemoryExport, domains: Iterable[str]) -> dict[str, Any]:
+    """Return the exported state of every entity in the given domains.
+
+    This does blocking file I/O and must run in the executor.
+    """
+    domains = set(domains)
+    with open_export(source) as reader:
+        return {
+            entity["entity_id"]: entity.get("state")
+            for entity in reader.entities()
+            if entity["entity_id"].split(".")[0] in domains
+        }
+
+
+def read_export_header(path: Path) -> dict[str, Any]:
+    """Return the top-level keys that precede the entity list."""
+    with ExportReader(path) as reader:
+        return reader.header
+
+
+def read_export_metadata(path: Path) -> dict[str, Any]:
+    """Return the export's metadata (every top-level key except the entity list).
+
+    The sidecar index is used when available. Otherwise, streamed exports
+    keep their content hash and digests after the entity list, in which case
+    the entities are streamed past (one at a time).
+    """
+    sidecar = read_sidecar_metadata(path)
+    if sidecar is not None:
+        return sidecar
+    with ExportReader(path) as reader:
+        if "content_hash" not in reader.header:
+            for _ in reader.entities():
+                pass
+        return reader.metadata
@@ -0,0 +1,314 @@
+"""In-memory index of the backup directory for Solarman Config Manager."""
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import asdict, dataclass, fields, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    EXPORT_PREFIX,
+    COMPARISON_PREFIX,
+    HISTORY_PREFIX,
+    KIND_EXPORT,
+    KIND_COMPARISON,
+    KIND_HISTORY,
+    SIGNAL_BACKUP_INDEX_UPDATED,
+    INDEX_RECONCILE_INTERVAL_MINUTES,
+    CATALOG_STORAGE_KEY,
+    CATALOG_STORAGE_VERSION,
+    CATALOG_SAVE_DELAY_SECONDS,
+)
+from .delta import DELTA_EXTENSION, is_delta, read_delta
+from .export_io import EXPORT_EXTENSIONS, NO_DEVICE, read_sidecar_metadata
+from .catalog import BackupCatalog
+from .timeline import export_time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Longest first, so ".json.gz" is not mistaken for ".gz"
+_EXTENSIONS = sorted({*EXPORT_EXTENSIONS.values(), DELTA_EXTENSION}, key=len, reverse=True)
+
+
+def split_extension(name: str) -> tuple[str, str]:
+    """Split a backup file name into (stem, extension); extension may be empty."""
+    for extension in _EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)], extension
+    return name, ""
+
+
+@dataclass(frozen=True)
+class BackupFile:
+    """A single indexed backup file."""
+
+    name: str
+    kind: str
+    mtime: float
+    size: int
+    content_hash: str | None = None
+    total_entities: int | None = None
+    export_timestamp: str | None = None
+    config_only: bool | None = None
+    devices: tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, record: dict[str, Any]) -> BackupFile:
+        """Return an entry from its stored form, ignoring unknown keys."""
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in record.items() if key in known}
+        values["devices"] = tuple(values.get("devices", ()))
+        return cls(**values)
+
+    @property
+    def stem(self) -> str:
+        """Return the file name without its (possibly compressed) extension."""
+        return split_extension(self.name)[0]
+
+    @property
+    def time(self) -> float:
+        """Return when the backup was taken: its export timestamp, else its mtime."""
+        if self.export_timestamp:
+            try:
+                return export_time(self.export_timestamp).timestamp()
+            except ValueError:
+                pass
+        return self.mtime
+
+
+def classify(name: str) -> str | None:
+    """Return the backup kind of a file name, or None if it is not tracked."""
+    if not split_extension(name)[1]:
+        return None
+    if name.startswith(EXPORT_PREFIX):
+        return KIND_EXPORT
+    if name.startswith(COMPARISON_PREFIX):
+        return KIND_COMPARISON
+    if name.startswith(HISTORY_PREFIX):
+        return KIND_HISTORY
+    return None
+
+
+def _export_entry(path: Path, kind: str, mtime: float, size: int, metadata: dict) -> BackupFile:
+    """Build an export's index entry from its sidecar or delta metadata."""
+    return BackupFile(
+        path.name, kind, mtime, size,
+        metadata.get("content_hash"),
+        metadata.get("total_entities"),
+        metadata.get("export_timestamp"),
+        metadata.get("config_only"),
+        tuple(device for device in metadata.get("device_digests", {}) if device != NO_DEVICE),
+    )
+
+
+class BackupIndex:
+    """Track export and comparison files without re-globbing the directory.
+
+    The index is built once at startup, updated by the services whenever they
+    write a file, and reconciled against the directory at a low frequency to
+    pick up files added or removed outside the integration. Listeners are
+    notified through the SIGNAL_BACKUP_INDEX_UPDATED dispatcher signal.
+
+    Entries are persisted in .storage, so at startup only files that are new
+    or changed since the last run have their metadata read.
+    """
+
+    def __init__(self, hass: HomeAssistant, backup_dir: Path) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        self.backup_dir = backup_dir
+        self.catalog = BackupCatalog()
+        self._files: dict[str, BackupFile] = {}
+        self._store: Store = Store(hass, CATALOG_STORAGE_VERSION, CATALOG_STORAGE_KEY)
+        self._unsub_reconcile = None
+
+    def _entry(self, path: Path, kind: str, mtime: float, size: int) -> BackupFile:
+        """Build an index entry, taking export metadata from the sidecar index.
+
+        Delta snapshots have no sidecar; they are small and read whole.
+        """
+        if kind == KIND_EXPORT and is_delta(path.name):
+            try:
+                delta = read_delta(path)
+            except (OSError, ValueError):
+                return BackupFile(path.name, kind, mtime, size)
+            return _export_entry(path, kind, mtime, size, delta)
+        if kind == KIND_EXPORT and (sidecar := read_sidecar_metadata(path)) is not None:
+            return _export_entry(path, kind, mtime, size, sidecar)
+        return BackupFile(path.name, kind, mtime, size)
+
+    def _scan(self, known: dict[str, BackupFile]) -> dict[str, BackupFile]:
+        """Scan the backup directory (runs in the executor).
+
+        Entries of files that did not change keep their metadata, so only new
+        or modified exports have their sidecar read.
+        """
+        files = {}
+        if not self.backup_dir.exists():
+            return files
+        with os.scandir(self.backup_dir) as it:
+            for entry in it:
+                kind = classify(entry.name)
+                if kind is None or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                previous = known.get(entry.name)
+                if previous and (previous.mtime, previous.size) == (stat.st_mtime, stat.st_size):
+                    files[entry.name] = previous
+                else:
+                    files[entry.name] = self._entry(
+                        Path(entry.path), kind, stat.st_mtime, stat.st_size
+                    )
+        return files
+
+    async def async_load(self) -> None:
+        """Build the index from storage and the directory, and start the periodic reconcile."""
+        stored = await self._store.async_load() or {}
+        known = {}
+        for record in stored.get("files", []):
+            try:
+                entry = BackupFile.from_dict(record)
+            except (TypeError, ValueError):
+                continue
+            known[entry.name] = entry
+        self._files = await self.hass.async_add_executor_job(self._scan, dict(known))
+        self.catalog.clear()
+        if self._files != known:
+            self._async_schedule_save()
+        _LOGGER.debug(
+            f"Backup index loaded with {len(self._files)} files ({len(known)} from storage)"
+        )
+        self._unsub_reconcile = async_track_time_interval(
+            self.hass,
+            self.async_reconcile,
+            timedelta(minutes=INDEX_RECONCILE_INTERVAL_MINUTES),
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop the periodic reconcile."""
+        if self._unsub_reconcile:
+            self._unsub_reconcile()
+            self._unsub_reconcile = None
+
+    async def async_reconcile(self, now: datetime | None = None) -> None:
+        """Re-scan the directory and notify listeners if anything changed."""
+        files = await self.hass.async_add_executor_job(self._scan, dict(self._files))
+        if files != self._files:
+            _LOGGER.debug(
+                f"Backup index reconciled: {len(self._files)} -> {len(files)} files"
+            )
+            for name, entry in self._files.items():
+                if files.get(name) != entry:
+                    self.catalog.remove(entry)
+            for name, entry in files.items():
+                if self._files.get(name) != entry:
+                    self.catalog.add(entry)
+            self._files = files
+            self._async_notify()
+
+    async def async_add(
+        self, path: Path, content_hash: str | None = None, config_only: bool | None = None
+    ) -> None:
+        """Record a file that was just written by the integration.
+
+        ``config_only`` is taken from the export's sidecar where there is
+        one; pass it for comparison and history reports.
+        """
+        kind = classify(path.name)
+        if kind is None:
+            return
+        def build() -> BackupFile:
+            stat = path.stat()
+            return self._entry(path, kind, stat.st_mtime, stat.st_size)
+
+        entry = await self.hass.async_add_executor_job(build)
+        if content_hash:
+            entry = replace(entry, content_hash=content_hash)
+        if config_only is not None and entry.config_only is None:
+            entry = replace(entry, config_only=config_only)
+        if (previous := self._files.get(path.name)) is not None:
+            self.catalog.remove(previous)
+        self._files[path.name] = entry
+        self.catalog.add(entry)
+        self._async_notify()
+
+    @callback
+    def async_set_content_hash(self, name: str, content_hash: str) -> None:
+        """Remember the content hash of an indexed file."""
+        if (entry := self._files.get(name)) is not None:
+            # The hash is neither sorted nor filtered on, so catalog views are unaffected
+            self._files[name] = replace(entry, content_hash=content_hash)
+            self._async_schedule_save()
+
+    @callback
+    def async_remove(self, *names: str) -> None:
+        """Forget files that were removed by the integration."""
+        removed = [entry for name in names if (entry := self._files.pop(name, None)) is not None]
+        for entry in removed:
+            self.catalog.remove(entry)
+        if removed:
+            self._async_notify()
+
+    @callback
+    def _async_notify(self) -> None:
+        """Persist the index and tell listeners that it changed."""
+        self._async_schedule_save()
+        async_dispatcher_send(self.hass, SIGNAL_BACKUP_INDEX_UPDATED)
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save the index to storage after a short delay."""
+        self._store.async_delay_save(self._data_to_save, CATALOG_SAVE_DELAY_SECONDS)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the stored form of the index."""
+        return {"files": [asdict(entry) for entry in self._files.values()]}
+
+    def query(self, **options: Any) -> tuple[int, list[BackupFile]]:
+        """Return the number of matching files and one page of them (see BackupCatalog.query)."""
+        return self.catalog.query(self._files, **options)
+
+    def files(self, kind: str) -> list[BackupFile]:
+        """Return indexed files of one kind, newest name first."""
+        return sorted(
+            (f for f in self._files.values() if f.kind == kind),
+            key=lambda f: f.name,
+            reverse=True,
+        )
+
+    def stems(self, kind: str) -> list[str]:
+        """Return file names without extension, newest name first."""
+        return [f.stem for f in self.files(kind)]
+
+    def latest(self, kind: str) -> BackupFile | None:
+        """Return the most recently modified file of one kind."""
+        return max(
+            (f for f in self._files.values() if f.kind == kind),
+            key=lambda f: f.mtime,
+            default=None,
+        )
+
+    def get(self, name: str) -> BackupFile | None:
+        """Return the indexed entry for a file name."""
+        return self._files.get(name)
+
+    def resolve(self, name: str) -> str:
+        """Return the indexed file name for a name given with or without extension.
+
+        Falls back to ``name`` plus ".json" when no indexed file matches.
+        """
+        if name in self._files:
+            return name
+        for extension in _EXTENSIONS:
+            if f"{name}{extension}" in self._files:
+                return f"{name}{extension}"
+        return name if split_extension(name)[1] else f"{name}.json"
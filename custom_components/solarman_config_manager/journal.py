@@ -0,0 +1,338 @@
+"""Incremental change journal for Solarman Config Manager.
+
+When enabled, state changes of Solarman entities are appended as compact
+JSON lines to a journal segment, and the full set of tracked entities is
+periodically folded into a checkpoint export. Any point-in-time snapshot can
+be rebuilt from the latest checkpoint before it plus the journal records that
+follow. Each checkpoint starts a new segment with the same timestamp:
+
+    journal/checkpoint_20251217_020000.json
+    journal/journal_20251217_020000.jsonl
+
+After every checkpoint, checkpoints and segments that are no longer needed
+to rebuild any point within ``keep_days`` are deleted.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_time_interval,
+)
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    WRITABLE_DOMAINS,
+    JOURNAL_SUBDIR,
+    JOURNAL_FLUSH_INTERVAL_SECONDS,
+)
+from .entities import SolarmanEntityCache
+from .export_io import ExportReader, MemoryExport, build_entity_record, entity_hash, write_export
+
+_LOGGER = logging.getLogger(__name__)
+
+CHECKPOINT_PREFIX = "checkpoint_"
+SEGMENT_PREFIX = "journal_"
+STAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def _stamp_time(stamp: str) -> datetime:
+    """Parse a UTC file name timestamp."""
+    return datetime.strptime(stamp, STAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def prune_journal(journal_dir: Path, cutoff: datetime) -> list[str]:
+    """Delete checkpoints and segments not needed for snapshots after ``cutoff``.
+
+    The newest checkpoint at or before the cutoff is kept, since snapshots
+    between it and the cutoff are rebuilt from it. Returns the names of the
+    deleted files. This does blocking file I/O and must run in the executor.
+    """
+    stamps = sorted(
+        path.stem[len(CHECKPOINT_PREFIX):]
+        for path in journal_dir.glob(f"{CHECKPOINT_PREFIX}*.json")
+    )
+    expired = [stamp for stamp in stamps if _stamp_time(stamp) <= cutoff]
+    if len(expired) < 2:
+        return []
+    oldest_kept = expired[-1]
+
+    removed = []
+    for path in [
+        *journal_dir.glob(f"{CHECKPOINT_PREFIX}*.json"),
+        *journal_dir.glob(f"{SEGMENT_PREFIX}*.jsonl"),
+    ]:
+        stamp = path.name.split("_", 1)[1].split(".", 1)[0]
+        if stamp < oldest_kept:
+            path.unlink(missing_ok=True)
+            removed.append(path.name)
+    return removed
+
+
+def rebuild_snapshot(journal_dir: Path, at: datetime) -> MemoryExport:
+    """Rebuild the snapshot of tracked entities at a point in time.
+
+    ``at`` must be timezone-aware. This does blocking file I/O and must run
+    in the executor.
+    """
+    checkpoints = sorted(
+        (path for path in journal_dir.glob(f"{CHECKPOINT_PREFIX}*.json")
+         if _stamp_time(path.stem[len(CHECKPOINT_PREFIX):]) <= at),
+        key=lambda path: path.name,
+    )
+    if not checkpoints:
+        raise ValueError(f"No journal checkpoint at or before {at.isoformat()}")
+
+    checkpoint = checkpoints[-1]
+    stamp = checkpoint.stem[len(CHECKPOINT_PREFIX):]
+    with ExportReader(checkpoint) as reader:
+        entities = {entity["entity_id"]: entity for entity in reader.entities()}
+        checkpoint_header = reader.header
+
+    segment = journal_dir / f"{SEGMENT_PREFIX}{stamp}.jsonl"
+    replayed = 0
+    if segment.exists():
+        with open(segment, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if datetime.fromisoformat(record["t"]) > at:
+                    break
+                if record.get("removed"):
+                    entities.pop(record["entity_id"], None)
+                else:
+                    entities[record["entity_id"]] = record["record"]
+                replayed += 1
+
+    header = {
+        "export_timestamp": at.isoformat(),
+        "total_entities": len(entities),
+        "sorted_by": "entity_id",
+        "snapshot_type": "journal",
+        "checkpoint": checkpoint.name,
+        "journal_records": replayed,
+        "config_only": checkpoint_header.get("config_only", False),
+    }
+    return MemoryExport(header, sorted(entities.values(), key=lambda e: e["entity_id"]))
+
+
+def _append_lines(path: Path, lines: list[str]) -> None:
+    """Append journal lines to a segment (runs in the executor)."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+class ChangeJournal:
+    """Record Solarman state changes and fold them into periodic checkpoints."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        backup_dir: Path,
+        entity_cache: SolarmanEntityCache,
+        options: dict[str, Any],
+    ) -> None:
+        """Initialize the journal."""
+        self.hass = hass
+        self._entity_cache = entity_cache
+        self.journal_dir = backup_dir / JOURNAL_SUBDIR
+        self._checkpoint_interval: timedelta = options["checkpoint_interval"]
+        self._max_records: int = options["max_records"]
+        self._config_only: bool = options["config_only"]
+        self._keep: timedelta = timedelta(days=options["keep_days"])
+        self._entity_ids: set[str] = set()
+        self._hashes: dict[str, str] = {}
+        self._buffer: list[str] = []
+        self._segment: Path | None = None
+        self._segment_records = 0
+        self._checkpointing = False
+        # Entities recorded while a checkpoint is being written
+        self._changed_during_checkpoint: set[str] = set()
+        self._unsub_state = None
+        self._unsub_stop = None
+        self._unsubs: list = []
+
+    async def async_start(self) -> None:
+        """Write an initial checkpoint and start recording changes.
+
+        A fresh checkpoint on every start covers any changes made while Home
+        Assistant was not running.
+        """
+        await self.hass.async_add_executor_job(partial(self.journal_dir.mkdir, exist_ok=True))
+        await self.async_checkpoint()
+        self._async_subscribe()
+
+        self._unsubs.append(async_track_time_interval(
+            self.hass, self.async_flush, timedelta(seconds=JOURNAL_FLUSH_INTERVAL_SECONDS)
+        ))
+        self._unsubs.append(async_track_time_interval(
+            self.hass, self.async_checkpoint, self._checkpoint_interval
+        ))
+        self._unsubs.append(self._entity_cache.async_add_listener(self._async_subscribe))
+        # Kept apart from _unsubs: a once-listener must not be removed after it fired
+        self._unsub_stop = self.hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_stop
+        )
+        _LOGGER.info(f"Change journal started, tracking {len(self._entity_ids)} entities")
+
+    async def _async_stop(self, event: Event) -> None:
+        """Flush pending records when Home Assistant stops."""
+        self._unsub_stop = None
+        self.async_shutdown()
+        await self.async_flush()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop listening for changes."""
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        while self._unsubs:
+            self._unsubs.pop()()
+        if self._unsub_stop:
+            self._unsub_stop()
+            self._unsub_stop = None
+
+    def _tracked_entries(self) -> list[er.RegistryEntry]:
+        """Return the registry entries of the entities the journal tracks."""
+        return [
+            entry for entry in self._entity_cache.entries()
+            if not self._config_only or entry.domain in WRITABLE_DOMAINS
+        ]
+
+    @callback
+    def _async_subscribe(self) -> None:
+        """(Re-)subscribe to state changes of the tracked entities."""
+        entity_ids = {entry.entity_id for entry in self._tracked_entries()}
+        if entity_ids == self._entity_ids and self._unsub_state:
+            return
+        if self._unsub_state:
+            self._unsub_state()
+        self._entity_ids = entity_ids
+        self._unsub_state = async_track_state_change_event(
+            self.hass, list(entity_ids), self._async_state_changed
+        )
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Append a compact record for a state change."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+        timestamp = dt_util.utcnow().isoformat()
+
+        if new_state is None:
+            if self._hashes.pop(entity_id, None) is None:
+                return
+            line = {"t": timestamp, "entity_id": entity_id, "removed": True}
+        else:
+            entry = er.async_get(self.hass).async_get(entity_id)
+            if entry is None:
+                return
+            record = build_entity_record(entry, new_state)
+            record["hash"] = entity_hash(record)
+            # Attribute churn that does not change the content is not recorded
+            if self._hashes.get(entity_id) == record["hash"]:
+                return
+            self._hashes[entity_id] = record["hash"]
+            line = {"t": timestamp, "entity_id": entity_id, "record": record}
+
+        self._buffer.append(json.dumps(line, separators=(",", ":"), ensure_ascii=False))
+        self._segment_records += 1
+        if self._checkpointing:
+            self._changed_during_checkpoint.add(entity_id)
+        if self._segment_records >= self._max_records and not self._checkpointing:
+            self.hass.async_create_task(self.async_checkpoint())
+
+    async def async_flush(self, now: datetime | None = None) -> None:
+        """Write buffered records to the current segment."""
+        # Records taken during a checkpoint wait until it is known which segment they belong to
+        if self._checkpointing:
+            return
+        await self._async_write_buffer()
+
+    async def _async_write_buffer(self) -> None:
+        """Append the buffered records to the current segment."""
+        if not self._buffer or self._segment is None:
+            return
+        lines, self._buffer = self._buffer, []
+        await self.hass.async_add_executor_job(_append_lines, self._segment, lines)
+
+    async def async_checkpoint(self, now: datetime | None = None) -> None:
+        """Fold the journal into a full checkpoint and start a new segment."""
+        if self._checkpointing:
+            return
+        self._checkpointing = True
+        try:
+            await self._async_write_buffer()
+
+            entities = []
+            for entry in sorted(self._tracked_entries(), key=lambda e: e.entity_id):
+                state = self.hass.states.get(entry.entity_id)
+                if state:
+                    entities.append(build_entity_record(entry, state))
+
+            taken = dt_util.utcnow()
+            stamp = taken.strftime(STAMP_FORMAT)
+            checkpoint = self.journal_dir / f"{CHECKPOINT_PREFIX}{stamp}.json"
+
+            # Changes from here on are buffered until the checkpoint is in place
+            self._changed_during_checkpoint = set()
+            records_before = self._segment_records
+            try:
+                # write_export moves the checkpoint into place only once it is complete
+                await self.hass.async_add_executor_job(
+                    write_export,
+                    checkpoint,
+                    entities,
+                    taken.isoformat(),
+                    {"snapshot_type": "checkpoint", "config_only": self._config_only},
+                )
+            except Exception as e:
+                _LOGGER.error(f"Failed to write journal checkpoint, keeping the current segment: {e}")
+                if self._segment is None:
+                    # Without any checkpoint the records cannot be replayed
+                    self._buffer = []
+                await self._async_write_buffer()
+                return
+
+            # The new segment starts with the changes made while the checkpoint was written
+            self._segment = self.journal_dir / f"{SEGMENT_PREFIX}{stamp}.jsonl"
+            self._segment_records -= records_before
+            await self._async_write_buffer()
+
+            hashes = {entity["entity_id"]: entity["hash"] for entity in entities}
+            for entity_id in self._changed_during_checkpoint:
+                if entity_id in self._hashes:
+                    hashes[entity_id] = self._hashes[entity_id]
+                else:
+                    hashes.pop(entity_id, None)
+            self._hashes = hashes
+            _LOGGER.debug(f"Journal checkpoint {checkpoint.name} written with {len(entities)} entities")
+
+            removed = await self.hass.async_add_executor_job(
+                prune_journal, self.journal_dir, taken - self._keep
+            )
+            if removed:
+                _LOGGER.debug(f"Pruned {len(removed)} expired journal files")
+        except Exception as e:
+            _LOGGER.error(f"Failed to write journal checkpoint: {e}")
+        finally:
+            self._checkpointing = False
+
+    async def async_snapshot(self, at: datetime) -> MemoryExport:
+        """Rebuild the snapshot at a point in time (naive times are local)."""
+        await self.async_flush()
+        return await self.hass.async_add_executor_job(
+            rebuild_snapshot, self.journal_dir, dt_util.as_utc(at)
+        )
@@ -0,0 +1,263 @@
+"""Restore planning and per-inverter write scheduling for Solarman Config Manager."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+
+from .const import (
+    DOMAIN_SERVICE_MAP,
+    DEFAULT_RESTORE_MAX_CONCURRENCY,
+    DEFAULT_RESTORE_WRITES_PER_SECOND,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+UNKNOWN_DEVICE = "unknown"
+
+NUMERIC_DOMAINS = ("number", "input_number")
+BOOLEAN_DOMAINS = ("switch", "input_boolean")
+TRUTHY_VALUES = ("on", "On", "ON", True, "true", "True")
+
+
+def build_restore_plan(changes: dict, direction: str) -> tuple[list[dict], list[dict]]:
+    """Turn comparison changes into a list of service writes and a list of skipped entities."""
+    planned = []
+    skipped = []
+
+    for entity_id, change_data in changes.items():
+        domain = entity_id.split(".")[0]
+
+        # Skip entities we can't restore
+        if domain not in DOMAIN_SERVICE_MAP:
+            skipped.append({"entity": entity_id, "reason": f"Domain '{domain}' not restorable"})
+            continue
+
+        # Get target value based on direction
+        target_value = change_data["old_value"] if direction == "revert" else change_data["new_value"]
+
+        if target_value is None:
+            skipped.append({"entity": entity_id, "reason": "Target value is None"})
+            continue
+
+        # Convert numeric strings for number domain
+        if domain in NUMERIC_DOMAINS and isinstance(target_value, str):
+            try:
+                target_value = float(target_value)
+            except ValueError:
+                skipped.append({"entity": entity_id, "reason": f"Invalid number value: {target_value}"})
+                continue
+
+        service_map = DOMAIN_SERVICE_MAP[domain]
+
+        # Handle switch/boolean domains
+        if "service_on" in service_map:
+            if target_value in TRUTHY_VALUES:
+                service_name = service_map["service_on"]
+            else:
+                service_name = service_map["service_off"]
+            service_data = {"entity_id": entity_id}
+        else:
+            # Handle number/select domains
+            service_name = service_map["service"]
+            service_data = {
+                "entity_id": entity_id,
+                service_map["param"]: target_value,
+            }
+
+        planned.append({
+            "entity": entity_id,
+            "domain": domain,
+            "service": service_name,
+            "data": service_data,
+            "value": target_value,
+        })
+
+    return planned, skipped
+
+
+def changes_from_snapshot(
+    hass: HomeAssistant, values: dict[str, Any], entity_ids: set[str]
+) -> tuple[dict, list[dict]]:
+    """Diff snapshot values against the live states of the given entities.
+
+    Returns comparison-style changes (old = live value, new = snapshot value)
+    for build_restore_plan's "apply" direction, and the entities skipped.
+    Entities that already hold the snapshot value are included, so that the
+    restore reports them as already at target.
+    """
+    changes = {}
+    skipped = []
+    for entity_id, target in values.items():
+        if entity_id not in entity_ids:
+            skipped.append({"entity": entity_id, "reason": "Not a current Solarman entity"})
+            continue
+        if target is None or target in ("unavailable", "unknown"):
+            skipped.append({"entity": entity_id, "reason": f"No value in snapshot ({target})"})
+            continue
+        state = hass.states.get(entity_id)
+        if state is None or state.state in ("unavailable", "unknown"):
+            skipped.append({"entity": entity_id, "reason": "Entity is unavailable"})
+            continue
+        changes[entity_id] = {"old_value": state.state, "new_value": target}
+    return changes, skipped
+
+
+def is_at_target(domain: str, current: str | None, target: Any) -> bool:
+    """Return True if a live state already matches the restore target."""
+    if current is None or current in ("unavailable", "unknown"):
+        return False
+
+    if domain in NUMERIC_DOMAINS:
+        try:
+            return math.isclose(float(current), float(target), rel_tol=1e-9, abs_tol=1e-9)
+        except (TypeError, ValueError):
+            return False
+
+    if domain in BOOLEAN_DOMAINS:
+        return current == ("on" if target in TRUTHY_VALUES else "off")
+
+    return str(current) == str(target)
+
+
+def split_already_at_target(hass: HomeAssistant, planned: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Drop planned writes whose entity already holds the target value.
+
+    Returns (writes still needed, entries already at target).
+    """
+    pending = []
+    already_at_target = []
+    for item in planned:
+        state = hass.states.get(item["entity"])
+        if is_at_target(item["domain"], state.state if state else None, item["value"]):
+            already_at_target.append({"entity": item["entity"], "value": item["value"]})
+        else:
+            pending.append(item)
+    return pending, already_at_target
+
+
+class RestoreScheduler:
+    """Run restore writes in parallel across inverters, throttled per inverter.
+
+    Entities are grouped by their device (falling back to the config entry)
+    so that every inverter gets its own concurrency limit and write rate,
+    while writes to separate Modbus endpoints proceed independently.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_concurrency: int = DEFAULT_RESTORE_MAX_CONCURRENCY,
+        writes_per_second: float = DEFAULT_RESTORE_WRITES_PER_SECOND,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._max_concurrency = max(1, int(max_concurrency))
+        self._interval = 1 / writes_per_second if writes_per_second else 0
+        # Seconds each service call took, successful or not
+        self.latencies: list[float] = []
+
+    def group_by_device(self, planned: list[dict]) -> dict[str, dict]:
+        """Group planned writes by device id (or config entry id) using the registries."""
+        entity_reg = er.async_get(self.hass)
+        device_reg = dr.async_get(self.hass)
+
+        groups: dict[str, dict] = {}
+        for item in planned:
+            entry = entity_reg.async_get(item["entity"])
+            key = UNKNOWN_DEVICE
+            name = "Unknown device"
+            if entry and entry.device_id:
+                key = entry.device_id
+                device = device_reg.async_get(entry.device_id)
+                if device:
+                    name = device.name_by_user or device.name or entry.device_id
+            elif entry and entry.config_entry_id:
+                key = entry.config_entry_id
+                name = f"Config entry {entry.config_entry_id}"
+
+            groups.setdefault(key, {"name": name, "items": []})["items"].append(item)
+        return groups
+
+    async def async_run(self, planned: list[dict]) -> tuple[list[dict], list[dict], dict[str, dict]]:
+        """Execute planned writes and return (success, failed, per-device stats)."""
+        groups = self.group_by_device(planned)
+        _LOGGER.info(
+            f"Scheduling {len(planned)} restore writes across {len(groups)} device(s), "
+            f"max_concurrency={self._max_concurrency}, interval={self._interval:.3f}s"
+        )
+
+        success: list[dict] = []
+        failed: list[dict] = []
+        outcomes = await asyncio.gather(*(
+            self._async_run_device(key, group, success, failed)
+            for key, group in groups.items()
+        ))
+        return success, failed, dict(outcomes)
+
+    async def _async_run_device(
+        self,
+        device_key: str,
+        group: dict,
+        success: list[dict],
+        failed: list[dict],
+    ) -> tuple[str, dict[str, Any]]:
+        """Run all writes for one device under its concurrency and rate limit."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        slot_lock = asyncio.Lock()
+        next_slot = loop.time()
+        stats = {
+            "name": group["name"],
+            "writes": len(group["items"]),
+            "success": 0,
+            "failed": 0,
+        }
+
+        async def wait_for_slot() -> None:
+            nonlocal next_slot
+            async with slot_lock:
+                now = loop.time()
+                delay = next_slot - now
+                next_slot = max(now, next_slot) + self._interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        async def write(item: dict) -> None:
+            async with semaphore:
+                await wait_for_slot()
+                call_started = loop.time()
+                try:
+                    await self.hass.services.async_call(
+                        item["domain"], item["service"], item["data"], blocking=True
+                    )
+                    self.latencies.append(loop.time() - call_started)
+                    _LOGGER.info(f"Restored {item['entity']} to {item['value']}")
+                    stats["success"] += 1
+                    success.append({
+                        "entity": item["entity"],
+                        "value": item["value"],
+                        "device": device_key,
+                    })
+                except Exception as e:
+                    self.latencies.append(loop.time() - call_started)
+                    _LOGGER.error(f"Failed to restore {item['entity']}: {e}")
+                    stats["failed"] += 1
+                    failed.append({
+                        "entity": item["entity"],
+                        "error": str(e),
+                        "device": device_key,
+                    })
+
+        started = loop.time()
+        await asyncio.gather(*(write(item) for item in group["items"]))
+        duration = loop.time() - started
+
+        stats["duration"] = round(duration, 3)
+        stats["writes_per_second"] = round(stats["writes"] / duration, 2) if duration > 0 else None
+        return device_key, stats
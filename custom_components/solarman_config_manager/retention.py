@@ -0,0 +1,236 @@
+"""Retention and compaction of the backup directory for Solarman Config Manager.
+
+Exports are thinned out with a grandfather-father-son policy: the newest
+export of each of the last N hours, days, weeks and months is kept (-1 keeps
+every month/week/... forever, 0 disables a tier). Comparison and history
+reports older than a number of days are dropped. Files that are no longer kept are either
+deleted or packed into a single zip archive in the backup directory, and the
+value timeline is compacted to the exports that remain.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    RETENTION_ARCHIVE,
+    RETENTION_BATCH_SIZE,
+    RETENTION_MODE_ARCHIVE,
+)
+from .delta import is_delta, read_delta
+from .export_io import sidecar_path
+from .index import KIND_COMPARISON, KIND_EXPORT, KIND_HISTORY, BackupFile, BackupIndex
+from .timeline import TimelineIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bucket key per GFS tier
+TIERS: dict[str, Callable[[datetime], tuple]] = {
+    "keep_hourly": lambda t: (t.year, t.month, t.day, t.hour),
+    "keep_daily": lambda t: (t.year, t.month, t.day),
+    "keep_weekly": lambda t: t.isocalendar()[:2],
+    "keep_monthly": lambda t: (t.year, t.month),
+}
+
+
+def select_exports_to_keep(exports: list[BackupFile], policy: dict[str, Any]) -> set[str]:
+    """Return the names of the exports kept by the GFS policy.
+
+    The newest export is always kept. Exports are bucketed by the time they
+    were taken, not their mtime, which copying or touching a file changes.
+    """
+    newest_first = sorted(exports, key=lambda f: f.time, reverse=True)
+    keep = {newest_first[0].name} if newest_first else set()
+    for tier, bucket_of in TIERS.items():
+        limit = policy[tier]
+        if limit == 0:
+            continue
+        buckets = set()
+        for backup in newest_first:
+            bucket = bucket_of(dt_util.as_local(dt_util.utc_from_timestamp(backup.time)))
+            if bucket in buckets:
+                continue
+            if limit > 0 and len(buckets) >= limit:
+                break
+            buckets.add(bucket)
+            keep.add(backup.name)
+    return keep
+
+
+def plan_retention(
+    backup_dir: Path, files: list[BackupFile], now: datetime, policy: dict[str, Any]
+) -> list[BackupFile]:
+    """Return the files to remove (runs in the executor).
+
+    Exports that a kept delta is built on are kept as well, back to the
+    keyframe, so every kept snapshot can still be rebuilt.
+    """
+    exports = [f for f in files if f.kind == KIND_EXPORT]
+    keep = select_exports_to_keep(exports, policy)
+
+    pending = [name for name in keep if is_delta(name)]
+    while pending:
+        name = pending.pop()
+        try:
+            base = read_delta(backup_dir / name)["base"]
+        except (OSError, ValueError, KeyError) as e:
+            _LOGGER.warning(f"Cannot read delta {name}, keeping it without its chain: {e}")
+            continue
+        if base not in keep:
+            keep.add(base)
+            if is_delta(base):
+                pending.append(base)
+
+    cutoff = (now - timedelta(days=policy["keep_comparisons_days"])).timestamp()
+    return [
+        f for f in files
+        if (f.kind == KIND_EXPORT and f.name not in keep)
+        or (f.kind in (KIND_COMPARISON, KIND_HISTORY) and f.time < cutoff)
+    ]
+
+
+def remove_files(backup_dir: Path, batch: list[BackupFile], mode: str) -> dict[str, int]:
+    """Delete or archive a batch of files and their sidecars (runs in the executor).
+
+    Backups and sidecars are counted separately, so ``files_removed``
+    matches the number of backups selected.
+    """
+    archive = backup_dir / RETENTION_ARCHIVE
+    archive_size = archive.stat().st_size if archive.exists() else 0
+    removed = 0
+    sidecars_removed = 0
+    freed = 0
+
+    paths = []
+    sidecars = set()
+    for backup in batch:
+        path = backup_dir / backup.name
+        paths.append(path)
+        if (sidecar := sidecar_path(path)).exists():
+            paths.append(sidecar)
+            sidecars.add(sidecar)
+
+    if mode == RETENTION_MODE_ARCHIVE:
+        with zipfile.ZipFile(archive, "a", compression=zipfile.ZIP_DEFLATED) as zf:
+            archived = set(zf.namelist())
+            for path in paths:
+                if path.exists() and path.name not in archived:
+                    zf.write(path, arcname=path.name)
+
+    for path in paths:
+        try:
+            size = path.stat().st_size
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        if path in sidecars:
+            sidecars_removed += 1
+        else:
+            removed += 1
+        freed += size
+
+    growth = (archive.stat().st_size - archive_size) if archive.exists() else 0
+    return {
+        "files_removed": removed,
+        "sidecars_removed": sidecars_removed,
+        "bytes_reclaimed": freed - growth,
+    }
+
+
+class RetentionManager:
+    """Apply the retention policy on a schedule or on demand."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        index: BackupIndex,
+        timeline: TimelineIndex,
+        options: dict[str, Any],
+    ) -> None:
+        """Initialize the manager."""
+        self.hass = hass
+        self.index = index
+        self.timeline = timeline
+        self.options = options
+        self._running = False
+        self._unsub = None
+
+    @callback
+    def async_start(self) -> None:
+        """Run the policy periodically in the background."""
+        self._unsub = async_track_time_interval(
+            self.hass, self._async_scheduled_run, self.options["interval"]
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop the periodic run."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_scheduled_run(self, now: datetime) -> None:
+        """Start a run as a background task so it never delays startup or shutdown."""
+        self.hass.async_create_background_task(self.async_run(), f"{DOMAIN}_retention")
+
+    async def async_run(self, dry_run: bool = False) -> dict[str, Any] | None:
+        """Apply the retention policy and publish the result."""
+        if self._running:
+            _LOGGER.debug("Retention run already in progress")
+            return None
+        self._running = True
+        try:
+            backup_dir = self.index.backup_dir
+            files = [
+                backup for kind in (KIND_EXPORT, KIND_COMPARISON, KIND_HISTORY)
+                for backup in self.index.files(kind)
+            ]
+            to_remove = await self.hass.async_add_executor_job(
+                plan_retention, backup_dir, files, dt_util.now(), self.options
+            )
+
+            totals = {"files_removed": 0, "sidecars_removed": 0, "bytes_reclaimed": 0}
+            if not dry_run:
+                # Small batches keep each executor job short
+                for start in range(0, len(to_remove), RETENTION_BATCH_SIZE):
+                    batch = to_remove[start:start + RETENTION_BATCH_SIZE]
+                    result = await self.hass.async_add_executor_job(
+                        remove_files, backup_dir, batch, self.options["mode"]
+                    )
+                    for key, value in result.items():
+                        totals[key] += value
+                self.index.async_remove(*(backup.name for backup in to_remove))
+                if any(backup.kind == KIND_EXPORT for backup in to_remove):
+                    await self.timeline.async_compact(
+                        {backup.name: backup.time for backup in self.index.files(KIND_EXPORT)}
+                    )
+        finally:
+            self._running = False
+
+        result = {
+            "last_run": dt_util.now().isoformat(),
+            "dry_run": dry_run,
+            "mode": self.options["mode"],
+            "files_selected": len(to_remove),
+            "files_removed": totals["files_removed"],
+            "sidecars_removed": totals["sidecars_removed"],
+            "bytes_reclaimed": totals["bytes_reclaimed"],
+            "files_kept": len(files) - len(to_remove),
+        }
+        _LOGGER.info(
+            f"{'[DRY RUN] ' if dry_run else ''}Retention run: {len(to_remove)} of {len(files)} files "
+            f"selected, {totals['files_removed']} removed, {totals['bytes_reclaimed']} bytes reclaimed"
+        )
+        self.hass.data[DOMAIN]["last_retention_result"] = result
+        self.hass.bus.async_fire(f"{DOMAIN}_retention_complete")
+        return result
@@ -3,19 +3,21 @@ from __future__ import annotations
 
 import json
 import logging
-from datetime import timedelta
-from pathlib import Path
 
 from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, DEFAULT_BACKUP_DIR
+from .catalog import SORT_NAME
+from .const import DOMAIN, SIGNAL_BACKUP_INDEX_UPDATED, ATTRIBUTE_LIST_LIMIT
+from .details import comparison_details
+from .index import KIND_EXPORT, KIND_COMPARISON, KIND_HISTORY
+from .export_io import open_export_text
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=30)
-
 
 async def async_setup_platform(
     hass: HomeAssistant,
@@ -28,6 +30,8 @@ async def async_setup_platform(
         SolarmanConfigManagerFilesSensor(hass),
         SolarmanConfigManagerComparisonResultSensor(hass),
         SolarmanConfigManagerRestoreResultSensor(hass),
+        SolarmanConfigManagerRetentionSensor(hass),
+        SolarmanConfigManagerTimingsSensor(hass),
     ]
     async_add_entities(sensors, True)
 
@@ -37,6 +41,11 @@ class SolarmanConfigManagerFilesSensor(SensorEntity):
 
     _attr_name = "Solarman Config Manager Files"
     _attr_icon = "mdi:file-document-multiple"
+    _attr_should_poll = False  # Updated by backup index pushes
+    # File lists change with every backup; only the counts are recorded
+    _unrecorded_attributes = frozenset({
+        "files", "export_details", "comparison_files", "history_files",
+    })
 
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize the sensor."""
@@ -44,7 +53,10 @@ class SolarmanConfigManagerFilesSensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_files"
         self._attr_native_value = 0
         self._files = []
+        self._export_details = []
         self._comparison_files = []
+        self._history_files = []
+        self._counts = {}
 
     @property
     def native_value(self) -> int:
@@ -53,33 +65,66 @@ class SolarmanConfigManagerFilesSensor(SensorEntity):
 
     @property
     def extra_state_attributes(self) -> dict:
-        """Return the state attributes."""
+        """Return the newest files of each kind and the total counts."""
         return {
             "files": self._files,
-            "file_list": self._files,
+            "export_details": self._export_details,
             "comparison_files": self._comparison_files,
+            "history_files": self._history_files,
+            **self._counts,
         }
 
-    async def async_update(self) -> None:
-        """Update the sensor."""
-        backup_dir = Path(self.hass.config.path(DEFAULT_BACKUP_DIR))
-        
-        def get_files():
-            if not backup_dir.exists():
-                return [], []
-            export_files = sorted(
-                [f.stem for f in backup_dir.glob("solarman_export_*.json")],
-                reverse=True,
-            )
-            comparison_files = sorted(
-                [f.stem for f in backup_dir.glob("comparison_*.json")],
-                reverse=True,
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to backup index updates."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_BACKUP_INDEX_UPDATED, self._handle_index_update
             )
-            return export_files, comparison_files
+        )
 
-        self._files, self._comparison_files = await self.hass.async_add_executor_job(get_files)
-        self._attr_native_value = len(self._files)
-        _LOGGER.debug(f"Updated backup files sensor: {self._attr_native_value} export files, {len(self._comparison_files)} comparison files found")
+    @callback
+    def _handle_index_update(self) -> None:
+        """Refresh from the backup index and write the new state."""
+        self._refresh_from_index()
+        self.async_write_ha_state()
+
+    @callback
+    def _refresh_from_index(self) -> None:
+        """Read the file lists from the in-memory backup index."""
+        index = self.hass.data.get(DOMAIN, {}).get("index")
+        if index is None:
+            return
+
+        def newest(kind: str) -> tuple[int, list]:
+            """Return the number of files of a kind and the first page, newest name first."""
+            return index.query(kind=kind, sort_by=SORT_NAME, descending=True, limit=ATTRIBUTE_LIST_LIMIT)
+
+        export_count, exports = newest(KIND_EXPORT)
+        comparison_count, comparisons = newest(KIND_COMPARISON)
+        history_count, histories = newest(KIND_HISTORY)
+        self._files = [f.stem for f in exports]
+        # Counts and timestamps come from the sidecar indexes, not the exports
+        self._export_details = [
+            {
+                "file": f.stem,
+                "entities": f.total_entities,
+                "timestamp": f.export_timestamp,
+            }
+            for f in exports
+        ]
+        self._comparison_files = [f.stem for f in comparisons]
+        self._history_files = [f.stem for f in histories]
+        self._counts = {
+            "export_count": export_count,
+            "comparison_count": comparison_count,
+            "history_count": history_count,
+        }
+        self._attr_native_value = export_count
+        _LOGGER.debug(f"Updated backup files sensor: {export_count} export files, {comparison_count} comparison files found")
+
+    async def async_update(self) -> None:
+        """Update the sensor."""
+        self._refresh_from_index()
 
 
 class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
@@ -87,6 +132,9 @@ class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
 
     _attr_name = "Solarman Config Manager Comparison Result"
     _attr_icon = "mdi:file-compare"
+    _attr_should_poll = False  # Updated by backup index pushes
+    # Entity lists are only kept in the state machine, not in the recorder
+    _unrecorded_attributes = frozenset({"changes", "added_entities", "removed_entities"})
 
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize the sensor."""
@@ -94,6 +142,8 @@ class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_comparison"
         self._attr_native_value = "No comparison yet"
         self._comparison_data = {}
+        # (name, mtime, size) of the comparison file currently parsed
+        self._cache_key = None
 
     @property
     def native_value(self) -> str:
@@ -105,37 +155,69 @@ class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
         """Return the state attributes."""
         return self._comparison_data
 
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to backup index updates."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_BACKUP_INDEX_UPDATED, self._async_handle_index_update
+            )
+        )
+
+    async def _async_handle_index_update(self) -> None:
+        """Re-read the latest comparison if it changed and write the new state."""
+        if await self._async_refresh():
+            self.async_write_ha_state()
+
     async def async_update(self) -> None:
         """Update the sensor with latest comparison."""
-        backup_dir = Path(self.hass.config.path(DEFAULT_BACKUP_DIR))
-        
-        def get_latest_comparison():
-            if not backup_dir.exists():
-                return None
-            comparison_files = sorted(
-                backup_dir.glob("comparison_*.json"),
-                key=lambda f: f.stat().st_mtime,
-                reverse=True,
-            )
-            if not comparison_files:
-                return None
-            
-            latest_file = comparison_files[0]
+        await self._async_refresh()
+
+    async def _async_refresh(self) -> bool:
+        """Load the newest comparison unless it is already cached.
+
+        Returns True if the sensor state changed.
+        """
+        index = self.hass.data.get(DOMAIN, {}).get("index")
+        latest = index.latest(KIND_COMPARISON) if index else None
+
+        if latest is None:
+            if self._cache_key is None and not self._comparison_data:
+                return False
+            self._cache_key = None
+            self._attr_native_value = "No comparison yet"
+            self._comparison_data = {}
+            self.hass.data.get(DOMAIN, {}).pop("last_comparison", None)
+            return True
+
+        cache_key = (latest.name, latest.mtime, latest.size)
+        if cache_key == self._cache_key:
+            return False
+
+        latest_file = index.backup_dir / latest.name
+
+        def load_comparison():
             try:
-                with latest_file.open("r") as f:
-                    return json.load(f), latest_file.name
+                with open_export_text(latest_file) as f:
+                    return json.load(f)
             except Exception as e:
                 _LOGGER.error(f"Error reading comparison file {latest_file}: {e}")
                 return None
 
-        result = await self.hass.async_add_executor_job(get_latest_comparison)
+        data = await self.hass.async_add_executor_job(load_comparison)
 
-        if not result:
+        if data is None:
+            self._cache_key = None
             self._attr_native_value = "No comparison yet"
             self._comparison_data = {}
-            return
+            self.hass.data.get(DOMAIN, {}).pop("last_comparison", None)
+            return True
+
+        self._process_comparison(data, latest.name)
+        self._cache_key = cache_key
+        return True
 
-        data, filename = result
+    def _process_comparison(self, data: dict, filename: str) -> None:
+        """Summarize and normalize a parsed comparison report."""
         try:
             summary = data.get("summary", {})
             # Handle both old and new key formats
@@ -165,6 +247,15 @@ class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
             else:
                 normalized_changes = raw_changes
 
+            # The full lists are paged through get_details; attributes get the first entries
+            details = comparison_details(
+                {**data, "changes": normalized_changes}, filename
+            )
+            self.hass.data.setdefault(DOMAIN, {})["last_comparison"] = details
+            changes = details["changes"][:ATTRIBUTE_LIST_LIMIT]
+            added_entities = details["added_entities"]
+            removed_entities = details["removed_entities"]
+
             self._comparison_data = {
                 "file1": data.get("file1", ""),
                 "file2": data.get("file2", ""),
@@ -176,9 +267,17 @@ class SolarmanConfigManagerComparisonResultSensor(SensorEntity):
                     "removed": removed,
                     "unchanged": unchanged,
                 },
-                "changes": normalized_changes,
-                "added_entities": data.get("added_entities", []),
-                "removed_entities": data.get("removed_entities", []),
+                "changes": {
+                    change["entity_id"]: {k: v for k, v in change.items() if k != "entity_id"}
+                    for change in changes
+                },
+                "added_entities": added_entities[:ATTRIBUTE_LIST_LIMIT],
+                "removed_entities": removed_entities[:ATTRIBUTE_LIST_LIMIT],
+                "truncated": (
+                    len(details["changes"]) > ATTRIBUTE_LIST_LIMIT
+                    or len(added_entities) > ATTRIBUTE_LIST_LIMIT
+                    or len(removed_entities) > ATTRIBUTE_LIST_LIMIT
+                ),
                 "comparison_file": filename,
             }
             _LOGGER.debug(f"Updated comparison sensor: {self._attr_native_value}")
@@ -194,6 +293,8 @@ class SolarmanConfigManagerRestoreResultSensor(SensorEntity):
     _attr_name = "Solarman Config Manager Restore Result"
     _attr_icon = "mdi:restore"
     _attr_should_poll = False  # Only updates via events
+    # Per-entity results are only kept in the state machine, not in the recorder
+    _unrecorded_attributes = frozenset({"summary", "devices", "timings"})
 
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize the sensor."""
@@ -205,17 +306,11 @@ class SolarmanConfigManagerRestoreResultSensor(SensorEntity):
 
     async def async_added_to_hass(self) -> None:
         """Register event listener when entity is added."""
-        async def handle_restore_complete(event):
+        @callback
+        def handle_restore_complete(event):
             """Handle restore complete event."""
             _LOGGER.debug("Restore complete event received, updating sensor")
-            # Read data and update state
-            restore_result = self.hass.data.get(DOMAIN, {}).get("last_restore_result")
-            if restore_result:
-                self._restore_data = restore_result
-                if restore_result.get("dry_run"):
-                    self._attr_native_value = "Dry Run Complete"
-                else:
-                    self._attr_native_value = "Restore Complete"
+            if self._refresh():
                 self.async_write_ha_state()
         
         self._unsub_listener = self.hass.bus.async_listen(
@@ -237,15 +332,138 @@ class SolarmanConfigManagerRestoreResultSensor(SensorEntity):
         """Return the state attributes."""
         return self._restore_data
 
+    @callback
+    def _refresh(self) -> bool:
+        """Read the latest restore result from hass.data.
+
+        Each per-entity list in the summary is cut to its first entries;
+        the full lists are paged through get_details. Returns True if
+        there was a result.
+        """
+        restore_result = self.hass.data.get(DOMAIN, {}).get("last_restore_result")
+        if not restore_result:
+            return False
+        summary = restore_result.get("summary", {})
+        self._restore_data = {
+            **restore_result,
+            "summary": {key: items[:ATTRIBUTE_LIST_LIMIT] for key, items in summary.items()},
+            "truncated": any(len(items) > ATTRIBUTE_LIST_LIMIT for items in summary.values()),
+        }
+        if restore_result.get("dry_run"):
+            self._attr_native_value = "Dry Run Complete"
+        else:
+            self._attr_native_value = "Restore Complete"
+        _LOGGER.debug(f"Updated restore sensor: {self._attr_native_value}")
+        return True
+
     async def async_update(self) -> None:
-        """Update the sensor by reading the latest restore result from persistent notification."""
+        """Update the sensor by reading the latest restore result."""
         # This sensor is updated by the restore service via hass.data
-        restore_result = self.hass.data.get(DOMAIN, {}).get("last_restore_result")
-        if restore_result:
-            self._restore_data = restore_result
-            if restore_result.get("dry_run"):
-                self._attr_native_value = "Dry Run Complete"
-            else:
-                self._attr_native_value = "Restore Complete"
-            _LOGGER.debug(f"Updated restore sensor: {self._attr_native_value}")
+        self._refresh()
+
+
 
+class SolarmanConfigManagerRetentionSensor(SensorEntity):
+    """Sensor to display the latest retention run."""
+
+    _attr_name = "Solarman Config Manager Retention"
+    _attr_icon = "mdi:broom"
+    _attr_should_poll = False  # Only updates via events
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the sensor."""
+        self.hass = hass
+        self._attr_unique_id = f"{DOMAIN}_retention"
+        self._attr_native_value = "No retention run yet"
+        self._retention_data = {}
+
+    async def async_added_to_hass(self) -> None:
+        """Register event listener when entity is added."""
+        @callback
+        def handle_retention_complete(event):
+            """Handle retention complete event."""
+            self._refresh()
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            self.hass.bus.async_listen(f"{DOMAIN}_retention_complete", handle_retention_complete)
+        )
+
+    @property
+    def native_value(self) -> str:
+        """Return the state."""
+        return self._attr_native_value
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the state attributes (last run, files removed, bytes reclaimed)."""
+        return self._retention_data
+
+    @callback
+    def _refresh(self) -> None:
+        """Read the latest retention result from hass.data."""
+        result = self.hass.data.get(DOMAIN, {}).get("last_retention_result")
+        if result:
+            self._retention_data = result
+            self._attr_native_value = "Dry Run Complete" if result.get("dry_run") else "Retention Complete"
+
+    async def async_update(self) -> None:
+        """Update the sensor."""
+        self._refresh()
+
+
+class SolarmanConfigManagerTimingsSensor(SensorEntity):
+    """Diagnostics sensor with the phase timings of recent service runs."""
+
+    _attr_name = "Solarman Config Manager Timings"
+    _attr_icon = "mdi:timer-outline"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_should_poll = False  # Only updates via events
+    _unrecorded_attributes = frozenset({"last_runs", "aggregate"})
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the sensor."""
+        self.hass = hass
+        self._attr_unique_id = f"{DOMAIN}_timings"
+        self._attr_native_value = None
+        self._timings_data = {}
+
+    async def async_added_to_hass(self) -> None:
+        """Register event listener when entity is added."""
+        @callback
+        def handle_timings_updated(event):
+            """Handle timings updated event."""
+            self._refresh()
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            self.hass.bus.async_listen(f"{DOMAIN}_timings_updated", handle_timings_updated)
+        )
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the total duration of the most recent run in ms."""
+        return self._attr_native_value
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the most recent run per service and rolling percentiles per phase."""
+        return self._timings_data
+
+    @callback
+    def _refresh(self) -> None:
+        """Read the timings from hass.data."""
+        timings = self.hass.data.get(DOMAIN, {}).get("timings")
+        if timings is None or timings.last_service is None:
+            return
+        self._attr_native_value = timings.last_runs[timings.last_service]["total_ms"]
+        self._timings_data = {
+            "last_service": timings.last_service,
+            "last_runs": timings.last_runs,
+            "aggregate": timings.aggregate(),
+        }
+
+    async def async_update(self) -> None:
+        """Update the sensor."""
+        self._refresh()
@@ -0,0 +1,148 @@
+"""Debounced snapshot scheduler for Solarman Config Manager.
+
+Watches the writable Solarman entities (number, select and switch) and runs
+export_config once their configuration has actually changed and then stayed
+quiet for the debounce delay. Exports are never closer together than the
+minimum interval, and an optional maximum interval forces an export even
+when nothing changed: a timer for it is re-armed after every export.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, SERVICE_EXPORT_CONFIG, SNAPSHOT_DOMAINS
+from .entities import SolarmanEntityCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Inverters dropping off-line are not configuration changes
+_IGNORED_STATES = (STATE_UNAVAILABLE, STATE_UNKNOWN)
+
+
+class SnapshotScheduler:
+    """Export after configuration changes, debounced and rate limited."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entity_cache: SolarmanEntityCache,
+        options: dict[str, Any],
+    ) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._entity_cache = entity_cache
+        self._debounce = options["debounce"]
+        self._min_interval = options["min_interval"]
+        self._max_interval = options.get("max_interval")
+        self._export_data = {
+            "config_only": options["config_only"],
+            "compression": options["compression"],
+        }
+        self._entity_ids: set[str] = set()
+        self._pending: set[str] = set()
+        self._last_export: datetime = dt_util.utcnow()
+        self._cancel_export: CALLBACK_TYPE | None = None
+        self._cancel_max_interval: CALLBACK_TYPE | None = None
+        self._unsub_state = None
+        self._unsubs: list = []
+
+    @callback
+    def async_start(self) -> None:
+        """Start watching the writable Solarman entities."""
+        self._async_subscribe()
+        self._unsubs.append(self._entity_cache.async_add_listener(self._async_subscribe))
+        self._async_arm_max_interval()
+        _LOGGER.info(f"Snapshot scheduler started, watching {len(self._entity_ids)} entities")
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop watching and cancel any pending export."""
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        if self._cancel_export:
+            self._cancel_export()
+            self._cancel_export = None
+        if self._cancel_max_interval:
+            self._cancel_max_interval()
+            self._cancel_max_interval = None
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def _async_subscribe(self) -> None:
+        """(Re-)subscribe to state changes of the watched entities."""
+        entity_ids = {
+            entity_id for entity_id in self._entity_cache.entity_ids
+            if entity_id.split(".")[0] in SNAPSHOT_DOMAINS
+        }
+        if entity_ids == self._entity_ids and self._unsub_state:
+            return
+        if self._unsub_state:
+            self._unsub_state()
+        self._entity_ids = entity_ids
+        self._unsub_state = async_track_state_change_event(
+            self.hass, list(entity_ids), self._async_state_changed
+        )
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Restart the debounce timer for a real configuration change."""
+        old_state = event.data.get("old_state")
+        new_state = event.data.get("new_state")
+        if old_state is None or new_state is None:
+            return
+        if old_state.state in _IGNORED_STATES or new_state.state in _IGNORED_STATES:
+            return
+        if old_state.state == new_state.state and old_state.attributes == new_state.attributes:
+            return
+
+        self._pending.add(event.data["entity_id"])
+        # Each change within the window pushes the export back again
+        delay = self._debounce.total_seconds()
+        earliest = self._last_export + self._min_interval
+        delay = max(delay, (earliest - dt_util.utcnow()).total_seconds())
+        if self._cancel_export:
+            self._cancel_export()
+        self._cancel_export = async_call_later(self.hass, delay, self._async_export)
+
+    @callback
+    def _async_arm_max_interval(self) -> None:
+        """(Re-)start the maximum interval from now."""
+        if not self._max_interval:
+            return
+        if self._cancel_max_interval:
+            self._cancel_max_interval()
+        self._cancel_max_interval = async_call_later(
+            self.hass, self._max_interval, self._async_max_interval_reached
+        )
+
+    async def _async_max_interval_reached(self, now: datetime) -> None:
+        """Export now, as none happened within the maximum interval."""
+        self._cancel_max_interval = None
+        # A debounced export still waiting is folded into this one
+        if self._cancel_export:
+            self._cancel_export()
+        await self._async_export(now)
+
+    async def _async_export(self, now: datetime) -> None:
+        """Run export_config for the changes collected so far."""
+        self._cancel_export = None
+        changed = len(self._pending)
+        self._pending = set()
+        self._last_export = dt_util.utcnow()
+        self._async_arm_max_interval()
+        _LOGGER.info(f"Scheduled snapshot after {changed} configuration changes")
+        await self.hass.services.async_call(
+            DOMAIN, SERVICE_EXPORT_CONFIG, dict(self._export_data), blocking=True
+        )
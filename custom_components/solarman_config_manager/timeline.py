@@ -0,0 +1,230 @@
+"""Per-entity value timeline over the export history for Solarman Config Manager.
+
+Every export appends one line per entity whose content changed since the
+value recorded for the export's point in time:
+
+    {"t": 1765936800.0, "entity_id": "number.x", "state": "50", "hash": "...", "file": "..."}
+
+By default only writable entities are recorded; read-only sensors change
+between nearly every export and would make the log grow with every export.
+The log is appended to, so each export costs O(changed entities) on disk and
+in memory, and it is loaded once at startup. After retention removes
+exports, the log is compacted: each entry of a removed export moves to the
+first remaining export that still had that value, or is dropped if there is
+none. Queries answer "what was the value at time t" and "how did the value
+change over a range" without opening any export.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import TIMELINE_FILE, WRITABLE_DOMAINS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TimelineEntry(NamedTuple):
+    """One recorded value of an entity."""
+
+    time: float
+    state: Any
+    hash: str
+    file: str
+
+
+def _is_tracked(entity_id: str, config_only: bool) -> bool:
+    """Return True if the timeline records an entity."""
+    return not config_only or entity_id.split(".")[0] in WRITABLE_DOMAINS
+
+
+def _serialize(entity_id: str, entry: TimelineEntry) -> str:
+    """Return the log line of an entry."""
+    return json.dumps(
+        {"t": entry.time, "entity_id": entity_id, "state": entry.state,
+         "hash": entry.hash, "file": entry.file},
+        separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+
+
+def compact_timeline(
+    entries: dict[str, list[TimelineEntry]], exports: list[tuple[float, str]]
+) -> dict[str, list[TimelineEntry]]:
+    """Return the timeline without entries of exports that no longer exist.
+
+    ``exports`` holds the (time, name) of the remaining exports, sorted. An
+    entry of a removed export moves to the first remaining export before the
+    entity's next change, which still had that value, and is dropped if there
+    is none. Entries that no longer change the value are dropped as well.
+    """
+    names = {name for _, name in exports}
+    compacted = {}
+    for entity_id, timeline in entries.items():
+        kept: list[TimelineEntry] = []
+        for position, entry in enumerate(timeline):
+            if entry.file not in names:
+                following = timeline[position + 1].time if position + 1 < len(timeline) else float("inf")
+                successor = bisect.bisect_right(exports, entry.time, key=lambda e: e[0])
+                if successor == len(exports) or exports[successor][0] >= following:
+                    continue
+                entry = entry._replace(time=exports[successor][0], file=exports[successor][1])
+            if kept and kept[-1].hash == entry.hash:
+                continue
+            kept.append(entry)
+        if kept:
+            compacted[entity_id] = kept
+    return compacted
+
+
+def export_time(export_timestamp: str) -> datetime:
+    """Parse an export timestamp; naive timestamps are local time."""
+    parsed = dt_util.parse_datetime(export_timestamp)
+    if parsed is None:
+        raise ValueError(f"Invalid export timestamp: {export_timestamp}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return parsed
+
+
+class TimelineUpdate:
+    """Collect the entities of one export whose value changed.
+
+    ``observe`` is called from the executor for every entity as it is
+    written, after its hash has been set.
+    """
+
+    def __init__(self, timeline: TimelineIndex, file: str, export_timestamp: str) -> None:
+        """Initialize the update."""
+        self._timeline = timeline
+        self.file = file
+        self.time = export_time(export_timestamp).timestamp()
+        self.entries: list[tuple[str, TimelineEntry]] = []
+
+    def observe(self, entity: dict) -> None:
+        """Record the entity if its hash differs from the value in effect at this time."""
+        entity_id = entity["entity_id"]
+        if not _is_tracked(entity_id, self._timeline.config_only):
+            return
+        previous = self._timeline.entry_at(entity_id, self.time)
+        if previous is None or previous.hash != entity["hash"]:
+            self.entries.append(
+                (entity_id, TimelineEntry(self.time, entity.get("state"), entity["hash"], self.file))
+            )
+
+
+class TimelineIndex:
+    """Persisted, incrementally updated value timeline per entity."""
+
+    def __init__(self, hass: HomeAssistant, backup_dir: Path, config_only: bool = True) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        self.path = backup_dir / TIMELINE_FILE
+        self.config_only = config_only
+        self._entries: dict[str, list[TimelineEntry]] = {}
+        # Commits wait while the log is being rewritten
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> dict[str, list[TimelineEntry]]:
+        """Read the timeline log (runs in the executor)."""
+        entries: dict[str, list[TimelineEntry]] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash; everything before it is intact
+                    _LOGGER.warning(f"Skipping malformed line in {self.path.name}")
+                    continue
+                if not _is_tracked(record["entity_id"], self.config_only):
+                    continue
+                entry = TimelineEntry(record["t"], record["state"], record["hash"], record["file"])
+                entries.setdefault(record["entity_id"], []).append(entry)
+        for timeline in entries.values():
+            timeline.sort(key=lambda e: e.time)
+        return entries
+
+    async def async_load(self) -> None:
+        """Load the timeline log."""
+        self._entries = await self.hass.async_add_executor_job(self._load)
+        _LOGGER.debug(f"Timeline index loaded for {len(self._entries)} entities")
+
+    def begin(self, file: str, export_timestamp: str) -> TimelineUpdate:
+        """Start collecting the changes of a new export."""
+        return TimelineUpdate(self, file, export_timestamp)
+
+    def _append(self, lines: list[str]) -> None:
+        """Append lines to the timeline log (runs in the executor)."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+
+    async def async_commit(self, update: TimelineUpdate) -> None:
+        """Persist and apply the changes collected for an export."""
+        if not update.entries:
+            return
+        lines = [_serialize(entity_id, entry) for entity_id, entry in update.entries]
+        async with self._lock:
+            await self.hass.async_add_executor_job(self._append, lines)
+            for entity_id, entry in update.entries:
+                timeline = self._entries.setdefault(entity_id, [])
+                # Exports rebuilt from the journal may be older than the newest entry
+                bisect.insort(timeline, entry, key=lambda e: e.time)
+        _LOGGER.debug(f"Timeline index updated with {len(update.entries)} changes from {update.file}")
+
+    def _rewrite(
+        self, entries: dict[str, list[TimelineEntry]], exports: list[tuple[float, str]]
+    ) -> dict[str, list[TimelineEntry]]:
+        """Compact the timeline and replace the log with it (runs in the executor)."""
+        compacted = compact_timeline(entries, exports)
+        partial = self.path.with_name(f".{self.path.name}.tmp")
+        try:
+            with open(partial, "w", encoding="utf-8") as f:
+                for entity_id, timeline in compacted.items():
+                    for entry in timeline:
+                        f.write(_serialize(entity_id, entry))
+                        f.write("\n")
+            os.replace(partial, self.path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return compacted
+
+    async def async_compact(self, exports: dict[str, float]) -> None:
+        """Rewrite the log for the exports that remain, given as {name: time}."""
+        async with self._lock:
+            remaining = sorted((time, name) for name, time in exports.items())
+            before = sum(len(timeline) for timeline in self._entries.values())
+            # The executor works on a snapshot; commits wait for the lock
+            self._entries = await self.hass.async_add_executor_job(
+                self._rewrite, dict(self._entries), remaining
+            )
+        after = sum(len(timeline) for timeline in self._entries.values())
+        _LOGGER.debug(f"Timeline compacted from {before} to {after} entries")
+
+    def entry_at(self, entity_id: str, when: float) -> TimelineEntry | None:
+        """Return the value in effect at a time, or None if none was recorded yet."""
+        timeline = self._entries.get(entity_id)
+        if not timeline:
+            return None
+        position = bisect.bisect_right(timeline, when, key=lambda e: e.time)
+        return timeline[position - 1] if position else None
+
+    def entries_between(self, entity_id: str, start: float, end: float) -> list[TimelineEntry]:
+        """Return the value in effect at ``start`` followed by every change up to ``end``."""
+        timeline = self._entries.get(entity_id, [])
+        first = bisect.bisect_right(timeline, start, key=lambda e: e.time)
+        last = bisect.bisect_right(timeline, end, key=lambda e: e.time)
+        return timeline[max(first - 1, 0):last]
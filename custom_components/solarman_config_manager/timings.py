@@ -0,0 +1,174 @@
+"""Phase-level timing of service runs for Solarman Config Manager.
+
+Each export, compare and restore run measures how long each of its phases
+took (and, for restores, the latency of every entity write). Completed runs
+are folded into rolling windows per service and phase, from which the
+diagnostics sensor reports percentiles next to the most recent run.
+
+A single run can also be profiled with cProfile. The profile covers the
+event loop thread only; work done in the executor shows up in the phase
+timings instead.
+"""
+from __future__ import annotations
+
+import cProfile
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, PROFILE_SUBDIR, TIMING_WINDOW, TIMING_SAMPLE_WINDOW
+
+_LOGGER = logging.getLogger(__name__)
+
+# Only one cProfile profiler can be active in a process at a time
+_profiling = False
+
+
+def percentiles(values: Iterable[float]) -> dict[str, Any]:
+    """Return the count and nearest-rank p50/p95/p99/max of durations, in ms."""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def rank(percent: int) -> float:
+        position = max(1, round(percent / 100 * len(ordered)))
+        return round(ordered[position - 1] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 1),
+    }
+
+
+class ServiceRun:
+    """Timings of one service run, collected phase by phase."""
+
+    def __init__(self, service: str, profile: bool = False) -> None:
+        """Start timing a run, optionally under cProfile."""
+        global _profiling
+        self.service = service
+        self.phases: dict[str, float] = {}
+        self.samples: dict[str, list[float]] = {}
+        self.profiler: cProfile.Profile | None = None
+        self.profile_file: str | None = None
+        self._started = time.perf_counter()
+        self._duration: float | None = None
+        if profile:
+            if _profiling:
+                _LOGGER.warning(f"Another run is being profiled, not profiling {service}")
+            else:
+                _profiling = True
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase; repeated phases accumulate."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time measured elsewhere (such as in the executor) to a phase."""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_samples(self, name: str, seconds: Iterable[float]) -> None:
+        """Record individual latencies, such as one per entity write."""
+        self.samples.setdefault(name, []).extend(seconds)
+
+    @property
+    def duration(self) -> float:
+        """Return the run's duration so far, or in total once stopped."""
+        if self._duration is None:
+            return time.perf_counter() - self._started
+        return self._duration
+
+    def stop(self) -> None:
+        """Stop the clock and the profiler."""
+        global _profiling
+        if self._duration is not None:
+            return
+        self._duration = time.perf_counter() - self._started
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profiling = False
+
+    def result(self) -> dict[str, Any]:
+        """Return the run's timings in ms."""
+        self.stop()
+        result = {
+            "service": self.service,
+            "timestamp": datetime.now().isoformat(),
+            "total_ms": round(self.duration * 1000, 1),
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+        }
+        if self.samples:
+            result["samples"] = {name: percentiles(values) for name, values in self.samples.items()}
+        if self.profile_file:
+            result["profile"] = self.profile_file
+        return result
+
+
+class ServiceTimings:
+    """Rolling per-service, per-phase timings of completed runs."""
+
+    def __init__(self, hass: HomeAssistant, backup_dir: Path) -> None:
+        """Initialize the timings."""
+        self.hass = hass
+        self.profile_dir = backup_dir / PROFILE_SUBDIR
+        self.last_runs: dict[str, dict[str, Any]] = {}
+        self._phases: dict[str, dict[str, deque[float]]] = {}
+        self._samples: dict[str, dict[str, deque[float]]] = {}
+        self.last_service: str | None = None
+
+    def _dump_profile(self, run: ServiceRun, filename: str) -> None:
+        """Write a run's profile in pstats format (runs in the executor)."""
+        self.profile_dir.mkdir(exist_ok=True)
+        run.profiler.dump_stats(self.profile_dir / filename)
+
+    async def async_record(self, run: ServiceRun) -> dict[str, Any]:
+        """Fold a completed run into the rolling windows and return its timings."""
+        run.stop()
+        if run.profiler is not None:
+            filename = f"{run.service}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+            try:
+                await self.hass.async_add_executor_job(self._dump_profile, run, filename)
+                run.profile_file = f"{PROFILE_SUBDIR}/{filename}"
+                _LOGGER.info(f"Saved {run.service} profile to {run.profile_file}")
+            except OSError as e:
+                _LOGGER.error(f"Failed to save {run.service} profile: {e}")
+
+        result = run.result()
+        phases = self._phases.setdefault(run.service, {})
+        for name, seconds in [("total", run.duration), *run.phases.items()]:
+            phases.setdefault(name, deque(maxlen=TIMING_WINDOW)).append(seconds)
+        samples = self._samples.setdefault(run.service, {})
+        for name, values in run.samples.items():
+            samples.setdefault(name, deque(maxlen=TIMING_SAMPLE_WINDOW)).extend(values)
+
+        self.last_runs[run.service] = result
+        self.last_service = run.service
+        _LOGGER.debug(f"{run.service} timings: {result['phases']}, total {result['total_ms']}ms")
+        self.hass.bus.async_fire(f"{DOMAIN}_timings_updated", {"service": run.service})
+        return result
+
+    def aggregate(self) -> dict[str, dict[str, Any]]:
+        """Return percentiles of the recent runs of every service, per phase."""
+        return {
+            service: {
+                **{name: percentiles(window) for name, window in phases.items()},
+                **{name: percentiles(window) for name, window in self._samples.get(service, {}).items()},
+            }
+            for service, phases in self._phases.items()
+        }